@@ -1,11 +1,33 @@
 import tkinter as tk
-from tkinter import messagebox, Toplevel, Label, Button, Frame, Entry, Text, Scrollbar
+from tkinter import messagebox, filedialog, Toplevel, Label, Button, Frame, Entry, Text, Scrollbar
 import socket
 import threading
 import time
 import subprocess
 import os
-import copy
+import re
+import sys
+import json
+import math
+import random
+import struct
+from array import array
+from collections import deque
+from contextlib import contextmanager
+from functools import partial, wraps
+
+from chess_protocol import (
+    FrameBuffer, ProtocolError,
+    MSG_COLOR, MSG_MOVE, MSG_ACK, MSG_CHAT, MSG_ERROR, MSG_GAMEOVER, MSG_RESYNC, MSG_PING, MSG_CLOCK,
+    pack_hello, pack_move, pack_ack, pack_text, pack_pong,
+    unpack_u16, unpack_u32, unpack_u64, unpack_color, unpack_resync, unpack_text, unpack_clock,
+)
+
+# Optional: Pillow rasterizes piece glyphs into cached sprites; without it pieces are text items
+try:
+    from PIL import Image, ImageDraw, ImageFont, ImageTk
+except ImportError:
+    Image = None
 
 # Chess piece Unicode symbols
 PIECES = {
@@ -13,13 +35,106 @@ PIECES = {
     'k': '♚', 'q': '♛', 'r': '♜', 'b': '♝', 'n': '♞', 'p': '♟'
 }
 
+# Online game server and how often to retry after the connection drops
+ONLINE_SERVER = ('127.0.0.1', 5001)
+RECONNECT_ATTEMPTS = 5
+
+# Whether a Stockfish binary could be started; probed on the first automatic analysis
+_engine_available = None
+
+# Full moves per page of the history panel; earlier pages stay reachable with its arrows
+HISTORY_PAGE_MOVES = 100
+
+# "Find Mate" hint: longest mate looked for, search time and node table size
+MATE_HINT_MOVES = 4
+MATE_HINT_SECONDS = 5.0
+MATE_HINT_TABLE = 200_000
+
+# Fonts with chess glyphs, tried in order when rasterizing piece sprites
+PIECE_FONT_FILES = [
+    'seguisym.ttf',  # Windows (Segoe UI Symbol)
+    'DejaVuSans.ttf',
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
+    '/Library/Fonts/Arial Unicode.ttf',  # Mac
+    '/System/Library/Fonts/Apple Symbols.ttf',
+    'Symbola.ttf',
+]
+
+# Set CHESS_RENDER_DEBUG=1 to print click-to-paint latency and repaint counts
+RENDER_DEBUG = os.environ.get('CHESS_RENDER_DEBUG') == '1'
+
+# Set CHESS_PROFILE=1 to start with the rules-engine profiler and its overlay on (F12 toggles)
+PROFILE = os.environ.get('CHESS_PROFILE') == '1'
+PROFILE_REFRESH_MS = 500        # overlay refresh interval
+PROFILE_ACTIONS = 8             # recent GUI actions listed in the overlay
+
+# Zobrist keys for position hashing (fixed seed so hashes are stable on disk)
+_zobrist_rng = random.Random(0x5EED_C4E5)
+ZOBRIST_PIECES = {piece: [_zobrist_rng.getrandbits(64) for _ in range(64)] for piece in 'PNBRQKpnbrqk'}
+ZOBRIST_BLACK_TO_MOVE = _zobrist_rng.getrandbits(64)
+ZOBRIST_CASTLING = [_zobrist_rng.getrandbits(64) for _ in range(4)]  # K, Q, k, q
+ZOBRIST_EN_PASSANT = [_zobrist_rng.getrandbits(64) for _ in range(8)]
+
+# Promotion codes for 16-bit moves: from (6 bits) | to (6 bits) | promotion (4 bits)
+PROMOTION_CODES = {None: 0, 'n': 1, 'b': 2, 'r': 3, 'q': 4}
+PROMOTION_PIECES = {code: piece for piece, code in PROMOTION_CODES.items()}
+
+# Serialized game: start FEN length and move count, then the FEN and the 16-bit moves (little-endian)
+GAME_HEADER = struct.Struct('<HH')
+
+
+def encode_move(from_row, from_col, to_row, to_col, promotion_piece=None):
+    """Pack a move into a 16-bit integer."""
+    promo = PROMOTION_CODES[promotion_piece.lower() if promotion_piece else None]
+    return (from_row * 8 + from_col) | ((to_row * 8 + to_col) << 6) | (promo << 12)
+
+
+def decode_move(move, white=True):
+    """Unpack a 16-bit move into (from_row, from_col, to_row, to_col, promotion_piece)."""
+    from_sq = move & 63
+    to_sq = (move >> 6) & 63
+    promotion = PROMOTION_PIECES.get(move >> 12)
+    if promotion and white:
+        promotion = promotion.upper()
+    return from_sq >> 3, from_sq & 7, to_sq >> 3, to_sq & 7, promotion
+
+
+def square_name(row, col):
+    """Algebraic name of a square, e.g. (6, 4) -> 'e2'."""
+    return chr(97 + col) + str(8 - row)
+
+
+def move_to_uci(from_row, from_col, to_row, to_col, promotion_piece=None):
+    """Format a move in UCI notation, e.g. 'e7e8q'."""
+    uci = square_name(from_row, from_col) + square_name(to_row, to_col)
+    if promotion_piece:
+        uci += promotion_piece.lower()
+    return uci
+
+
+def unpack_game(data):
+    """Split bytes from ChessBoard.to_bytes() into (start FEN or None, array of 16-bit moves)
+    without replaying the game."""
+    fen_length, count = GAME_HEADER.unpack_from(data)
+    start = GAME_HEADER.size + fen_length
+    if len(data) != start + 2 * count:
+        raise ValueError("Truncated game data")
+    fen = bytes(data[GAME_HEADER.size:start]).decode('ascii') or None
+    moves = array('H')
+    moves.frombytes(data[start:])
+    if sys.byteorder == 'big':
+        moves.byteswap()
+    return fen, moves
+
 
 class StockfishEngine:
     """Interface to Stockfish chess engine."""
 
-    def __init__(self, difficulty='medium'):
+    def __init__(self, difficulty='medium', path=None, options=None):
         self.process = None
         self.difficulty = difficulty
+        self.path = path
+        self.options = options or {}
 
         # Skill levels (0-20, where 20 is strongest)
         self.skill_levels = {
@@ -35,7 +150,8 @@ class StockfishEngine:
 
     def start_engine(self):
         """Start the Stockfish engine process."""
-        stockfish_paths = [
+        stockfish_paths = [self.path] if self.path else []
+        stockfish_paths += [
             'stockfish.exe',  # Windows, same directory
             'stockfish',  # Linux/Mac, same directory
             './stockfish.exe',
@@ -67,6 +183,8 @@ class StockfishEngine:
 
                     # Set skill level
                     self._send_command(f'setoption name Skill Level value {self.skill}')
+                    for name, value in self.options.items():
+                        self._send_command(f'setoption name {name} value {value}')
                     self._send_command('isready')
                     self._read_until('readyok')
                     return True
@@ -110,6 +228,14 @@ class StockfishEngine:
 
         return '\n'.join(output)
 
+    def new_game(self):
+        """Clear the engine's hash and history before an unrelated position; True once it is ready."""
+        if not self.process:
+            return False
+        self._send_command('ucinewgame')
+        self._send_command('isready')
+        return 'readyok' in self._read_until('readyok')
+
     def get_best_move(self, fen, movetime=1000):
         """Get best move from current position."""
         if not self.process:
@@ -136,6 +262,53 @@ class StockfishEngine:
             print(f"[STOCKFISH] Error: {e}")
             return None
 
+    def analyze(self, fen, depth=None, movetime=1000, timeout=60, nodes=None):
+        """Search a position to a fixed depth or node count (else for movetime ms) and report the result.
+
+        Returns a dict with 'score' (centipawns for the side to move, or None
+        when a mate was found), 'mate' (moves to mate, negative when being
+        mated), 'best' (UCI move), 'depth', 'nodes', 'time' (ms) and 'nps',
+        plus 'trace': (time ms, nodes, first PV move) for every reported
+        principal variation. None without an engine.
+        """
+        if not self.process:
+            return None
+
+        self._send_command(f'position fen {fen}')
+        if depth:
+            self._send_command(f'go depth {depth}')
+        elif nodes:
+            self._send_command(f'go nodes {nodes}')
+        else:
+            self._send_command(f'go movetime {movetime}')
+        output = self._read_until('bestmove', timeout)
+
+        result = {'score': None, 'mate': None, 'best': None, 'depth': 0, 'nodes': 0, 'time': 0, 'nps': 0,
+                  'trace': []}
+        for line in output.split('\n'):
+            tokens = line.split()
+            if not tokens:
+                continue
+            if tokens[0] == 'info' and 'score' in tokens and 'lowerbound' not in tokens \
+                    and 'upperbound' not in tokens:
+                if 'multipv' in tokens and tokens[tokens.index('multipv') + 1] != '1':
+                    continue
+                i = tokens.index('score')
+                value = int(tokens[i + 2])
+                result['score'], result['mate'] = (value, None) if tokens[i + 1] == 'cp' else (None, value)
+                for key in ('depth', 'nodes', 'time', 'nps'):
+                    if key in tokens:
+                        result[key] = int(tokens[tokens.index(key) + 1])
+                if 'pv' in tokens and tokens.index('pv') + 1 < len(tokens):
+                    result['trace'].append((result['time'], result['nodes'], tokens[tokens.index('pv') + 1]))
+            elif tokens[0] == 'bestmove':
+                result['best'] = tokens[1] if len(tokens) > 1 and tokens[1] != '(none)' else None
+        return result
+
+    def stop(self):
+        """Ask a running search to finish now (safe to call from another thread)."""
+        self._send_command('stop')
+
     def close(self):
         """Close the engine."""
         if self.process:
@@ -151,11 +324,146 @@ class StockfishEngine:
             self.process = None
 
 
+# Expanded FEN ranks ("3p4" -> ['.', '.', '.', 'p', '.', ...]), shared by all boards
+_FEN_RANK_CACHE = {}
+_FEN_RANK_CACHE_LIMIT = 65536
+# Whole placement fields -> (ranks, white king, black king), so repeated positions skip parsing
+_FEN_PLACEMENT_CACHE = {}
+_FEN_PLACEMENT_CACHE_LIMIT = 65536
+# Castling field -> (white kingside, white queenside, black kingside, black queenside) "moved" flags
+_FEN_CASTLING = {
+    ''.join(c for bit, c in enumerate('KQkq') if mask >> bit & 1) or '-': tuple(not mask >> bit & 1 for bit in range(4))
+    for mask in range(16)
+}
+# En passant field -> target square
+_FEN_EN_PASSANT = {'-': None}
+_FEN_EN_PASSANT.update({f + r: (8 - int(r), ord(f) - 97) for f in 'abcdefgh' for r in '36'})
+
+
+def _expand_fen_rank(rank):
+    """Expand one FEN rank into a tuple of 8 squares."""
+    squares = _FEN_RANK_CACHE.get(rank)
+    if squares is not None:
+        return squares
+
+    expanded = []
+    for ch in rank:
+        if ch.isdigit():
+            expanded.extend('.' * int(ch))
+        elif ch in PIECES:
+            expanded.append(ch)
+        else:
+            raise ValueError(f"Invalid FEN rank: {rank!r}")
+    if len(expanded) != 8:
+        raise ValueError(f"Invalid FEN rank: {rank!r}")
+
+    squares = tuple(expanded)
+    if len(_FEN_RANK_CACHE) >= _FEN_RANK_CACHE_LIMIT:
+        _FEN_RANK_CACHE.clear()
+    _FEN_RANK_CACHE[rank] = squares
+    return squares
+
+
+def _parse_fen_placement(placement):
+    """Expand a FEN placement field into (ranks, white king, black king)."""
+    parsed = _FEN_PLACEMENT_CACHE.get(placement)
+    if parsed is not None:
+        return parsed
+
+    ranks = placement.split('/')
+    if len(ranks) != 8:
+        raise ValueError(f"Invalid FEN placement: {placement!r}")
+    ranks = tuple(_expand_fen_rank(rank) for rank in ranks)
+    white_king_pos = black_king_pos = None
+    for row, squares in enumerate(ranks):
+        if 'K' in squares:
+            white_king_pos = (row, squares.index('K'))
+        if 'k' in squares:
+            black_king_pos = (row, squares.index('k'))
+    if white_king_pos is None or black_king_pos is None:
+        raise ValueError(f"FEN is missing a king: {placement!r}")
+
+    parsed = (ranks, white_king_pos, black_king_pos)
+    if len(_FEN_PLACEMENT_CACHE) >= _FEN_PLACEMENT_CACHE_LIMIT:
+        _FEN_PLACEMENT_CACHE.clear()
+    _FEN_PLACEMENT_CACHE[placement] = parsed
+    return parsed
+
+
+class PieceImageCache:
+    """Piece sprites rasterized once per square size and color.
+
+    Only the active (size, color) set is kept, so switching board size or
+    theme releases the previous images.
+    """
+
+    def __init__(self, master):
+        self.master = master
+        self.key = None
+        self.images = {}
+
+    def get(self, piece, size, color='black'):
+        """Get the sprite for a piece, or None if sprites can't be rendered."""
+        if (size, color) != self.key:
+            self.images = self._render(size, color)
+            self.key = (size, color)
+        return self.images.get(piece)
+
+    def _render(self, size, color):
+        """Rasterize all twelve pieces at the given square size."""
+        if Image is None:
+            return {}
+
+        font = None
+        for path in PIECE_FONT_FILES:
+            try:
+                font = ImageFont.truetype(path, int(size * 0.8))
+                break
+            except OSError:
+                continue
+        if font is None:
+            print("[RENDER] No font with chess glyphs found, drawing pieces as text.")
+            return {}
+
+        images = {}
+        for piece, symbol in PIECES.items():
+            image = Image.new('RGBA', (size, size), (0, 0, 0, 0))
+            ImageDraw.Draw(image).text((size / 2, size / 2), symbol, font=font, fill=color, anchor='mm')
+            images[piece] = ImageTk.PhotoImage(image, master=self.master)
+        return images
+
+
 class ChessBoard:
     """Complete chess board with all rules."""
 
-    def __init__(self):
+    def __init__(self, fen=None):
         self.reset_board()
+        if fen:
+            self.set_fen(fen)
+
+    @classmethod
+    def from_fen(cls, fen):
+        """Create a board from a FEN string."""
+        return cls(fen)
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Rebuild a game saved with to_bytes() by replaying its moves."""
+        fen, moves = unpack_game(data)
+        board = cls(fen)
+        for move in moves:
+            if not board.make_move(*decode_move(move, board.current_turn == 'white')):
+                raise ValueError(f"Illegal move {move:#06x} in game data")
+        return board
+
+    def to_bytes(self):
+        """The game as compact bytes: start FEN (empty for the standard position) and 16-bit moves."""
+        fen = (self.start_fen or '').encode('ascii')
+        moves = self.move_history
+        if sys.byteorder == 'big':
+            moves = array('H', moves)
+            moves.byteswap()
+        return GAME_HEADER.pack(len(fen), len(moves)) + fen + moves.tobytes()
 
     def reset_board(self):
         """Reset to starting position."""
@@ -170,7 +478,8 @@ class ChessBoard:
             ['R', 'N', 'B', 'Q', 'K', 'B', 'N', 'R']
         ]
         self.current_turn = 'white'
-        self.move_history = []
+        self.move_history = array('H')  # encode_move() of every move since start_fen
+        self.start_fen = None
         self.white_king_pos = (7, 4)
         self.black_king_pos = (0, 4)
         self.white_king_moved = False
@@ -238,6 +547,165 @@ class ChessBoard:
 
         return fen
 
+    def set_fen(self, fen):
+        """Load position from FEN string, reusing this board's storage.
+
+        Missing trailing fields (as in EPD) default to '-', 0 and 1.
+        """
+        self._load_fen_fields(fen.split(), fen)
+
+    def _load_fen_fields(self, fields, fen=None):
+        """set_fen() on an already split FEN.
+
+        read_epd() passes fen=None so the record is only joined back into a
+        string if start_fen is read. Every field is validated before the board
+        is touched, so an invalid FEN leaves the position unchanged.
+        """
+        if len(fields) < 4:
+            raise ValueError(f"Invalid FEN: {fen or ' '.join(fields)!r}")
+
+        ranks, white_king_pos, black_king_pos = _parse_fen_placement(fields[0])
+
+        if fields[1] == 'w':
+            current_turn = 'white'
+        elif fields[1] == 'b':
+            current_turn = 'black'
+        else:
+            raise ValueError(f"Invalid active color in FEN: {fen or ' '.join(fields)!r}")
+
+        # Castling rights map onto the "moved" flags used by the move rules
+        castling = _FEN_CASTLING.get(fields[2])
+        if castling is None:
+            castling = tuple(c not in fields[2] for c in 'KQkq')
+
+        en_passant_target = _FEN_EN_PASSANT.get(fields[3], False)
+        if en_passant_target is False:
+            raise ValueError(f"Invalid en passant square in FEN: {fen or ' '.join(fields)!r}")
+
+        if len(fields) > 4:
+            try:
+                halfmove_clock = int(fields[4])
+                fullmove_number = int(fields[5]) if len(fields) > 5 else 1
+            except ValueError:
+                raise ValueError(f"Invalid move counters in FEN: {fen or ' '.join(fields)!r}") from None
+        else:
+            halfmove_clock = 0
+            fullmove_number = 1
+
+        board = self.board
+        for row in range(8):
+            board[row][:] = ranks[row]
+        self.white_king_pos = white_king_pos
+        self.black_king_pos = black_king_pos
+        self.current_turn = current_turn
+        (self.white_rook_kingside_moved, self.white_rook_queenside_moved,
+         self.black_rook_kingside_moved, self.black_rook_queenside_moved) = castling
+        self.white_king_moved = castling[0] and castling[1]
+        self.black_king_moved = castling[2] and castling[3]
+        self.en_passant_target = en_passant_target
+        self.halfmove_clock = halfmove_clock
+        self.fullmove_number = fullmove_number
+        del self.move_history[:]
+        self._start_fen = fields if fen is None else fen
+
+    @property
+    def start_fen(self):
+        """FEN the game started from, or None for the standard position."""
+        fen = self._start_fen
+        if isinstance(fen, list):
+            # Fields kept by read_epd(); joined only when somebody asks
+            fen = self._start_fen = ' '.join(fen)
+        return fen
+
+    @start_fen.setter
+    def start_fen(self, fen):
+        self._start_fen = fen
+
+    def zobrist_hash(self):
+        """64-bit Zobrist hash of the position (pieces, side, castling, en passant)."""
+        h = 0
+        for row in range(8):
+            board_row = self.board[row]
+            for col in range(8):
+                piece = board_row[col]
+                if piece != '.':
+                    h ^= ZOBRIST_PIECES[piece][row * 8 + col]
+
+        if self.current_turn == 'black':
+            h ^= ZOBRIST_BLACK_TO_MOVE
+        if not self.white_king_moved:
+            if not self.white_rook_kingside_moved:
+                h ^= ZOBRIST_CASTLING[0]
+            if not self.white_rook_queenside_moved:
+                h ^= ZOBRIST_CASTLING[1]
+        if not self.black_king_moved:
+            if not self.black_rook_kingside_moved:
+                h ^= ZOBRIST_CASTLING[2]
+            if not self.black_rook_queenside_moved:
+                h ^= ZOBRIST_CASTLING[3]
+        if self.en_passant_target:
+            h ^= ZOBRIST_EN_PASSANT[self.en_passant_target[1]]
+        return h
+
+    def parse_uci(self, uci):
+        """Convert a UCI move ('e2e4', 'e7e8q') to (from_row, from_col, to_row, to_col, promotion)."""
+        if len(uci) < 4 or uci[0] not in 'abcdefgh' or uci[2] not in 'abcdefgh' \
+                or uci[1] not in '12345678' or uci[3] not in '12345678':
+            return None
+
+        promotion = None
+        if len(uci) >= 5 and uci[4].lower() in 'qrbn':
+            promotion = uci[4].upper() if self.current_turn == 'white' else uci[4].lower()
+        return 8 - int(uci[1]), ord(uci[0]) - 97, 8 - int(uci[3]), ord(uci[2]) - 97, promotion
+
+    def parse_san(self, san):
+        """Resolve a SAN move ('Nf3', 'exd5', 'O-O', 'e8=Q+') against the position.
+
+        Returns (from_row, from_col, to_row, to_col, promotion) or None if the
+        move is not legal here.
+        """
+        white = self.current_turn == 'white'
+        san = san.rstrip('+#!?')
+
+        if san in ('O-O', '0-0', 'O-O-O', '0-0-0'):
+            row = 7 if white else 0
+            to_col = 6 if len(san) == 3 else 2
+            if self.get_piece(row, 4) == ('K' if white else 'k') and self.is_valid_move(row, 4, row, to_col):
+                return row, 4, row, to_col, None
+            return None
+
+        promotion = None
+        if '=' in san:
+            san, promo = san.split('=', 1)
+            promotion = promo[:1]
+        elif len(san) > 2 and san[-1] in 'QRBN' and san[-2] in '18':
+            san, promotion = san[:-1], san[-1]
+        if promotion:
+            promotion = promotion.upper() if white else promotion.lower()
+
+        kind = 'P'
+        if san and san[0] in 'KQRBN':
+            kind, san = san[0], san[1:]
+        san = san.replace('x', '').replace('-', '')
+
+        if len(san) < 2 or san[-2] not in 'abcdefgh' or san[-1] not in '12345678':
+            return None
+        to_row, to_col = 8 - int(san[-1]), ord(san[-2]) - 97
+        hint = san[:-2]
+        hint_col = ord(hint[0]) - 97 if hint and hint[0] in 'abcdefgh' else None
+        hint_row = 8 - int(hint[-1]) if hint and hint[-1] in '12345678' else None
+
+        piece = kind if white else kind.lower()
+        for row in range(8):
+            if hint_row is not None and row != hint_row:
+                continue
+            for col in range(8):
+                if hint_col is not None and col != hint_col:
+                    continue
+                if self.board[row][col] == piece and self.is_valid_move(row, col, to_row, to_col):
+                    return row, col, to_row, to_col, promotion
+        return None
+
     def get_piece(self, row, col):
         """Get piece at position."""
         if 0 <= row < 8 and 0 <= col < 8:
@@ -279,6 +747,38 @@ class ChessBoard:
 
         return valid_moves
 
+    def premove_targets(self, row, col):
+        """Squares the piece could reach on a later turn: move geometry only, ignoring
+        blockers and occupancy, since the position changes before a premove is played."""
+        piece = self.get_piece(row, col)
+        if piece == '.':
+            return []
+        kind = piece.lower()
+        targets = []
+        for to_row in range(8):
+            for to_col in range(8):
+                dr, dc = to_row - row, to_col - col
+                if dr == 0 and dc == 0:
+                    continue
+                if kind == 'p':
+                    direction = -1 if piece.isupper() else 1
+                    start_row = 6 if piece.isupper() else 1
+                    ok = (dr == direction and abs(dc) <= 1) or (dc == 0 and dr == 2 * direction and row == start_row)
+                elif kind == 'n':
+                    ok = (abs(dr), abs(dc)) in [(1, 2), (2, 1)]
+                elif kind == 'b':
+                    ok = abs(dr) == abs(dc)
+                elif kind == 'r':
+                    ok = dr == 0 or dc == 0
+                elif kind == 'q':
+                    ok = dr == 0 or dc == 0 or abs(dr) == abs(dc)
+                else:
+                    home = 7 if piece.isupper() else 0
+                    ok = (abs(dr) <= 1 and abs(dc) <= 1) or (row == home == to_row and col == 4 and abs(dc) == 2)
+                if ok:
+                    targets.append((to_row, to_col))
+        return targets
+
     def is_valid_move(self, from_row, from_col, to_row, to_col):
         """Check if move is valid."""
         piece = self.get_piece(from_row, from_col)
@@ -420,24 +920,38 @@ class ChessBoard:
 
     def _move_causes_check(self, from_row, from_col, to_row, to_col):
         """Check if move puts own king in check."""
-        temp_board = copy.deepcopy(self.board)
-        piece = self.board[from_row][from_col]
-        self.board[to_row][to_col] = piece
-        self.board[from_row][from_col] = '.'
-
-        king = 'K' if self.current_turn == 'white' else 'k'
-        king_pos = None
-        for r in range(8):
-            for c in range(8):
-                if self.board[r][c] == king:
-                    king_pos = (r, c)
-                    break
-            if king_pos:
-                break
+        # Make the move in place and undo it afterwards instead of copying the board
+        board = self.board
+        piece = board[from_row][from_col]
+        captured = board[to_row][to_col]
+        board[to_row][to_col] = piece
+        board[from_row][from_col] = '.'
+
+        # En passant also removes the pawn beside the destination
+        ep_victim = None
+        if piece in 'Pp' and from_col != to_col and captured == '.':
+            ep_victim = board[from_row][to_col]
+            board[from_row][to_col] = '.'
 
-        in_check = self._is_square_attacked(king_pos[0], king_pos[1], self.current_turn)
-        self.board = temp_board
-        return in_check
+        try:
+            king = 'K' if self.current_turn == 'white' else 'k'
+            if piece == king:
+                king_pos = (to_row, to_col)
+            else:
+                king_pos = self.white_king_pos if king == 'K' else self.black_king_pos
+                if board[king_pos[0]][king_pos[1]] != king:
+                    king_pos = None
+                    for r in range(8):
+                        if king in board[r]:
+                            king_pos = (r, board[r].index(king))
+                            break
+
+            return self._is_square_attacked(king_pos[0], king_pos[1], self.current_turn)
+        finally:
+            board[from_row][from_col] = piece
+            board[to_row][to_col] = captured
+            if ep_victim is not None:
+                board[from_row][to_col] = ep_victim
 
     def _is_square_attacked(self, row, col, by_color):
         """Check if square is attacked."""
@@ -508,11 +1022,61 @@ class ChessBoard:
             return False
         return not self.has_legal_moves()
 
+    def is_insufficient_material(self):
+        """Check if neither side can possibly mate (bare kings, or a single minor piece)."""
+        minors = 0
+        for row in self.board:
+            for piece in row:
+                if piece in 'PpRrQq':
+                    return False
+                if piece in 'NnBb':
+                    minors += 1
+        return minors <= 1
+
+    def get_san(self, from_row, from_col, to_row, to_col, promotion_piece=None):
+        """Standard algebraic notation for a legal move, before it is made.
+
+        Includes disambiguation and promotion; check suffixes are left to the caller.
+        """
+        piece = self.board[from_row][from_col]
+        kind = piece.upper()
+        if kind == 'K' and abs(to_col - from_col) == 2:
+            return "O-O" if to_col > from_col else "O-O-O"
+
+        is_capture = self.board[to_row][to_col] != '.' or (kind == 'P' and from_col != to_col)
+        san = ""
+        if kind == 'P':
+            if is_capture:
+                san = chr(97 + from_col)
+        else:
+            san = kind
+            rivals = [(r, c) for r in range(8) for c in range(8)
+                      if (r, c) != (from_row, from_col) and self.board[r][c] == piece
+                      and self.is_valid_move(r, c, to_row, to_col)]
+            if rivals:
+                if all(c != from_col for _, c in rivals):
+                    san += chr(97 + from_col)
+                elif all(r != from_row for r, _ in rivals):
+                    san += str(8 - from_row)
+                else:
+                    san += square_name(from_row, from_col)
+
+        if is_capture:
+            san += "x"
+        san += square_name(to_row, to_col)
+        if kind == 'P' and to_row in (0, 7):
+            san += "=" + (promotion_piece or 'Q').upper()
+        return san
+
     def make_move(self, from_row, from_col, to_row, to_col, promotion_piece=None):
         """Make a move."""
         if not self.is_valid_move(from_row, from_col, to_row, to_col):
             return False
+        self._apply_move(from_row, from_col, to_row, to_col, promotion_piece)
+        return True
 
+    def _apply_move(self, from_row, from_col, to_row, to_col, promotion_piece=None):
+        """Update the position for a move already known to be legal."""
         piece = self.get_piece(from_row, from_col)
         captured = self.get_piece(to_row, to_col)
 
@@ -578,42 +1142,372 @@ class ChessBoard:
         else:
             self.halfmove_clock += 1
 
-        # Move notation
-        move_notation = self._get_move_notation(piece, from_row, from_col, to_row, to_col, captured)
-        self.move_history.append({
-            'from': (from_row, from_col),
-            'to': (to_row, to_col),
-            'piece': piece,
-            'captured': captured,
-            'notation': move_notation
-        })
-
         # Switch turn
         if self.current_turn == 'black':
             self.fullmove_number += 1
         self.current_turn = 'black' if self.current_turn == 'white' else 'white'
 
-        return True
+        # Notation and captures are rebuilt on demand by move_records()
+        promoted = self.board[to_row][to_col] if piece in 'Pp' and to_row in (0, 7) else None
+        self.move_history.append(encode_move(from_row, from_col, to_row, to_col, promoted))
 
-    def _get_move_notation(self, piece, from_row, from_col, to_row, to_col, captured):
-        """Generate algebraic notation."""
-        notation = ""
+    def play_move(self, move):
+        """Make a 16-bit move and describe it.
 
-        if piece.lower() == 'k' and abs(to_col - from_col) == 2:
-            return "O-O" if to_col > from_col else "O-O-O"
-
-        if piece.lower() != 'p':
-            notation += piece.upper()
-
-        if piece.lower() == 'p' and captured != '.':
-            notation += chr(97 + from_col)
+        Returns a dict with 'from', 'to', 'piece', 'captured' and 'notation'
+        (SAN, with '+' when the move gives check), or None if the move is illegal.
+        """
+        from_row, from_col, to_row, to_col, promotion = decode_move(move, self.current_turn == 'white')
+        if not self.is_valid_move(from_row, from_col, to_row, to_col):
+            return None
 
-        if captured != '.':
-            notation += "x"
+        piece = self.board[from_row][from_col]
+        captured = self.board[to_row][to_col]
+        if piece in 'Pp' and from_col != to_col and captured == '.':
+            captured = 'p' if piece == 'P' else 'P'
+        notation = self.get_san(from_row, from_col, to_row, to_col, promotion)
+        self.make_move(from_row, from_col, to_row, to_col, promotion)
+        if self.is_in_check():
+            notation += '+'
+        return {'from': (from_row, from_col), 'to': (to_row, to_col),
+                'piece': piece, 'captured': captured, 'notation': notation}
+
+    def move_records(self):
+        """Per-move records (see play_move) for the game so far, rebuilt by replaying it."""
+        board = ChessBoard(self.start_fen)
+        for move in self.move_history:
+            yield board.play_move(move)
+
+    def get_pgn(self, headers=None, result='*'):
+        """PGN text of the game played on this board."""
+        tags = {'Event': '?', 'Site': '?', 'Date': '????.??.??', 'Round': '?',
+                'White': '?', 'Black': '?', 'Result': result}
+        tags.update(headers or {})
+        if self.start_fen:
+            tags['SetUp'] = '1'
+            tags['FEN'] = self.start_fen
+        return format_pgn(tags, [record['notation'] for record in self.move_records()], result)
+
+
+# EPD operation tokens: quoted strings, bare words and the ';' terminator
+_EPD_TOKEN_RE = re.compile(r'"([^"]*)"?|([^\s;"]+)|(;)')
+
+
+def parse_epd_operations(text):
+    """Parse EPD operations ('bm Nf3; id "WAC.001";') into a dict of operand lists."""
+    operations = {}
+    tokens = []
+    for quoted, word, end in _EPD_TOKEN_RE.findall(text):
+        if end:
+            if tokens:
+                operations[tokens[0]] = tokens[1:]
+            tokens = []
+        else:
+            tokens.append(word or quoted)
+    if tokens:
+        operations[tokens[0]] = tokens[1:]
+    return operations
+
+
+def read_epd(source, board=None):
+    """Stream positions from an EPD file path or iterable of lines.
+
+    Yields (board, operations) for every record. The same board object is
+    reloaded for each line, so copy it if a position must outlive the loop.
+    The 'hmvc' and 'fmvn' operations set the move counters.
+    """
+    if board is None:
+        board = ChessBoard()
+
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'r', encoding='utf-8') as f:
+            yield from read_epd(f, board)
+        return
+
+    for line in source:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+
+        fields = line.split(None, 4)
+        if len(fields) < 4:
+            raise ValueError(f"Invalid EPD record: {line!r}")
+
+        if len(fields) > 4:
+            operations = parse_epd_operations(fields.pop())
+        else:
+            operations = {}
+        board._load_fen_fields(fields)
+
+        if 'hmvc' in operations and operations['hmvc']:
+            board.halfmove_clock = int(operations['hmvc'][0])
+        if 'fmvn' in operations and operations['fmvn']:
+            board.fullmove_number = int(operations['fmvn'][0])
+
+        yield board, operations
+
+
+# PGN movetext tokens: comments, variations, NAGs, move numbers, results and moves
+_PGN_TOKEN_RE = re.compile(r'\{[^}]*\}|;[^\n]*|\(|\)|\$\d+|\d+\.+|1-0|0-1|1/2-1/2|\*|[^\s(){};]+')
+_PGN_HEADER_RE = re.compile(r'\[(\w+)\s+"((?:[^"\\]|\\.)*)"\]')
+PGN_RESULTS = ('1-0', '0-1', '1/2-1/2', '*')
+
+
+def read_pgn(source):
+    """Stream games from a PGN file path or iterable of lines.
+
+    Yields dicts with 'headers', 'moves' (SAN, main line only) and 'result'.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'r', encoding='utf-8', errors='replace') as f:
+            yield from read_pgn(f)
+        return
+
+    headers = {}
+    movetext = []
+    for line in source:
+        stripped = line.strip()
+        if stripped.startswith('[') and stripped.endswith(']'):
+            if movetext:
+                yield _parse_pgn_game(headers, movetext)
+                headers, movetext = {}, []
+            match = _PGN_HEADER_RE.match(stripped)
+            if match:
+                headers[match.group(1)] = match.group(2).replace('\\"', '"')
+        elif stripped and not stripped.startswith('%'):
+            movetext.append(stripped)
+
+    if headers or movetext:
+        yield _parse_pgn_game(headers, movetext)
+
+
+def _parse_pgn_game(headers, movetext):
+    """Extract the main-line SAN moves and result from PGN movetext."""
+    moves = []
+    result = headers.get('Result', '*')
+    depth = 0
+    for token in _PGN_TOKEN_RE.findall('\n'.join(movetext)):
+        if token == '(':
+            depth += 1
+        elif token == ')':
+            depth = max(0, depth - 1)
+        elif depth or token[0] in '{;$' or token[0].isdigit() and token.endswith('.'):
+            continue
+        elif token in PGN_RESULTS:
+            result = token
+        else:
+            moves.append(token)
+    return {'headers': headers, 'moves': moves, 'result': result}
+
+
+def format_pgn(headers, moves, result='*'):
+    """Format one game as PGN text from headers and a list of SAN moves."""
+    lines = [f'[{key} "{str(value).replace(chr(34), chr(92) + chr(34))}"]' for key, value in headers.items()]
+    lines.append('')
+
+    white_first = True
+    fullmove = 1
+    fen = headers.get('FEN')
+    if fen:
+        fields = fen.split()
+        white_first = len(fields) < 2 or fields[1] == 'w'
+        if len(fields) > 5 and fields[5].isdigit():
+            fullmove = int(fields[5])
+
+    tokens = []
+    for i, san in enumerate(moves):
+        white_move = (i % 2 == 0) == white_first
+        if white_move:
+            tokens.append(f"{fullmove}.")
+        elif i == 0:
+            tokens.append(f"{fullmove}...")
+        tokens.append(san)
+        if not white_move:
+            fullmove += 1
+    tokens.append(result)
+
+    line = ""
+    for token in tokens:
+        if line and len(line) + 1 + len(token) > 79:
+            lines.append(line)
+            line = token
+        else:
+            line = f"{line} {token}" if line else token
+    lines.append(line)
+    return '\n'.join(lines) + '\n'
+
+
+class Profiler:
+    """Opt-in call counters and timings for ChessBoard and StockfishEngine.
+
+    While disabled nothing is wrapped: the engine classes run their plain
+    methods and cost nothing extra. enable() replaces the methods in
+    TIMED_METHODS on the classes with timing wrappers (and counts the bytes
+    exchanged with Stockfish); disable() restores the originals. GUI handlers
+    decorated with @profiled_action are recorded as actions, each with its
+    duration and the engine calls it made.
+    """
+
+    # (class, method, short label used in the overlay's action lines)
+    TIMED_METHODS = [
+        (ChessBoard, 'is_valid_move', 'valid'),
+        (ChessBoard, '_is_square_attacked', 'attacked'),
+        (ChessBoard, '_move_causes_check', 'check'),
+        (ChessBoard, 'get_valid_moves_for_piece', 'movegen'),  # move generation for one piece
+        (ChessBoard, 'has_legal_moves', 'anylegal'),           # move generation for the side to move
+        (StockfishEngine, 'get_best_move', 'engine'),          # round trip, including think time
+    ]
 
-        notation += chr(97 + to_col) + str(8 - to_row)
+    def __init__(self):
+        self.enabled = False
+        self.timings = {}       # method name -> [calls, total seconds, max seconds]
+        self.counters = {'stockfish_bytes_sent': 0, 'stockfish_bytes_received': 0}
+        self.actions = deque(maxlen=100)
+        self._originals = []
+        self._action_depth = 0
+
+    def enable(self):
+        """Start counting: wrap the instrumented methods."""
+        if self.enabled:
+            return
+        for cls, name, _ in self.TIMED_METHODS:
+            self._patch(cls, name, self._timed(name, getattr(cls, name)))
+        self._patch(StockfishEngine, '_send_command', self._count_sent(StockfishEngine._send_command))
+        self._patch(StockfishEngine, '_read_until', self._count_received(StockfishEngine._read_until))
+        self.enabled = True
+
+    def disable(self):
+        """Stop counting: put the original methods back (the numbers are kept)."""
+        while self._originals:
+            cls, name, method = self._originals.pop()
+            setattr(cls, name, method)
+        self.enabled = False
+
+    def reset(self):
+        for record in self.timings.values():
+            record[:] = [0, 0.0, 0.0]
+        for key in self.counters:
+            self.counters[key] = 0
+        self.actions.clear()
+
+    def _patch(self, cls, name, wrapper):
+        self._originals.append((cls, name, cls.__dict__[name]))
+        setattr(cls, name, wrapper)
+
+    def _timed(self, name, method):
+        record = self.timings.setdefault(name, [0, 0.0, 0.0])
+        clock = time.perf_counter
+
+        @wraps(method)
+        def wrapper(*args, **kwargs):
+            start = clock()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                elapsed = clock() - start
+                record[0] += 1
+                record[1] += elapsed
+                if elapsed > record[2]:
+                    record[2] = elapsed
+        return wrapper
+
+    def _count_sent(self, method):
+        counters = self.counters
+
+        @wraps(method)
+        def wrapper(engine, command):
+            counters['stockfish_bytes_sent'] += len(command) + 1
+            return method(engine, command)
+        return wrapper
+
+    def _count_received(self, method):
+        counters = self.counters
+
+        @wraps(method)
+        def wrapper(*args, **kwargs):
+            output = method(*args, **kwargs)
+            if output:
+                # Lines come back stripped; count one newline per line
+                counters['stockfish_bytes_received'] += len(output) + 1
+            return output
+        return wrapper
+
+    def _calls(self):
+        return {name: record[0] for name, record in self.timings.items()}
+
+    @contextmanager
+    def action(self, name):
+        """Record one GUI action: its duration and how many engine calls it made.
+        Nested actions (a premove played from the bot's move) count toward the outer one."""
+        top_level = self.enabled and not self._action_depth
+        before = self._calls() if top_level else None
+        start = time.perf_counter()
+        self._action_depth += 1
+        try:
+            yield
+        finally:
+            self._action_depth -= 1
+            if top_level:
+                after = self._calls()
+                self.actions.append({
+                    'action': name,
+                    'ms': round((time.perf_counter() - start) * 1000, 3),
+                    'calls': {key: count - before.get(key, 0) for key, count in after.items()
+                              if count != before.get(key, 0)},
+                })
+
+    def snapshot(self):
+        """All counters as plain data."""
+        return {
+            'enabled': self.enabled,
+            'timings': {
+                name: {'calls': calls, 'total_ms': round(total * 1000, 3),
+                       'avg_us': round(total / calls * 1e6, 2) if calls else 0.0,
+                       'max_ms': round(longest * 1000, 3)}
+                for name, (calls, total, longest) in self.timings.items()
+            },
+            'counters': dict(self.counters),
+            'actions': list(self.actions),
+        }
 
-        return notation
+    def dump(self, path, **extra):
+        """Write the snapshot (plus any extra sections) as JSON."""
+        data = self.snapshot()
+        data.update(extra)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2)
+
+    def report_lines(self, actions=PROFILE_ACTIONS):
+        """Text table for the debug overlay."""
+        lines = [f"{'method':<26}{'calls':>8}{'avg us':>10}{'max ms':>9}"]
+        for name, (calls, total, longest) in self.timings.items():
+            avg = total / calls * 1e6 if calls else 0.0
+            lines.append(f"{name:<26}{calls:>8}{avg:>10.1f}{longest * 1000:>9.2f}")
+        lines.append(f"stockfish bytes: {self.counters['stockfish_bytes_sent']} sent, "
+                     f"{self.counters['stockfish_bytes_received']} received")
+        labels = {name: label for _, name, label in self.TIMED_METHODS}
+        for entry in list(self.actions)[-actions:]:
+            calls = ' '.join(f"{labels[name]}={count}" for name, count in entry['calls'].items())
+            lines.append(f"{entry['action']:<12}{entry['ms']:>9.1f} ms  {calls}")
+        return lines
+
+
+PROFILER = Profiler()
+if PROFILE:
+    PROFILER.enable()
+
+
+def profiled_action(name):
+    """Decorator for ChessGame handlers: record each call as a profiler action."""
+    def decorate(method):
+        @wraps(method)
+        def wrapper(*args, **kwargs):
+            if not PROFILER.enabled:
+                return method(*args, **kwargs)
+            with PROFILER.action(name):
+                return method(*args, **kwargs)
+        return wrapper
+    return decorate
 
 
 class ChessGame:
@@ -631,12 +1525,32 @@ class ChessGame:
         self.game_mode = None
         self.ai_engine = None
         self.online_socket = None
+        self.online_send_lock = threading.Lock()
+        self.online_send_seq = 0
+        self.online_token = 0
+        self.online_pending = {}
+        self.online_resend = False
         self.is_white = True
+        self.premove = None
         self.time_control = None
         self.white_time = 600
         self.black_time = 600
-        self.last_time_update = None
+        self.turn_started = None
+        self.clock_job = None
+        self.clock_texts = {}
         self.game_active = False
+        self.game_result = '*'
+        self.explorer = None
+        self.explorer_request = 0
+        self.analysis = None
+        self.mate_request = 0
+        self.square_size = 100
+        self.piece_images = None
+        self.render_stats = {'redraws': 0, 'squares_painted': 0, 'clicks': 0,
+                             'last_click_ms': 0.0, 'max_click_ms': 0.0, 'total_click_ms': 0.0}
+        self.profile_overlay = PROFILER.enabled
+        self.profile_items = None
+        self.profile_job = None
 
         self.show_mode_selection()
 
@@ -658,6 +1572,12 @@ class ChessGame:
                bg='#3498db', fg='white', command=lambda: self.start_game('local')).pack(pady=8)
         Button(frame, text="Play Online", font=("Arial", 16), width=20, height=2,
                bg='#9b59b6', fg='white', command=lambda: self.start_game('online')).pack(pady=8)
+        simul_frame = Frame(frame, bg='#2c3e50')
+        simul_frame.pack(pady=8)
+        Label(simul_frame, text="Simul vs Bots:", font=("Arial", 14), bg='#2c3e50', fg='white').pack(side='left', padx=5)
+        for difficulty, color in (('easy', '#27ae60'), ('medium', '#f39c12'), ('hard', '#e74c3c')):
+            Button(simul_frame, text=difficulty.title(), font=("Arial", 12), width=8, bg=color, fg='white',
+                   command=lambda d=difficulty: self.start_simul(d)).pack(side='left', padx=3)
 
         # Time control
         tc_frame = Frame(frame, bg='#2c3e50')
@@ -683,10 +1603,19 @@ class ChessGame:
         else:
             messagebox.showinfo("Time Control", "No time limit set")
 
+    def start_simul(self, difficulty='medium'):
+        """Play several bots at once; their moves come from a small shared engine pool."""
+        from chess_simul import SimulGame
+
+        for widget in self.parent.winfo_children():
+            widget.destroy()
+        SimulGame(self.parent, difficulty=difficulty, on_exit=self.show_mode_selection)
+
     def start_game(self, mode):
         """Start game."""
         self.game_mode = mode
         self.game_active = True
+        self.game_result = '*'
 
         if mode.startswith('bot'):
             difficulty = mode.split('_')[1]
@@ -707,15 +1636,19 @@ class ChessGame:
 
         self.create_gui()
 
-        if self.time_control:
-            self.last_time_update = time.time()
-            self.update_clocks()
+        # Online clocks start with the server's first CLOCK snapshot
+        if self.time_control and mode != 'online':
+            self.start_clock()
 
     def connect_online(self):
         """Connect to server."""
         try:
-            self.online_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self.online_socket.connect(('127.0.0.1', 5001))
+            self.online_socket = socket.create_connection(ONLINE_SERVER)
+            self.is_white = None
+            self.online_token = 0
+            self.online_pending = {}
+            self.online_resend = False
+            self.send_online_frame(pack_hello, 0, self.time_control or 0)
             threading.Thread(target=self.receive_online_moves, daemon=True).start()
             messagebox.showinfo("Online", "Connected to game server!")
             return True
@@ -723,46 +1656,177 @@ class ChessGame:
             messagebox.showerror("Connection Error", f"Could not connect:\n{e}")
             return False
 
+    def send_online_frame(self, pack, *args):
+        """Send one protocol frame built by pack(seq, *args); returns its sequence number."""
+        with self.online_send_lock:
+            sock = self.online_socket
+            if sock is None:
+                raise ConnectionError("not connected")
+            self.online_send_seq += 1
+            seq = self.online_send_seq
+            sock.sendall(pack(seq, *args))
+        return seq
+
     def receive_online_moves(self):
-        """Receive moves from opponent."""
-        buffer = b""
+        """Receive frames from the server (background thread)."""
+        frames = FrameBuffer()
         while True:
+            sock = self.online_socket
+            if sock is None:
+                break   # left the game
             try:
-                data = self.online_socket.recv(1024)
-                if not data:
+                if not frames.recv_into(sock):
+                    raise ConnectionError("server closed the connection")
+                for msg_type, seq, payload in frames.frames():
+                    self.handle_online_frame(msg_type, seq, payload)
+            except (OSError, ProtocolError) as e:
+                print(f"Online receive error: {e}")
+                if not self.reconnect_online():
                     break
-                buffer += data
+                frames = FrameBuffer()
+
+    def handle_online_frame(self, msg_type, seq, payload):
+        """Decode one frame in the receive thread and hand the work to Tk."""
+        if msg_type == MSG_MOVE:
+            self.send_online_frame(pack_ack, seq)
+            move = decode_move(unpack_u16(payload), not self.is_white)
+            self.parent.after(0, self.handle_online_move, *move)
+        elif msg_type == MSG_ACK:
+            self.online_pending.pop(unpack_u32(payload), None)
+        elif msg_type == MSG_PING:
+            # Answer at once from this thread so Tk latency does not inflate the RTT
+            self.send_online_frame(pack_pong, unpack_u64(payload))
+        elif msg_type == MSG_CLOCK:
+            self.parent.after(0, self.apply_clock_snapshot, *unpack_clock(payload), time.monotonic())
+        elif msg_type == MSG_COLOR:
+            white, self.online_token = unpack_color(payload)
+            self.is_white = white
+            self.parent.after(0, self.set_online_color, 'white' if white else 'black')
+        elif msg_type == MSG_RESYNC:
+            self.parent.after(0, self.resync_online, *unpack_resync(payload))
+        elif msg_type == MSG_CHAT:
+            self.parent.after(0, self.display_chat_message, unpack_text(payload), False)
+        elif msg_type == MSG_ERROR:
+            self.parent.after(0, self.display_server_message, "ERROR:" + unpack_text(payload))
+        elif msg_type == MSG_GAMEOVER:
+            self.parent.after(0, self.display_server_message, "GAMEOVER:" + unpack_text(payload))
+
+    def reconnect_online(self):
+        """Reconnect after the connection dropped and resume the session.
+
+        The server answers HELLO with a RESYNC; resync_online then resends
+        whatever moves of ours the server never received.
+        """
+        if not self.online_token or self.online_socket is None or not self.game_active:
+            return False
 
-                while b"\n" in buffer:
-                    line, buffer = buffer.split(b"\n", 1)
-                    msg = line.decode('utf-8')
+        for attempt in range(RECONNECT_ATTEMPTS):
+            time.sleep(min(0.5 * 2 ** attempt, 4))
+            try:
+                sock = socket.create_connection(ONLINE_SERVER, timeout=5)
+                sock.settimeout(None)
+            except OSError:
+                continue
+            old, self.online_socket = self.online_socket, sock
+            if old is not None:
+                try:
+                    old.close()
+                except OSError:
+                    pass
+            self.online_resend = True
+            self.send_online_frame(pack_hello, self.online_token)
+            print("[ONLINE] Reconnected, waiting for the server to resync")
+            return True
+        return False
 
-                    if msg.startswith("CHAT:"):
-                        chat_msg = msg[5:]
-                        self.parent.after(0, lambda m=chat_msg: self.display_chat_message(m, False))
-                    else:
-                        parts = msg.split(',')
-                        if len(parts) >= 4:
-                            from_r, from_c, to_r, to_c = map(int, parts[:4])
-                            promotion = parts[4] if len(parts) > 4 and parts[4] else None
-                            self.parent.after(0, lambda: self.handle_online_move(from_r, from_c, to_r, to_c, promotion))
-            except Exception as e:
-                print(f"Online receive error: {e}")
+    def resync_online(self, move_count, fen, moves=()):
+        """Adopt the server's position after a reconnect or a rejected move.
+
+        The game is replayed from its start through the server's moves (or our
+        own first move_count moves if the list did not fit in the frame), so the
+        move list and PGN survive. After a reconnect, our moves past the
+        server's count never reached it and are sent again in order; after a
+        rejection they are dropped.
+        """
+        board = self.board
+        history = board.move_history
+        if len(moves) != move_count:
+            moves = history[:move_count]
+        resend = ()
+        if self.online_resend and tuple(history[:move_count]) == tuple(moves):
+            resend = history[move_count:]
+        self.online_resend = False
+        self.online_pending = {}
+        if len(history) == move_count and board.get_fen() == fen:
+            return
+
+        if board.start_fen:
+            board.set_fen(board.start_fen)
+        else:
+            board.reset_board()
+        for move in moves:
+            if not board.make_move(*decode_move(move, board.current_turn == 'white')):
+                break
+        if board.get_fen() != fen:
+            board.set_fen(fen)  # our game diverged from the server's; its moves are unknown here
+        for move in resend:
+            if not board.make_move(*decode_move(move, board.current_turn == 'white')):
                 break
+            try:
+                seq = self.send_online_frame(pack_move, move)
+            except OSError as e:
+                print(f"Online send error: {e}")  # still past the server's count; resent after the next reconnect
+                continue
+            self.online_pending[seq] = move
 
+        self.selected_square = None
+        self.valid_moves_highlight = []
+        self.premove = None
+        self.draw_board()
+        self.update_turn_label()
+        self.update_move_history()
+        self.display_server_message(f"Position resynced after move {move_count}.")
+
+    def set_online_color(self, color):
+        """Server assigned our color for the online game."""
+        self.is_white = color == 'white'
+        self.display_server_message(f"You are playing {color}.")
+
+    def apply_clock_snapshot(self, white_ms, black_ms, running, received):
+        """Adopt the server's clocks; the running one is interpolated locally from receipt."""
+        self.white_time = white_ms / 1000
+        self.black_time = black_ms / 1000
+        self.turn_started = received if running else None
+        self.clock_texts = {}
+        self.update_clocks()
+
+    def display_server_message(self, msg):
+        """Show a message from the game server in the chat panel."""
+        if msg.startswith("GAMEOVER:"):
+            self.end_game(msg[9:].split()[0])
+        if hasattr(self, 'chat_text'):
+            self.chat_text.config(state='normal')
+            self.chat_text.insert('end', "Server: " + msg + "\n")
+            self.chat_text.see('end')
+            self.chat_text.config(state='disabled')
+
+    @profiled_action('online_move')
     def handle_online_move(self, from_r, from_c, to_r, to_c, promotion=None):
         """Handle received move."""
         if self.board.make_move(from_r, from_c, to_r, to_c, promotion):
+            self.switch_clock()
             self.draw_board()
             self.update_move_history()
-            self.check_game_over()
+            self.update_explorer()
+            if not self.check_game_over():
+                self.play_premove()
 
     def send_online_move(self, from_r, from_c, to_r, to_c, promotion=None):
         """Send move to opponent."""
         try:
-            promo_str = promotion if promotion else ""
-            move_str = f"{from_r},{from_c},{to_r},{to_c},{promo_str}\n"
-            self.online_socket.sendall(move_str.encode('utf-8'))
+            move = encode_move(from_r, from_c, to_r, to_c, promotion)
+            seq = self.send_online_frame(pack_move, move)
+            self.online_pending[seq] = move
         except Exception as e:
             print(f"Online send error: {e}")
 
@@ -773,7 +1837,7 @@ class ChessGame:
         msg = self.chat_entry.get().strip()
         if msg:
             try:
-                self.online_socket.sendall(f"CHAT:{msg}\n".encode('utf-8'))
+                self.send_online_frame(partial(pack_text, MSG_CHAT), msg)
                 self.display_chat_message(msg, True)
                 self.chat_entry.delete(0, 'end')
             except Exception as e:
@@ -807,6 +1871,7 @@ class ChessGame:
         self.turn_label.pack(side='left', padx=20)
 
         # Time display
+        self.clock_texts = {}
         if self.time_control:
             time_frame = Frame(info_frame, bg='#34495e')
             time_frame.pack(side='left', padx=20)
@@ -825,9 +1890,14 @@ class ChessGame:
                command=self.back_to_menu).pack(side='right', padx=5)
 
         # Board canvas
-        self.canvas = tk.Canvas(left_frame, width=800, height=800, bg='white')
+        self.canvas = tk.Canvas(left_frame, width=8 * self.square_size, height=8 * self.square_size, bg='white')
         self.canvas.pack(pady=5)
         self.canvas.bind('<Button-1>', self.on_square_click)
+        self.canvas.bind('<Button-3>', self.cancel_premove)
+        self.create_board_items()
+        self.parent.bind('<F12>', self.toggle_profile_overlay)
+        self.parent.bind('<Shift-F12>', self.dump_profile)
+        self.profile_items = None
 
         # Right panel
         right_frame = Frame(main_frame, bg='#2c3e50', width=280)
@@ -835,8 +1905,14 @@ class ChessGame:
         right_frame.pack_propagate(False)
 
         # Move history
-        Label(right_frame, text="Move History", font=("Arial", 14, "bold"),
-              bg='#2c3e50', fg='white').pack(pady=5)
+        self.history_label = Label(right_frame, text="Move History", font=("Arial", 14, "bold"),
+                                   bg='#2c3e50', fg='white')
+        self.history_label.pack(pady=5)
+        self.history_board = None
+        self.history_notation = []  # SAN of every ply, so any page can be redrawn
+        self.history_marks = {}     # ply -> (symbol, tag) from the game analysis
+        self.history_page = None    # page being viewed; None follows the latest moves
+        self.history_view = None    # (page, plies drawn) currently in the widget
 
         history_frame = Frame(right_frame, bg='#2c3e50')
         history_frame.pack(fill='both', expand=True, pady=5)
@@ -849,6 +1925,29 @@ class ChessGame:
                                  yscrollcommand=scrollbar.set, state='disabled')
         self.history_text.pack(side='left', fill='both', expand=True)
         scrollbar.config(command=self.history_text.yview)
+        self.history_text.tag_configure('inaccuracy', foreground='#b7950b')
+        self.history_text.tag_configure('mistake', foreground='#e67e22')
+        self.history_text.tag_configure('blunder', foreground='#c0392b', font=("Courier", 11, "bold"))
+
+        page_frame = Frame(right_frame, bg='#2c3e50')
+        page_frame.pack()
+        Button(page_frame, text="<", font=("Arial", 10), width=2,
+               command=lambda: self.turn_history_page(-1)).pack(side='left')
+        self.history_page_label = Label(page_frame, text="Page 1/1", font=("Arial", 10),
+                                        bg='#2c3e50', fg='white', width=10)
+        self.history_page_label.pack(side='left')
+        Button(page_frame, text=">", font=("Arial", 10), width=2,
+               command=lambda: self.turn_history_page(1)).pack(side='left')
+
+        Button(right_frame, text="Export PGN", font=("Arial", 10), bg='#3498db', fg='white',
+               command=self.export_pgn).pack(pady=2)
+        Button(right_frame, text="Analyze Game", font=("Arial", 10), bg='#16a085', fg='white',
+               command=self.start_analysis).pack(pady=2)
+        Button(right_frame, text="Find Mate", font=("Arial", 10), bg='#8e44ad', fg='white',
+               command=self.find_mate).pack(pady=2)
+
+        # Opening explorer (only when an index has been built)
+        self.create_explorer_panel(right_frame)
 
         # Online chat
         if self.game_mode == 'online':
@@ -878,6 +1977,8 @@ class ChessGame:
                    bg='#3498db', fg='white', command=self.send_chat_message).pack(side='right', padx=2)
 
         self.draw_board()
+        if self.profile_overlay:
+            self.update_profile_overlay()
 
     def format_time(self, seconds):
         """Format time as MM:SS."""
@@ -885,40 +1986,99 @@ class ChessGame:
         secs = seconds % 60
         return f"{mins:02d}:{secs:02d}"
 
+    def start_clock(self):
+        """Start timing the side to move."""
+        self.turn_started = time.monotonic()
+        self.clock_texts = {}
+        self.update_clocks()
+
+    def stop_clock(self):
+        """Cancel the pending clock wake-up."""
+        if self.clock_job:
+            try:
+                self.parent.after_cancel(self.clock_job)
+            except tk.TclError:
+                pass
+            self.clock_job = None
+
+    def switch_clock(self, charge=True):
+        """Charge the elapsed turn time to the player who just moved (nothing for a premove)."""
+        if not self.time_control or self.turn_started is None:
+            return
+
+        now = time.monotonic()
+        elapsed = now - self.turn_started if charge else 0.0
+        self.turn_started = now
+
+        # current_turn has already switched, so the mover is the other side
+        if self.board.current_turn == 'black':
+            self.white_time = max(0, self.white_time - elapsed)
+        else:
+            self.black_time = max(0, self.black_time - elapsed)
+        self.update_clocks()
+
+    def remaining_time(self, color):
+        """Time left for a player, including the running turn."""
+        remaining = self.white_time if color == 'white' else self.black_time
+        if color == self.board.current_turn and self.turn_started is not None:
+            remaining -= time.monotonic() - self.turn_started
+        return max(0.0, remaining)
+
     def update_clocks(self):
-        """Update game clocks."""
+        """Refresh the clock labels and schedule one wake-up for the next visible change."""
+        self.stop_clock()
         if not self.game_active or not self.time_control:
             return
 
-        current_time = time.time()
-        if self.last_time_update:
-            elapsed = current_time - self.last_time_update
+        white = self.remaining_time('white')
+        black = self.remaining_time('black')
 
-            if self.board.current_turn == 'white':
-                self.white_time = max(0, self.white_time - elapsed)
-            else:
-                self.black_time = max(0, self.black_time - elapsed)
-
-            if self.white_time <= 0:
-                self.game_active = False
-                messagebox.showinfo("Time Out", "Black wins on time!")
+        # Online flags are decided by the server; a clock at zero waits for its GAMEOVER
+        if self.game_mode != 'online':
+            if white <= 0:
+                self.white_time = 0
+                self.set_clock_label('white', 0)
+                self.end_game('0-1', "Time Out", "Black wins on time!")
                 return
-            elif self.black_time <= 0:
-                self.game_active = False
-                messagebox.showinfo("Time Out", "White wins on time!")
+            elif black <= 0:
+                self.black_time = 0
+                self.set_clock_label('black', 0)
+                self.end_game('1-0', "Time Out", "White wins on time!")
                 return
 
-            if hasattr(self, 'white_time_label'):
-                self.white_time_label.config(text=self.format_time(int(self.white_time)))
-                self.black_time_label.config(text=self.format_time(int(self.black_time)))
+        self.set_clock_label('white', white)
+        self.set_clock_label('black', black)
 
-        self.last_time_update = current_time
-        self.parent.after(100, self.update_clocks)
+        # The display shows whole seconds, so the next change is when the running
+        # clock crosses the next second boundary (or reaches zero and flags)
+        running = white if self.board.current_turn == 'white' else black
+        until_change = running - math.floor(running) or 1.0
+        self.clock_job = self.parent.after(int(until_change * 1000) + 1, self.update_clocks)
 
-    def draw_board(self):
-        """Draw chess board."""
+    def set_clock_label(self, color, seconds):
+        """Update a clock label only when its text changes."""
+        label = getattr(self, f'{color}_time_label', None)
+        text = self.format_time(int(seconds))
+        if label is None or self.clock_texts.get(color) == text:
+            return
+        self.clock_texts[color] = text
+        try:
+            label.config(text=text)
+        except tk.TclError:
+            pass
+
+    def create_board_items(self):
+        """Create the persistent canvas items for squares, move markers and coordinates."""
         self.canvas.delete('all')
-        square_size = 100
+        self.square_items = {}
+        self.marker_items = {}
+        self.piece_items = {}
+        self.free_piece_items = []
+        self.piece_item_kinds = {}
+        self.drawn_squares = {}
+        if self.piece_images is None:
+            self.piece_images = PieceImageCache(self.parent)
+        square_size = self.square_size
 
         for row in range(8):
             for col in range(8):
@@ -926,54 +2086,217 @@ class ChessGame:
                 y1 = row * square_size
                 x2 = x1 + square_size
                 y2 = y1 + square_size
+                cx, cy = x1 + square_size // 2, y1 + square_size // 2
 
-                color = '#f0d9b5' if (row + col) % 2 == 0 else '#b58863'
+                self.square_items[(row, col)] = self.canvas.create_rectangle(
+                    x1, y1, x2, y2, fill=self.square_color(row, col), outline='')
 
-                if self.selected_square == (row, col):
-                    color = '#baca44'
-
-                if (row, col) in self.valid_moves_highlight:
-                    color = '#a0ca44'
-
-                self.canvas.create_rectangle(x1, y1, x2, y2, fill=color, outline='')
-
-                # Green dots for valid moves
-                if (row, col) in self.valid_moves_highlight:
-                    cx, cy = x1 + 50, y1 + 50
-                    piece_at_dest = self.board.get_piece(row, col)
-                    if piece_at_dest == '.':
-                        self.canvas.create_oval(cx - 10, cy - 10, cx + 10, cy + 10, fill='#20a020', outline='')
-                    else:
-                        self.canvas.create_oval(x1 + 5, y1 + 5, x2 - 5, y2 - 5, outline='#20a020', width=4)
-
-                # Draw piece
-                piece = self.board.get_piece(row, col)
-                if piece != '.':
-                    symbol = PIECES.get(piece, '')
-                    self.canvas.create_text(x1 + 50, y1 + 50, text=symbol,
-                                            font=("Arial", 60), fill='black')
+                # Green dot for quiet moves, ring for captures; hidden until needed
+                dot = self.canvas.create_oval(cx - 10, cy - 10, cx + 10, cy + 10,
+                                              fill='#20a020', outline='', state='hidden')
+                ring = self.canvas.create_oval(x1 + 5, y1 + 5, x2 - 5, y2 - 5,
+                                               outline='#20a020', width=4, state='hidden')
+                self.marker_items[(row, col)] = (dot, ring)
 
         # Coordinates
         for i in range(8):
-            self.canvas.create_text(i * 100 + 50, 810, text=chr(97 + i),
-                                    font=("Arial", 14), fill='black')
-            self.canvas.create_text(10, i * 100 + 50, text=str(8 - i),
-                                    font=("Arial", 14), fill='black')
+            self.canvas.create_text(i * square_size + square_size // 2, 8 * square_size + 10, text=chr(97 + i),
+                                    font=("Arial", 14), fill='black', tags=('coord',))
+            self.canvas.create_text(10, i * square_size + square_size // 2, text=str(8 - i),
+                                    font=("Arial", 14), fill='black', tags=('coord',))
+
+    def place_piece_item(self, item, piece, row, col):
+        """Move a piece item to a square, switching its sprite or glyph if needed.
+
+        Creates the item when item is None and returns it.
+        """
+        size = self.square_size
+        cx, cy = col * size + size // 2, row * size + size // 2
+        image = self.piece_images.get(piece, size)
+
+        if item is None:
+            if image:
+                item = self.canvas.create_image(cx, cy, image=image, tags=('piece',))
+            else:
+                item = self.canvas.create_text(cx, cy, text=PIECES.get(piece, ''), font=("Arial", size * 3 // 5),
+                                               fill='black', tags=('piece',))
+            self.canvas.tag_raise('coord')
+            self.piece_item_kinds[item] = piece
+            return item
+
+        self.canvas.coords(item, cx, cy)
+        if self.piece_item_kinds.get(item) != piece:
+            if image:
+                self.canvas.itemconfigure(item, image=image, state='normal')
+            else:
+                self.canvas.itemconfigure(item, text=PIECES.get(piece, ''), state='normal')
+            self.piece_item_kinds[item] = piece
+        else:
+            self.canvas.itemconfigure(item, state='normal')
+        return item
+
+    def square_color(self, row, col, highlight=None):
+        """Fill color of a square for its highlight state."""
+        if highlight in ('move', 'capture'):
+            return '#a0ca44'
+        if highlight == 'selected':
+            return '#baca44'
+        if highlight == 'premove':
+            return '#c77c6b'
+        return '#f0d9b5' if (row + col) % 2 == 0 else '#b58863'
+
+    def draw_board(self):
+        """Draw chess board, reconfiguring only squares whose piece or highlight changed."""
+        selected = self.selected_square
+        targets = set(self.valid_moves_highlight)
+        premove = (self.premove[:2], self.premove[2:4]) if self.premove else ()
+        drawn = self.drawn_squares
+        painted = 0
+        vacated = {}
+        arrivals = []
 
+        for row in range(8):
+            board_row = self.board.board[row]
+            for col in range(8):
+                square = (row, col)
+                piece = board_row[col]
+
+                highlight = None
+                if square in targets:
+                    highlight = 'move' if piece == '.' else 'capture'
+                elif square == selected:
+                    highlight = 'selected'
+                elif square in premove:
+                    highlight = 'premove'
+
+                state = (piece, highlight)
+                if drawn.get(square) == state:
+                    continue
+                old_piece, old_highlight = drawn.get(square, (None, None))
+                drawn[square] = state
+                painted += 1
+
+                if highlight != old_highlight:
+                    dot, ring = self.marker_items[square]
+                    self.canvas.itemconfigure(self.square_items[square],
+                                              fill=self.square_color(row, col, highlight))
+                    self.canvas.itemconfigure(dot, state='normal' if highlight == 'move' else 'hidden')
+                    self.canvas.itemconfigure(ring, state='normal' if highlight == 'capture' else 'hidden')
+                if piece != old_piece:
+                    item = self.piece_items.pop(square, None)
+                    if item is not None:
+                        vacated.setdefault(old_piece, []).append(item)
+                    if piece != '.':
+                        arrivals.append((square, piece))
+
+        # Reuse the items of pieces that left a square: same piece first (a plain move
+        # just moves its item), then any other freed item, and only then create one.
+        for (row, col), piece in arrivals:
+            if vacated.get(piece):
+                item = vacated[piece].pop()
+            else:
+                item = next((items.pop() for items in vacated.values() if items), None)
+                if item is None and self.free_piece_items:
+                    item = self.free_piece_items.pop()
+            self.piece_items[(row, col)] = self.place_piece_item(item, piece, row, col)
+
+        for items in vacated.values():
+            for item in items:
+                self.canvas.itemconfigure(item, state='hidden')
+                self.free_piece_items.append(item)
+
+        self.render_stats['redraws'] += 1
+        self.render_stats['squares_painted'] += painted
+
+    def _record_paint_latency(self, click_time):
+        """Idle callback after a click: record how long until the board was repainted."""
+        elapsed_ms = (time.perf_counter() - click_time) * 1000
+        stats = self.render_stats
+        stats['clicks'] += 1
+        stats['last_click_ms'] = elapsed_ms
+        stats['max_click_ms'] = max(stats['max_click_ms'], elapsed_ms)
+        stats['total_click_ms'] += elapsed_ms
+        if RENDER_DEBUG:
+            print(f"[RENDER] click-to-paint {elapsed_ms:.1f} ms "
+                  f"(avg {stats['total_click_ms'] / stats['clicks']:.1f} ms, "
+                  f"{stats['squares_painted']} squares over {stats['redraws']} redraws)")
+
+    def toggle_profile_overlay(self, event=None):
+        """F12: show or hide the profiler overlay; counters run only while it is shown."""
+        self.profile_overlay = not self.profile_overlay
+        if self.profile_overlay:
+            PROFILER.enable()
+            self.update_profile_overlay()
+            return
+        PROFILER.disable()
+        if self.profile_job:
+            self.parent.after_cancel(self.profile_job)
+            self.profile_job = None
+        if self.profile_items:
+            for item in self.profile_items:
+                self.canvas.itemconfigure(item, state='hidden')
+
+    def update_profile_overlay(self):
+        """Redraw the profiler overlay in the board's top-left corner and schedule the next refresh."""
+        self.profile_job = None
+        if not self.profile_overlay:
+            return
+        stats = self.render_stats
+        lines = PROFILER.report_lines()
+        lines.append(f"click-to-paint {stats['last_click_ms']:.1f} ms "
+                     f"(max {stats['max_click_ms']:.1f}), {stats['redraws']} redraws  [Shift+F12: save JSON]")
+
+        if self.profile_items is None:
+            background = self.canvas.create_rectangle(0, 0, 0, 0, fill='black', stipple='gray50',
+                                                      outline='', tags='profile')
+            text = self.canvas.create_text(8, 8, anchor='nw', font=("Courier", 9), fill='#f1c40f', tags='profile')
+            self.profile_items = (background, text)
+        background, text = self.profile_items
+        self.canvas.itemconfigure(text, text='\n'.join(lines), state='normal')
+        x1, y1, x2, y2 = self.canvas.bbox(text)
+        self.canvas.coords(background, x1 - 4, y1 - 4, x2 + 4, y2 + 4)
+        self.canvas.itemconfigure(background, state='normal')
+        self.canvas.tag_raise('profile')
+        self.profile_job = self.parent.after(PROFILE_REFRESH_MS, self.update_profile_overlay)
+
+    def dump_profile(self, event=None):
+        """Shift+F12: save the profiler counters, recent actions and render stats as JSON."""
+        path = filedialog.asksaveasfilename(parent=self.parent, defaultextension='.json',
+                                            initialfile='chess_profile.json',
+                                            filetypes=[("JSON files", "*.json"), ("All files", "*.*")])
+        if not path:
+            return
+        try:
+            PROFILER.dump(path, render=self.render_stats)
+        except OSError as e:
+            messagebox.showerror("Save Profile", f"Could not save profile:\n{e}")
+
+    @profiled_action('click')
     def on_square_click(self, event):
         """Handle square click."""
         if not self.game_active:
             return
 
-        if self.game_mode == 'online' and self.board.current_turn == 'black':
+        click_time = time.perf_counter()
+
+        # Online: wait for the server to assign a color
+        if self.game_mode == 'online' and self.is_white is None:
             return
 
-        col = event.x // 100
-        row = event.y // 100
+        col = event.x // self.square_size
+        row = event.y // self.square_size
 
         if not (0 <= row < 8 and 0 <= col < 8):
             return
 
+        # While the bot or the online opponent is to move, clicks queue a premove
+        color = self.player_color()
+        if color and self.board.current_turn != color:
+            self.select_premove(row, col, color)
+            self.draw_board()
+            self.parent.after_idle(self._record_paint_latency, click_time)
+            return
+
         if self.selected_square is None:
             piece = self.board.get_piece(row, col)
             if piece != '.':
@@ -995,18 +2318,8 @@ class ChessGame:
                     promotion_piece = self.ask_promotion(self.board.is_white_piece(piece))
 
             if self.board.make_move(from_row, from_col, row, col, promotion_piece):
-                if self.game_mode == 'online':
-                    self.send_online_move(from_row, from_col, row, col, promotion_piece)
-
-                self.selected_square = None
-                self.valid_moves_highlight = []
-                self.draw_board()
-                self.update_turn_label()
-                self.update_move_history()
-
-                if not self.check_game_over():
-                    if self.game_mode and self.game_mode.startswith('bot'):
-                        self.parent.after(500, self.make_ai_move)
+                self.switch_clock()
+                self.finish_player_move(from_row, from_col, row, col, promotion_piece)
             else:
                 piece_clicked = self.board.get_piece(row, col)
                 if piece_clicked != '.':
@@ -1022,6 +2335,116 @@ class ChessGame:
                     self.valid_moves_highlight = []
 
         self.draw_board()
+        self.parent.after_idle(self._record_paint_latency, click_time)
+
+    def finish_player_move(self, from_row, from_col, to_row, to_col, promotion_piece):
+        """After our move is on the board: send it, repaint and hand the turn over."""
+        if self.game_mode == 'online':
+            self.send_online_move(from_row, from_col, to_row, to_col, promotion_piece)
+
+        self.selected_square = None
+        self.valid_moves_highlight = []
+        self.draw_board()
+        self.update_turn_label()
+        self.update_move_history()
+        self.update_explorer()
+
+        if not self.check_game_over():
+            if self.game_mode and self.game_mode.startswith('bot'):
+                self.parent.after(500, self.make_ai_move)
+
+    def player_color(self):
+        """Our side in bot and online games (None in local games, where both sides are ours)."""
+        if self.game_mode == 'online':
+            return None if self.is_white is None else ('white' if self.is_white else 'black')
+        if self.game_mode and self.game_mode.startswith('bot'):
+            return 'white'
+        return None
+
+    def find_mate(self):
+        """Look for a forced mate for the side to move in the background; the hint selects its first move."""
+        color = self.player_color()
+        if not self.game_active or (color and self.board.current_turn != color):
+            return
+        self.mate_request += 1
+        fen = self.board.get_fen()
+        self.turn_label.config(text="Looking for mate...")
+        threading.Thread(target=self._search_mate, args=(self.mate_request, fen), daemon=True).start()
+
+    def _search_mate(self, request, fen):
+        """Worker thread: run the proof-number solver on a copy of the position."""
+        from chess_mate import MateSolver
+        result = MateSolver(MATE_HINT_TABLE, MATE_HINT_SECONDS).solve(fen, MATE_HINT_MOVES)
+        self.parent.after(0, self.show_mate_hint, request, fen, result)
+
+    def show_mate_hint(self, request, fen, result):
+        """Show the mating line and select its first move, unless the position has changed since."""
+        if request != self.mate_request or self.board.get_fen() != fen:
+            return
+        try:
+            if result['status'] == 'mate' and result['move']:
+                from_row, from_col, to_row, to_col, _ = result['move']
+                self.selected_square = (from_row, from_col)
+                self.valid_moves_highlight = [(to_row, to_col)]
+                self.draw_board()
+                text = f"Mate in {result['mate']}: {' '.join(result['pv'])}"
+            elif result['status'] == 'timeout':
+                text = f"No mate found in {MATE_HINT_SECONDS:.0f}s"
+            else:
+                text = f"No forced mate in {MATE_HINT_MOVES}"
+            self.turn_label.config(text=text)
+        except tk.TclError:
+            pass
+
+    def select_premove(self, row, col, color):
+        """Click handling while waiting for the opponent: pick a piece, then its target."""
+        piece = self.board.get_piece(row, col)
+        own = piece != '.' and self.board.is_white_piece(piece) == (color == 'white')
+
+        if self.selected_square is not None and (row, col) in self.valid_moves_highlight:
+            from_row, from_col = self.selected_square
+            mover = self.board.get_piece(from_row, from_col)
+            promotion_piece = None
+            if mover.lower() == 'p' and row in (0, 7):
+                promotion_piece = self.ask_promotion(color == 'white')
+            self.premove = (from_row, from_col, row, col, promotion_piece)
+            self.selected_square = None
+            self.valid_moves_highlight = []
+        elif own and self.selected_square != (row, col):
+            self.premove = None
+            self.selected_square = (row, col)
+            self.valid_moves_highlight = self.board.premove_targets(row, col)
+        else:
+            self.cancel_premove()
+
+    def cancel_premove(self, event=None):
+        """Drop the queued premove and any premove selection (right click)."""
+        if self.premove is None and self.selected_square is None:
+            return
+        self.premove = None
+        if self.board.current_turn != self.player_color():
+            self.selected_square = None
+            self.valid_moves_highlight = []
+        self.draw_board()
+
+    def play_premove(self):
+        """Play the queued premove the moment the opponent's move is on the board.
+
+        ChessBoard validates it against the new position; an illegal premove is
+        simply dropped. It is played inside the same Tk callback that applied the
+        opponent's move and charges no time to our clock.
+        """
+        premove, self.premove = self.premove, None
+        self.selected_square = None
+        self.valid_moves_highlight = []
+        if premove is None or not self.game_active:
+            return False
+        if not self.board.make_move(*premove):
+            self.draw_board()
+            return False
+        self.switch_clock(charge=False)
+        self.finish_player_move(*premove)
+        return True
 
     def ask_promotion(self, is_white):
         """Ask for promotion piece."""
@@ -1052,6 +2475,7 @@ class ChessGame:
         dialog.wait_window()
         return result[0] if result[0] else ('Q' if is_white else 'q')
 
+    @profiled_action('ai_move')
     def make_ai_move(self):
         """Make AI move using Stockfish."""
         if not self.game_active:
@@ -1085,10 +2509,13 @@ class ChessGame:
 
             # Make move
             if self.board.make_move(from_row, from_col, to_row, to_col, promotion_piece):
+                self.switch_clock()
                 self.draw_board()
                 self.update_turn_label()
                 self.update_move_history()
-                self.check_game_over()
+                self.update_explorer()
+                if not self.check_game_over():
+                    self.play_premove()
 
         except Exception as e:
             print(f"[AI] Error making move: {e}")
@@ -1104,46 +2531,262 @@ class ChessGame:
 
         self.turn_label.config(text=turn)
 
-    def update_move_history(self):
-        """Update move history."""
-        if not hasattr(self, 'history_text'):
+    def create_explorer_panel(self, parent):
+        """Create the opening explorer panel if an index file exists."""
+        from chess_explorer import OpeningIndex, DEFAULT_INDEX_PATH
+
+        if not os.path.exists(DEFAULT_INDEX_PATH):
             return
 
-        self.history_text.config(state='normal')
-        self.history_text.delete('1.0', 'end')
+        if self.explorer is None:
+            self.explorer = OpeningIndex(DEFAULT_INDEX_PATH)
 
-        for i, move in enumerate(self.board.move_history):
-            if i % 2 == 0:
-                move_num = (i // 2) + 1
-                self.history_text.insert('end', f"{move_num}. ")
+        Label(parent, text="Opening Explorer", font=("Arial", 14, "bold"),
+              bg='#2c3e50', fg='white').pack(pady=5)
+        self.explorer_text = Text(parent, width=30, height=8,
+                                  font=("Courier", 10), bg='#ecf0f1', fg='#2c3e50', state='disabled')
+        self.explorer_text.pack(fill='x', pady=5)
+        self.update_explorer()
+
+    def update_explorer(self):
+        """Look up explorer stats for the current position in a background thread."""
+        if not self.explorer or not hasattr(self, 'explorer_text'):
+            return
+
+        self.explorer_request += 1
+        request = self.explorer_request
+        snapshot = ChessBoard(self.board.get_fen())
+        threading.Thread(target=self._lookup_explorer, args=(request, snapshot), daemon=True).start()
+
+    def _lookup_explorer(self, request, board):
+        """Worker thread: query the index and hand the result back to Tk."""
+        from chess_explorer import format_stats
+
+        try:
+            stats = self.explorer.moves_for(board)
+            text = format_stats(stats) if stats else "No games in database."
+        except Exception as e:
+            print(f"[EXPLORER] Lookup error: {e}")
+            return
+        self.parent.after(0, lambda: self.show_explorer_stats(request, text))
+
+    def show_explorer_stats(self, request, text):
+        """Display explorer stats unless a newer position was requested."""
+        if request != self.explorer_request or not hasattr(self, 'explorer_text'):
+            return
+        try:
+            self.explorer_text.config(state='normal')
+            self.explorer_text.delete('1.0', 'end')
+            self.explorer_text.insert('end', text)
+            self.explorer_text.config(state='disabled')
+        except tk.TclError:
+            pass
 
-            self.history_text.insert('end', f"{move['notation']} ")
+    def update_move_history(self):
+        """Record new moves and redraw the history page; rebuild only if the game was reset."""
+        if not hasattr(self, 'history_text'):
+            return
 
+        # Notation comes from a replay board that follows the game; start over when
+        # the game no longer extends the moves already shown (new game, undo, resync)
+        history = self.board.move_history
+        replay = self.history_board
+        if replay is None or replay.start_fen != self.board.start_fen or \
+                replay.move_history != history[:len(replay.move_history)]:
+            replay = self.history_board = ChessBoard(self.board.start_fen)
+            self.history_notation = []
+            self.history_marks = {}
+            self.history_page = None
+            self.history_view = None
+            self.history_label.config(text="Move History")
+
+        for i in range(len(self.history_notation), len(history)):
+            self.history_notation.append(replay.play_move(history[i])['notation'])
+        self.show_history_page()
+
+    def history_last_page(self):
+        """Index of the last page of the move history."""
+        return max(0, len(self.history_notation) - 1) // (HISTORY_PAGE_MOVES * 2)
+
+    def turn_history_page(self, step):
+        """Show the previous (-1) or next (+1) page of the move history."""
+        last = self.history_last_page()
+        page = last if self.history_page is None else self.history_page
+        page = max(0, min(last, page + step))
+        self.history_page = None if page == last else page
+        self.show_history_page()
+
+    def show_history_page(self):
+        """Draw one page of the move history, appending to it when it is already shown."""
+        last = self.history_last_page()
+        page = last if self.history_page is None else min(self.history_page, last)
+        first = page * HISTORY_PAGE_MOVES * 2
+        end = min(len(self.history_notation), first + HISTORY_PAGE_MOVES * 2)
+
+        text = self.history_text
+        text.config(state='normal')
+        if self.history_view is None or self.history_view[0] != page:
+            text.delete('1.0', 'end')
+            drawn = first
+        else:
+            drawn = self.history_view[1]
+        for i in range(drawn, end):
+            if i % 2 == 0:
+                text.insert('end', f"{i // 2 + 1}. ")
+            text.insert('end', self.history_notation[i], f"ply{i}")
+            if i in self.history_marks:
+                text.insert('end', *self.history_marks[i])
+            text.insert('end', " ")
             if i % 2 == 1:
-                self.history_text.insert('end', "\n")
+                text.insert('end', "\n")
+        self.history_view = (page, end)
+
+        if self.history_page is None:
+            text.see('end')
+        text.config(state='disabled')
+        self.history_page_label.config(text=f"Page {page + 1}/{last + 1}")
+
+    def pgn_headers(self):
+        """PGN tags describing the current game."""
+        white, black = "White", "Black"
+        if self.game_mode and self.game_mode.startswith('bot'):
+            black = f"Stockfish ({self.game_mode.split('_')[1]})"
+        elif self.game_mode == 'online' and self.is_white is not None:
+            white, black = ("Me", "Opponent") if self.is_white else ("Opponent", "Me")
+        return {
+            'Event': "Chess Game",
+            'Site': "?",
+            'Date': time.strftime('%Y.%m.%d'),
+            'Round': "-",
+            'White': white,
+            'Black': black,
+        }
 
-        self.history_text.see('end')
-        self.history_text.config(state='disabled')
+    def export_pgn(self):
+        """Save the game as a PGN file."""
+        path = filedialog.asksaveasfilename(parent=self.parent, defaultextension='.pgn',
+                                            filetypes=[("PGN files", "*.pgn"), ("All files", "*.*")])
+        if not path:
+            return
+        try:
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(self.board.get_pgn(self.pgn_headers(), self.game_result))
+        except OSError as e:
+            messagebox.showerror("Export PGN", f"Could not save game:\n{e}")
 
     def check_game_over(self):
-        """Check if game is over."""
+        """Check if game is over on the board and end it if so."""
         if self.board.is_checkmate():
-            self.game_active = False
             winner = "Black" if self.board.current_turn == 'white' else "White"
-            messagebox.showinfo("Game Over", f"Checkmate! {winner} wins!")
-            return True
+            result = '0-1' if winner == "Black" else '1-0'
+            message = f"Checkmate! {winner} wins!"
         elif self.board.is_stalemate():
-            self.game_active = False
-            messagebox.showinfo("Game Over", "Stalemate! The game is a draw.")
-            return True
+            result = '1/2-1/2'
+            message = "Stalemate! The game is a draw."
         elif self.board.halfmove_clock >= 100:
-            self.game_active = False
-            messagebox.showinfo("Game Over", "Draw by 50-move rule!")
+            result = '1/2-1/2'
+            message = "Draw by 50-move rule!"
+        else:
+            if self.board.is_in_check():
+                self.turn_label.config(text=f"{self.board.current_turn.capitalize()} is in CHECK!")
+            return False
+
+        self.end_game(result, "Game Over", message)
+        return True
+
+    def end_game(self, result, title=None, message=None):
+        """Finish the game however it ended (board, clock or server) and analyze it in the background.
+
+        A result that arrives for a game already over (the server's GAMEOVER
+        after a mate on the board) only updates game_result.
+        """
+        was_active = self.game_active
+        self.game_active = False
+        self.game_result = result
+        self.stop_clock()
+        if not was_active:
+            return
+        if message:
+            messagebox.showinfo(title, message)
+        if self.engine_available():
+            self.start_analysis(automatic=True)
+
+    def engine_available(self):
+        """Whether Stockfish can be started, probed once per run (the bot's engine counts)."""
+        global _engine_available
+        if self.ai_engine and self.ai_engine.process:
             return True
-        elif self.board.is_in_check():
-            self.turn_label.config(text=f"{self.board.current_turn.capitalize()} is in CHECK!")
+        if _engine_available is None:
+            engine = StockfishEngine()
+            _engine_available = engine.process is not None
+            engine.close()
+        return _engine_available
+
+    def start_analysis(self, automatic=False):
+        """Analyze the game so far with a pool of engines; annotations stream into the history panel.
+
+        The automatic analysis after a game ends stays quiet if it fails;
+        only the "Analyze Game" button reports errors.
+        """
+        from chess_analysis import GameAnalysis
+
+        self.cancel_analysis()
+        if not self.board.move_history:
+            return
+        self.update_move_history()
 
-        return False
+        def on_annotation(note):
+            self.parent.after(0, self.show_annotation, analysis, note)
+
+        def on_done(finished):
+            self.parent.after(0, self.finish_analysis, finished, automatic)
+
+        analysis = GameAnalysis(self.board.move_history, self.board.start_fen,
+                                on_annotation=on_annotation, on_done=on_done)
+        self.analysis = analysis
+        self.history_label.config(text="Move History (analyzing...)")
+        analysis.start()
+
+    def cancel_analysis(self):
+        """Stop a running analysis; its remaining results are ignored."""
+        if self.analysis:
+            self.analysis.cancel()
+            self.analysis = None
+
+    def show_annotation(self, analysis, note):
+        """Mark one analyzed move (?!, ?, ??) in the history panel."""
+        if analysis is not self.analysis or not hasattr(self, 'history_text'):
+            return
+        try:
+            # Kept so the mark is redrawn when its page is shown again
+            if note['symbol']:
+                self.history_marks[note['ply']] = (note['symbol'], note['label'])
+            ranges = self.history_text.tag_ranges(f"ply{note['ply']}")
+            if note['symbol'] and ranges:
+                self.history_text.config(state='normal')
+                self.history_text.insert(ranges[1], note['symbol'], note['label'])
+                self.history_text.config(state='disabled')
+            self.history_label.config(text=f"Move History (analyzed {analysis.judged}/{analysis.total})")
+        except tk.TclError:
+            pass
+
+    def finish_analysis(self, analysis, automatic=False):
+        """Show the per-side summary once every move is judged."""
+        if analysis is not self.analysis or not hasattr(self, 'history_text'):
+            return
+        self.analysis = None
+        try:
+            if analysis.error:
+                self.history_label.config(text="Move History")
+                if not automatic:
+                    messagebox.showwarning("Analyze Game", f"Analysis failed: {analysis.error}")
+                return
+            summary = analysis.summary()
+            self.history_label.config(text="  ".join(
+                f"{color[0].upper()}: {s['blunder']}?? {s['mistake']}? {s['inaccuracy']}?! ACPL {s['acpl']:.0f}"
+                for color, s in summary.items()))
+        except tk.TclError:
+            pass
 
     def reset_game(self):
         """Reset game."""
@@ -1151,28 +2794,40 @@ class ChessGame:
             self.board.reset_board()
             self.selected_square = None
             self.valid_moves_highlight = []
+            self.premove = None
             self.game_active = True
+            self.game_result = '*'
+            self.cancel_analysis()
 
             if self.time_control:
                 self.white_time = self.time_control
                 self.black_time = self.time_control
-                self.last_time_update = time.time()
+                self.start_clock()
 
             self.draw_board()
             self.update_turn_label()
             self.update_move_history()
+            self.update_explorer()
 
     def back_to_menu(self):
         """Return to main menu."""
         if messagebox.askyesno("Exit Game", "Return to main menu?"):
             self.game_active = False
+            self.stop_clock()
+            self.cancel_analysis()
+            if self.profile_job:
+                self.parent.after_cancel(self.profile_job)
+                self.profile_job = None
+            self.parent.unbind('<F12>')
+            self.parent.unbind('<Shift-F12>')
 
             if self.ai_engine:
                 self.ai_engine.close()
 
             if self.online_socket:
+                sock, self.online_socket = self.online_socket, None
                 try:
-                    self.online_socket.close()
+                    sock.close()
                 except:
                     pass
 
@@ -0,0 +1,288 @@
+"""
+Post-game blunder analysis with a pool of engines.
+
+The game is replayed from its 16-bit move history and every position is
+handed to a pool of engine workers, one Stockfish process per worker thread.
+Positions are taken deepest ply first, so each engine's hash table carries
+what it learned about the later positions back into the earlier ones. Once
+the positions before and after a move are both scored, the move is judged by
+how far it dropped the mover's evaluation, and the annotation is passed to a
+callback right away. ChessGame uses this to stream ?!, ? and ?? marks into
+its history panel while the analysis runs in the background.
+
+Usage:
+    python chess_analysis.py game.pgn [--game 2] [--workers 4] [--depth 14 | --movetime 500]
+                             [--path ./stockfish] [-o annotated.pgn]
+"""
+
+import argparse
+import os
+import threading
+import time
+
+from chess import ChessBoard, StockfishEngine, read_pgn, format_pgn
+
+DEFAULT_WORKERS = 2
+DEFAULT_DEPTH = 12
+MATE_SCORE = 10000          # centipawns for mate now; mate in n scores MATE_SCORE - n
+EVAL_CLAMP = 1000           # beyond a decisive advantage, swings are not counted as errors
+# Centipawn loss thresholds, most severe first: (loss, label, symbol)
+JUDGEMENTS = [
+    (300, 'blunder', '??'),
+    (150, 'mistake', '?'),
+    (60, 'inaccuracy', '?!'),
+]
+
+
+def engine_score(result):
+    """Engine result -> centipawns for the side to move, with mates mapped near +/-MATE_SCORE."""
+    mate = result['mate']
+    if mate is None:
+        return result['score']
+    if mate > 0:
+        return MATE_SCORE - mate
+    return -MATE_SCORE - mate
+
+
+def format_score(cp):
+    """White-relative centipawns as '+1.25' or '#3' / '#-2' for mates."""
+    if abs(cp) > MATE_SCORE - 500:
+        moves = MATE_SCORE - abs(cp)
+        return f"#{moves}" if cp > 0 else f"#-{moves}"
+    return f"{cp / 100:+.2f}"
+
+
+class GameAnalysis:
+    """Background analysis of one game.
+
+    on_annotation(note) is called from a worker thread for every move, in
+    the order results arrive; note has 'ply', 'color', 'san', 'loss',
+    'before'/'after' (white-relative centipawns), 'best' (SAN of the
+    engine's choice), and 'label'/'symbol' for inaccuracies, mistakes and
+    blunders (None otherwise). on_done(analysis) is called once when all
+    workers have stopped; analysis.error is set if no engine could run.
+    """
+
+    def __init__(self, moves, start_fen=None, workers=DEFAULT_WORKERS, depth=DEFAULT_DEPTH, movetime=None,
+                 engine_factory=None, on_annotation=None, on_done=None):
+        self.depth = None if movetime else depth
+        self.movetime = movetime
+        self.workers = max(1, workers)
+        self.engine_factory = engine_factory or (lambda: StockfishEngine('hard'))
+        self.on_annotation = on_annotation
+        self.on_done = on_done
+
+        # Replay the game: position i is the one before move i
+        board = ChessBoard(start_fen)
+        self.positions = [board.get_fen()]
+        self.records = []
+        for move in moves:
+            record = board.play_move(move)
+            if record is None:
+                raise ValueError(f"Illegal move {move:#06x} at ply {len(self.records)}")
+            self.records.append(record)
+            self.positions.append(board.get_fen())
+        self.white_first = ChessBoard(start_fen).current_turn == 'white'
+        self.total = len(self.records)
+
+        self.scores = [None] * len(self.positions)      # centipawns for the side to move
+        self.best = [None] * len(self.positions)        # engine's move (UCI) in each position
+        self.annotations = [None] * self.total
+        self.judged = 0
+        self.pending = list(range(len(self.positions)))  # popped from the end: deepest first
+        self.error = None
+        self.elapsed = 0.0
+        self.searched = 0
+        self.nodes = 0
+
+        # The final position needs no engine when the game ended on the board
+        if not board.has_legal_moves():
+            self.scores[-1] = -MATE_SCORE if board.is_in_check() else 0
+            self.pending.pop()
+
+        self.lock = threading.Lock()
+        self.engines = []
+        self.running = 0
+        self.cancelled = False
+        self.started = None
+
+    def start(self):
+        """Start the worker threads and return immediately."""
+        self.started = time.perf_counter()
+        self.running = self.workers
+        for _ in range(self.workers):
+            threading.Thread(target=self._worker, daemon=True).start()
+
+    def cancel(self):
+        """Stop the workers after (or, via the UCI stop command, during) their current search."""
+        self.cancelled = True
+        with self.lock:
+            engines = list(self.engines)
+        for engine in engines:
+            engine.stop()
+
+    def wait(self, timeout=None):
+        """Block until every worker has finished (for headless use)."""
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        while self.running:
+            if deadline is not None and time.perf_counter() > deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def _worker(self):
+        engine = None
+        try:
+            engine = self.engine_factory()
+            if not engine.process:
+                self.error = "no chess engine found"
+                return
+            with self.lock:
+                self.engines.append(engine)
+            while not self.cancelled:
+                with self.lock:
+                    if not self.pending:
+                        break
+                    ply = self.pending.pop()
+                result = engine.analyze(self.positions[ply], self.depth, self.movetime)
+                if self.cancelled:
+                    break
+                if result is None or (result['score'] is None and result['mate'] is None):
+                    self.error = "engine returned no score"
+                    break
+                self._scored(ply, engine_score(result), result['best'], result['nodes'])
+        except Exception as e:
+            self.error = str(e)
+        finally:
+            if engine is not None:
+                engine.close()
+            with self.lock:
+                self.running -= 1
+                finished = self.running == 0
+            if finished:
+                self.elapsed = time.perf_counter() - self.started
+                if self.on_done and not self.cancelled:
+                    self.on_done(self)
+
+    def _scored(self, ply, score, best, nodes):
+        """Store a position's score and judge every move it completes."""
+        notes = []
+        with self.lock:
+            self.scores[ply] = score
+            self.best[ply] = best
+            self.searched += 1
+            self.nodes += nodes
+            for move in (ply - 1, ply):
+                if 0 <= move < self.total and self.annotations[move] is None \
+                        and self.scores[move] is not None and self.scores[move + 1] is not None:
+                    self.annotations[move] = note = self._judge(move)
+                    self.judged += 1
+                    notes.append(note)
+        if self.on_annotation:
+            for note in notes:
+                self.on_annotation(note)
+
+    def _judge(self, ply):
+        """Annotation for the move played at ply, from the scores before and after it."""
+        before = max(-EVAL_CLAMP, min(EVAL_CLAMP, self.scores[ply]))
+        after = max(-EVAL_CLAMP, min(EVAL_CLAMP, -self.scores[ply + 1]))
+        loss = max(0, before - after)
+        white = (ply % 2 == 0) == self.white_first
+        sign = 1 if white else -1
+
+        label = symbol = None
+        for threshold, name, mark in JUDGEMENTS:
+            if loss >= threshold:
+                label, symbol = name, mark
+                break
+
+        best = None
+        if label and self.best[ply]:
+            board = ChessBoard(self.positions[ply])
+            move = board.parse_uci(self.best[ply])
+            played = self.records[ply]['from'] + self.records[ply]['to']
+            if move and move[:4] != played and board.is_valid_move(*move[:4]):
+                best = board.get_san(*move)
+
+        return {'ply': ply, 'color': 'white' if white else 'black', 'san': self.records[ply]['notation'],
+                'loss': loss, 'before': sign * self.scores[ply], 'after': -sign * self.scores[ply + 1],
+                'best': best, 'label': label, 'symbol': symbol}
+
+    def summary(self):
+        """Per color: moves judged, average centipawn loss and the count of each judgement."""
+        summary = {}
+        for color in ('white', 'black'):
+            notes = [note for note in self.annotations if note and note['color'] == color]
+            entry = {'moves': len(notes), 'acpl': sum(n['loss'] for n in notes) / len(notes) if notes else 0.0}
+            for _, label, _ in JUDGEMENTS:
+                entry[label] = sum(1 for n in notes if n['label'] == label)
+            summary[color] = entry
+        return summary
+
+    def annotated_moves(self):
+        """SAN moves with judgement symbols and '{best ...}' comments, for format_pgn."""
+        moves = []
+        for record, note in zip(self.records, self.annotations):
+            san = record['notation']
+            if note and note['symbol']:
+                san += note['symbol']
+                comment = f"{format_score(note['before'])} -> {format_score(note['after'])}"
+                if note['best']:
+                    comment += f", best {note['best']}"
+                san += f" {{{comment}}}"
+            moves.append(san)
+        return moves
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find the inaccuracies, mistakes and blunders in a game.")
+    parser.add_argument('pgn')
+    parser.add_argument('--game', type=int, default=1, help="which game in the file (1-based)")
+    parser.add_argument('--workers', type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument('--depth', type=int, default=DEFAULT_DEPTH)
+    parser.add_argument('--movetime', type=int, help="ms per position instead of a fixed depth")
+    parser.add_argument('--path', help="Stockfish binary")
+    parser.add_argument('-o', '--output', help="write the annotated game as PGN")
+    args = parser.parse_args()
+
+    game = next((g for i, g in enumerate(read_pgn(args.pgn), 1) if i == args.game), None)
+    if game is None:
+        parser.error(f"{args.pgn} has no game {args.game}")
+    board = ChessBoard(game['headers'].get('FEN'))
+    for san in game['moves']:
+        move = board.parse_san(san)
+        if move is None or not board.make_move(*move):
+            parser.error(f"illegal move {san} at ply {len(board.move_history) + 1}")
+
+    def on_annotation(note):
+        if note['symbol']:
+            number = note['ply'] // 2 + 1 if analysis.white_first else (note['ply'] + 1) // 2 + 1
+            dots = '.' if note['color'] == 'white' else '...'
+            best = f", best {note['best']}" if note['best'] else ""
+            print(f"[ANALYSIS] {number}{dots} {note['san']}{note['symbol']}  "
+                  f"{format_score(note['before'])} -> {format_score(note['after'])}{best}")
+
+    analysis = GameAnalysis(board.move_history, board.start_fen, args.workers, args.depth, args.movetime,
+                            engine_factory=lambda: StockfishEngine('hard', args.path),
+                            on_annotation=on_annotation)
+    print(f"[ANALYSIS] {analysis.total} moves, {len(analysis.pending)} positions, {analysis.workers} engines")
+    analysis.start()
+    analysis.wait()
+    if analysis.error:
+        raise SystemExit(f"[ANALYSIS] Failed: {analysis.error}")
+
+    for color, s in analysis.summary().items():
+        print(f"[ANALYSIS] {color.capitalize():5}  {s['inaccuracy']} inaccuracies, {s['mistake']} mistakes, "
+              f"{s['blunder']} blunders, ACPL {s['acpl']:.0f}")
+    print(f"[ANALYSIS] {analysis.elapsed:.1f}s, {analysis.searched / analysis.elapsed:.1f} positions/s, "
+          f"{analysis.nodes / analysis.elapsed / 1000:.0f} knps")
+
+    if args.output:
+        headers = dict(game['headers'])
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(format_pgn(headers, analysis.annotated_moves(), game['result']))
+        print(f"[ANALYSIS] Annotated game -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
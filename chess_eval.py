@@ -0,0 +1,394 @@
+"""
+Vectorized batch evaluation of chess positions with NumPy.
+
+Positions are stored compactly as an (N, 64) uint8 array of piece codes
+(index = row * 8 + col with row 0 = rank 8, as in ChessBoard.board; codes
+follow PIECE_PLANES and EMPTY marks an empty square). From that the module
+builds the dense (N, 12, 64) piece-plane tensor and one uint64 bitboard per
+piece type, and computes every evaluation term for the whole batch at once:
+
+    material        piece counts, white minus black
+    piece-square    one table per piece type, mirrored for black
+    mobility        squares attacked by knights, bishops, rooks and queens that
+                    are not occupied by their own side (union per piece type,
+                    sliders via Kogge-Stone fills on the bitboards)
+    pawn structure  doubled, isolated and passed pawns, passed pawn advancement
+
+The evaluation is linear in EvalWeights, which is what chess_tune fits.
+Scores are centipawns from white's point of view unless the side to move is
+passed in.
+
+Usage:
+    python chess_eval.py eval "<FEN>"
+    python chess_eval.py bench [--positions 200000] [--epd positions.epd]
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from chess import read_epd
+
+PIECE_PLANES = 'PNBRQKpnbrqk'
+EMPTY = 12
+PIECE_TYPES = 'PNBRQK'
+MATERIAL_PIECES = 'PNBRQ'               # the king has no material value
+MOBILITY_PIECES = 'NBRQ'
+PAWN_TERMS = ('doubled', 'isolated', 'passed', 'passed_advance')
+
+# Byte -> piece code, so a 64-character board string converts in one lookup
+_CODE_LUT = np.full(256, 255, dtype=np.uint8)
+_CODE_LUT[ord('.')] = EMPTY
+for _code, _piece in enumerate(PIECE_PLANES):
+    _CODE_LUT[ord(_piece)] = _code
+
+_FEN_DIGITS = str.maketrans({str(n): '.' * n for n in range(1, 9)} | {'/': ''})
+_SQUARES = np.arange(64)
+
+# Piece-square lookup: code and square -> index into the flattened (6, 64) table,
+# with black pieces reading the vertically mirrored square and counting negative.
+# Empty squares point at an extra zero entry.
+_PST_INDEX = np.full((13, 64), 6 * 64, dtype=np.intp)
+_PST_SIGN = np.zeros(13, dtype=np.int8)
+for _p in range(6):
+    _PST_INDEX[_p] = _p * 64 + _SQUARES
+    _PST_INDEX[_p + 6] = _p * 64 + (_SQUARES ^ 56)
+    _PST_SIGN[_p], _PST_SIGN[_p + 6] = 1, -1
+
+# Bitboard masks (bit index = row * 8 + col, row 0 = rank 8)
+_U64 = np.uint64
+FILE_MASKS = np.array([sum(1 << (row * 8 + col) for row in range(8)) for col in range(8)], dtype=np.uint64)
+ROW_MASKS = np.array([0xFF << (row * 8) for row in range(8)], dtype=np.uint64)
+_NOT_A = ~FILE_MASKS[0]
+_NOT_H = ~FILE_MASKS[7]
+_NOT_AB = ~(FILE_MASKS[0] | FILE_MASKS[1])
+_NOT_GH = ~(FILE_MASKS[6] | FILE_MASKS[7])
+_ALL = _U64(0xFFFFFFFFFFFFFFFF)
+
+# Sliding directions as (shift, towards higher bits, wrap mask)
+_ROOK_DIRECTIONS = ((8, False, _ALL), (8, True, _ALL), (1, True, _NOT_A), (1, False, _NOT_H))
+_BISHOP_DIRECTIONS = ((7, False, _NOT_A), (9, False, _NOT_H), (9, True, _NOT_A), (7, True, _NOT_H))
+_KNIGHT_JUMPS = ((15, False, _NOT_A), (17, False, _NOT_H), (6, False, _NOT_AB), (10, False, _NOT_GH),
+                 (10, True, _NOT_AB), (6, True, _NOT_GH), (17, True, _NOT_A), (15, True, _NOT_H))
+
+# Popcount per byte, used when numpy lacks bitwise_count (numpy < 2.0)
+_BYTE_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+# Default weights: classic piece values and the "simplified evaluation function"
+# piece-square tables, written from white's side with rank 8 first
+DEFAULT_MATERIAL = [100, 320, 330, 500, 900]
+DEFAULT_PST = [
+    [0, 0, 0, 0, 0, 0, 0, 0,
+     50, 50, 50, 50, 50, 50, 50, 50,
+     10, 10, 20, 30, 30, 20, 10, 10,
+     5, 5, 10, 25, 25, 10, 5, 5,
+     0, 0, 0, 20, 20, 0, 0, 0,
+     5, -5, -10, 0, 0, -10, -5, 5,
+     5, 10, 10, -20, -20, 10, 10, 5,
+     0, 0, 0, 0, 0, 0, 0, 0],
+    [-50, -40, -30, -30, -30, -30, -40, -50,
+     -40, -20, 0, 0, 0, 0, -20, -40,
+     -30, 0, 10, 15, 15, 10, 0, -30,
+     -30, 5, 15, 20, 20, 15, 5, -30,
+     -30, 0, 15, 20, 20, 15, 0, -30,
+     -30, 5, 10, 15, 15, 10, 5, -30,
+     -40, -20, 0, 5, 5, 0, -20, -40,
+     -50, -40, -30, -30, -30, -30, -40, -50],
+    [-20, -10, -10, -10, -10, -10, -10, -20,
+     -10, 0, 0, 0, 0, 0, 0, -10,
+     -10, 0, 5, 10, 10, 5, 0, -10,
+     -10, 5, 5, 10, 10, 5, 5, -10,
+     -10, 0, 10, 10, 10, 10, 0, -10,
+     -10, 10, 10, 10, 10, 10, 10, -10,
+     -10, 5, 0, 0, 0, 0, 5, -10,
+     -20, -10, -10, -10, -10, -10, -10, -20],
+    [0, 0, 0, 0, 0, 0, 0, 0,
+     5, 10, 10, 10, 10, 10, 10, 5,
+     -5, 0, 0, 0, 0, 0, 0, -5,
+     -5, 0, 0, 0, 0, 0, 0, -5,
+     -5, 0, 0, 0, 0, 0, 0, -5,
+     -5, 0, 0, 0, 0, 0, 0, -5,
+     -5, 0, 0, 0, 0, 0, 0, -5,
+     0, 0, 0, 5, 5, 0, 0, 0],
+    [-20, -10, -10, -5, -5, -10, -10, -20,
+     -10, 0, 0, 0, 0, 0, 0, -10,
+     -10, 0, 5, 5, 5, 5, 0, -10,
+     -5, 0, 5, 5, 5, 5, 0, -5,
+     0, 0, 5, 5, 5, 5, 0, -5,
+     -10, 5, 5, 5, 5, 5, 0, -10,
+     -10, 0, 5, 0, 0, 0, 0, -10,
+     -20, -10, -10, -5, -5, -10, -10, -20],
+    [-30, -40, -40, -50, -50, -40, -40, -30,
+     -30, -40, -40, -50, -50, -40, -40, -30,
+     -30, -40, -40, -50, -50, -40, -40, -30,
+     -30, -40, -40, -50, -50, -40, -40, -30,
+     -20, -30, -30, -40, -40, -30, -30, -20,
+     -10, -20, -20, -20, -20, -20, -20, -10,
+     20, 20, 0, 0, 0, 0, 20, 20,
+     20, 30, 10, 0, 0, 10, 30, 20],
+]
+DEFAULT_MOBILITY = [4, 5, 2, 1]
+DEFAULT_PAWNS = [-15, -12, 10, 8]
+
+
+class EvalWeights:
+    """Parameters of the linear evaluation."""
+
+    def __init__(self, material=None, pst=None, mobility=None, pawns=None):
+        self.material = np.array(DEFAULT_MATERIAL if material is None else material, dtype=np.float64)
+        self.pst = np.array(DEFAULT_PST if pst is None else pst, dtype=np.float64).reshape(6, 64)
+        self.mobility = np.array(DEFAULT_MOBILITY if mobility is None else mobility, dtype=np.float64)
+        self.pawns = np.array(DEFAULT_PAWNS if pawns is None else pawns, dtype=np.float64)
+
+    @property
+    def sizes(self):
+        return self.material.size, self.pst.size, self.mobility.size, self.pawns.size
+
+    def to_vector(self):
+        """All parameters as one flat vector (material, pst, mobility, pawns)."""
+        return np.concatenate([self.material, self.pst.ravel(), self.mobility, self.pawns])
+
+    @classmethod
+    def from_vector(cls, vector):
+        a, b, c, _ = cls().sizes
+        return cls(vector[:a], vector[a:a + b], vector[a + b:a + b + c], vector[a + b + c:])
+
+    def save(self, path):
+        np.savez(path, material=self.material, pst=self.pst, mobility=self.mobility, pawns=self.pawns)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data['material'], data['pst'], data['mobility'], data['pawns'])
+
+
+def encode_squares(squares):
+    """Convert 64-character board strings ('.' for empty, rank 8 first) to (N, 64) codes."""
+    codes = _CODE_LUT[np.frombuffer(''.join(squares).encode('ascii'), dtype=np.uint8)]
+    if codes.size != len(squares) * 64 or (codes == 255).any():
+        raise ValueError("Invalid board data")
+    return codes.reshape(len(squares), 64)
+
+
+def board_squares(board):
+    """A ChessBoard's squares as one 64-character string."""
+    return ''.join(''.join(row) for row in board.board)
+
+
+def encode_fens(fens):
+    """Return (codes, white_to_move) for an iterable of FEN strings."""
+    placements = []
+    white_to_move = []
+    for fen in fens:
+        fields = fen.split()
+        placement = fields[0].translate(_FEN_DIGITS)
+        if len(placement) != 64:
+            raise ValueError(f"Invalid FEN: {fen!r}")
+        placements.append(placement)
+        white_to_move.append(len(fields) < 2 or fields[1] == 'w')
+    return encode_squares(placements), np.array(white_to_move, dtype=bool)
+
+
+def encode_boards(boards):
+    """Return (codes, white_to_move) for an iterable of ChessBoard objects."""
+    squares = []
+    white_to_move = []
+    for board in boards:
+        squares.append(board_squares(board))
+        white_to_move.append(board.current_turn == 'white')
+    return encode_squares(squares), np.array(white_to_move, dtype=bool)
+
+
+def piece_planes(codes):
+    """Dense (N, 12, 64) boolean piece-plane tensor."""
+    return codes[:, None, :] == np.arange(12, dtype=np.uint8)[None, :, None]
+
+
+def bitboards(codes):
+    """(N, 12) uint64 bitboards, one per piece plane."""
+    packed = np.packbits(piece_planes(codes), axis=2, bitorder='little')
+    return np.ascontiguousarray(packed).view('<u8')[:, :, 0].astype(np.uint64, copy=False)
+
+
+def popcount(x):
+    """Bits set in each element of a uint64 array."""
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(x)
+    x = np.ascontiguousarray(x, dtype=np.uint64)
+    return _BYTE_POPCOUNT[x.view(np.uint8)].reshape(x.shape + (8,)).sum(axis=-1)
+
+
+def _shift(x, n, up):
+    return x << _U64(n) if up else x >> _U64(n)
+
+
+def _slide(pieces, empty, shift, up, mask):
+    """Kogge-Stone occluded fill: squares attacked along one direction."""
+    gen = pieces
+    pro = empty & mask
+    gen = gen | (pro & _shift(gen, shift, up))
+    pro = pro & _shift(pro, shift, up)
+    gen = gen | (pro & _shift(gen, 2 * shift, up))
+    pro = pro & _shift(pro, 2 * shift, up)
+    gen = gen | (pro & _shift(gen, 4 * shift, up))
+    return _shift(gen, shift, up) & mask
+
+
+def _fill(x, up):
+    """Smear bits along their files toward rank 1 (up) or rank 8."""
+    for n in (8, 16, 32):
+        x = x | _shift(x, n, up)
+    return x
+
+
+def _mobility(bb, own, empty, first):
+    """Attacked squares not occupied by their own side, for N, B, R, Q of one colour."""
+    knights, bishops, rooks, queens = bb[:, first + 1], bb[:, first + 2], bb[:, first + 3], bb[:, first + 4]
+    knight_attacks = np.zeros_like(knights)
+    for shift, up, mask in _KNIGHT_JUMPS:
+        knight_attacks |= _shift(knights, shift, up) & mask
+
+    def sliding(pieces, directions):
+        attacks = np.zeros_like(pieces)
+        for shift, up, mask in directions:
+            attacks |= _slide(pieces, empty, shift, up, mask)
+        return attacks
+
+    bishop_attacks = sliding(bishops, _BISHOP_DIRECTIONS)
+    rook_attacks = sliding(rooks, _ROOK_DIRECTIONS)
+    queen_attacks = sliding(queens, _BISHOP_DIRECTIONS + _ROOK_DIRECTIONS)
+    targets = ~own
+    return np.stack([popcount(a & targets) for a in
+                     (knight_attacks, bishop_attacks, rook_attacks, queen_attacks)], axis=1).astype(np.int16)
+
+
+def _pawn_terms(own, enemy, white):
+    """Doubled, isolated and passed pawn counts plus passed pawn advancement for one side."""
+    per_file = np.stack([popcount(own & m) for m in FILE_MASKS], axis=1).astype(np.int16)
+    doubled = np.maximum(per_file - 1, 0).sum(axis=1)
+    present = np.pad(per_file > 0, ((0, 0), (1, 1)))
+    isolated = (per_file * ~(present[:, :-2] | present[:, 2:])).sum(axis=1)
+
+    # Squares an enemy pawn controls or blocks on its way down (or up) the board
+    span = _fill(_shift(enemy, 8, white), white)
+    span = span | (_shift(span, 1, True) & _NOT_A) | (_shift(span, 1, False) & _NOT_H)
+    passed = own & ~span
+    rows = np.stack([popcount(passed & m) for m in ROW_MASKS], axis=1).astype(np.int16)
+    advance = np.arange(8)[::-1] - 1 if white else np.arange(8) - 1    # rank 2/7 = 0 ... rank 7/2 = 5
+    return np.stack([doubled, isolated, rows.sum(axis=1), rows @ np.maximum(advance, 0)], axis=1)
+
+
+def extract_features(codes):
+    """Material, mobility and pawn features (white minus black) for a batch."""
+    bb = bitboards(codes)
+    white_occ = np.bitwise_or.reduce(bb[:, :6], axis=1)
+    black_occ = np.bitwise_or.reduce(bb[:, 6:], axis=1)
+    empty = ~(white_occ | black_occ)
+    counts = popcount(bb).astype(np.int16)
+    return {
+        'material': counts[:, 0:5] - counts[:, 6:11],
+        'mobility': _mobility(bb, white_occ, empty, 0) - _mobility(bb, black_occ, empty, 6),
+        'pawns': _pawn_terms(bb[:, 0], bb[:, 6], True) - _pawn_terms(bb[:, 6], bb[:, 0], False),
+    }
+
+
+def pst_score(codes, pst):
+    """Piece-square sum for each position, white minus mirrored black."""
+    table = np.append(np.asarray(pst, dtype=np.float64).ravel(), 0.0)
+    return (table[_PST_INDEX[codes, _SQUARES]] * _PST_SIGN[codes]).sum(axis=1)
+
+
+def eval_gradient(codes, features, dscore):
+    """Gradient of sum(dscore * score) with respect to the weights, as a flat vector.
+
+    The evaluation is linear, so this is the feature matrix transposed times
+    dscore; the piece-square part is accumulated with a bincount over the same
+    lookup evaluate uses.
+    """
+    dscore = np.asarray(dscore, dtype=np.float64)
+    signed = (dscore[:, None] * _PST_SIGN[codes]).ravel()
+    pst = np.bincount(_PST_INDEX[codes, _SQUARES].ravel(), weights=signed, minlength=6 * 64 + 1)[:6 * 64]
+    return np.concatenate([dscore @ features['material'], pst,
+                           dscore @ features['mobility'], dscore @ features['pawns']])
+
+
+def evaluate(codes, white_to_move=None, weights=None, features=None):
+    """Score a batch in centipawns: white's view, or the side to move's if given."""
+    weights = weights or EvalWeights()
+    features = features or extract_features(codes)
+    score = (features['material'] @ weights.material
+             + pst_score(codes, weights.pst)
+             + features['mobility'] @ weights.mobility
+             + features['pawns'] @ weights.pawns)
+    if white_to_move is not None:
+        score = np.where(white_to_move, score, -score)
+    return score
+
+
+def evaluate_boards(boards, weights=None):
+    """Scores for ChessBoard objects from the side to move's point of view."""
+    codes, white_to_move = encode_boards(boards)
+    return evaluate(codes, white_to_move, weights)
+
+
+BENCH_FENS = [
+    'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1',
+    'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1',
+    '8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1',
+    'r2q1rk1/pP1p2pp/Q4n2/bbp1p3/Np6/1B3NBn/pPPP1PPP/R3K2R b KQ - 0 1',
+    'rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8',
+    'r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10',
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vectorized batch position evaluator.")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    one = sub.add_parser('eval', help="Show the evaluation terms of one position")
+    one.add_argument('fen', nargs='?', default=BENCH_FENS[0])
+    one.add_argument('--weights', help="weights file written by chess_tune")
+
+    bench = sub.add_parser('bench', help="Measure encode and evaluation throughput")
+    bench.add_argument('--positions', type=int, default=200_000)
+    bench.add_argument('--epd', help="take positions from an EPD/FEN file instead of the built-in set")
+    bench.add_argument('--repeat', type=int, default=3)
+
+    args = parser.parse_args()
+
+    if args.command == 'eval':
+        weights = EvalWeights.load(args.weights) if args.weights else EvalWeights()
+        codes, white_to_move = encode_fens([args.fen])
+        features = extract_features(codes)
+        print(f"[EVAL] material  {features['material'][0] @ weights.material:+8.1f}  {features['material'][0]}")
+        print(f"[EVAL] pst       {pst_score(codes, weights.pst)[0]:+8.1f}")
+        print(f"[EVAL] mobility  {features['mobility'][0] @ weights.mobility:+8.1f}  {features['mobility'][0]}")
+        print(f"[EVAL] pawns     {features['pawns'][0] @ weights.pawns:+8.1f}  {features['pawns'][0]}")
+        print(f"[EVAL] total     {evaluate(codes, None, weights, features)[0]:+8.1f} (white's view)")
+        return
+
+    if args.epd:
+        fens = [board.get_fen() for board, _ in read_epd(args.epd)]
+    else:
+        fens = BENCH_FENS
+    fens = (fens * (args.positions // len(fens) + 1))[:args.positions]
+
+    best_encode = best_eval = float('inf')
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        codes, white_to_move = encode_fens(fens)
+        best_encode = min(best_encode, time.perf_counter() - start)
+        start = time.perf_counter()
+        scores = evaluate(codes, white_to_move)
+        best_eval = min(best_eval, time.perf_counter() - start)
+
+    n = len(fens)
+    print(f"[EVAL] {n} positions: encode {n / best_encode:,.0f}/s, evaluate {n / best_eval:,.0f}/s, "
+          f"planes {piece_planes(codes[:1]).shape[1:]} per position, "
+          f"{codes.nbytes / n:.0f} bytes per position stored")
+    print(f"[EVAL] mean score {scores.mean():+.1f} cp (side to move)")
+
+
+if __name__ == "__main__":
+    main()
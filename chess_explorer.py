@@ -0,0 +1,293 @@
+"""
+Opening explorer backed by an on-disk position index.
+
+The builder replays PGN games with ChessBoard and counts, for every position
+hash and move, how many games continued with that move and how they ended.
+Counts are written as fixed-size records sorted by (hash, move), so the
+query side can mmap the file and binary-search it without loading anything.
+
+Usage:
+    python chess_explorer.py build games.pgn [more.pgn ...] -o openings.idx
+    python chess_explorer.py query openings.idx "<FEN>"
+"""
+
+import argparse
+import heapq
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+
+from chess import ChessBoard, read_pgn, encode_move, decode_move, move_to_uci
+
+INDEX_MAGIC = b'CHXIDX1\0'
+HEADER = struct.Struct('<8sQ')          # magic, record count
+RECORD = struct.Struct('<QHHIII')       # hash, move, reserved, white wins, draws, black wins
+
+DEFAULT_INDEX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'openings.idx')
+DEFAULT_MAX_PLY = 40
+DEFAULT_RUN_SIZE = 1_000_000            # distinct (position, move) keys held in memory before spilling
+
+# Result column for each PGN result: 0 = white win, 1 = draw, 2 = black win
+RESULT_COLUMNS = {'1-0': 0, '1/2-1/2': 1, '0-1': 2}
+
+
+class OpeningIndex:
+    """Read-only view over an index file. Opening it maps the file lazily."""
+
+    def __init__(self, path=DEFAULT_INDEX_PATH):
+        self.path = path
+        self.count = 0
+        self._file = None
+        self._mm = None
+        self._lock = threading.Lock()
+
+    def _open(self):
+        """Map the index file on first use."""
+        with self._lock:
+            if self._mm is not None:
+                return
+            self._file = open(self.path, 'rb')
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, count = HEADER.unpack_from(self._mm, 0)
+            if magic != INDEX_MAGIC:
+                self.close()
+                raise ValueError(f"Not an opening index: {self.path}")
+            if HEADER.size + count * RECORD.size > len(self._mm):
+                self.close()
+                raise ValueError(f"Truncated opening index: {self.path}")
+            self.count = count
+
+    def lookup(self, position_hash):
+        """Return [(move, white_wins, draws, black_wins)] for a position hash."""
+        if self._mm is None:
+            self._open()
+
+        mm = self._mm
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if struct.unpack_from('<Q', mm, HEADER.size + mid * RECORD.size)[0] < position_hash:
+                lo = mid + 1
+            else:
+                hi = mid
+
+        results = []
+        for i in range(lo, self.count):
+            key, move, _, white, draws, black = RECORD.unpack_from(mm, HEADER.size + i * RECORD.size)
+            if key != position_hash:
+                break
+            results.append((move, white, draws, black))
+        return results
+
+    def moves_for(self, board):
+        """Move statistics for a board, most played first.
+
+        Wins and losses are from the point of view of the side to move.
+        """
+        white_to_move = board.current_turn == 'white'
+        stats = []
+        for move, white, draws, black in self.lookup(board.zobrist_hash()):
+            from_row, from_col, to_row, to_col, promotion = decode_move(move, white_to_move)
+            if not board.is_valid_move(from_row, from_col, to_row, to_col):
+                continue    # hash collision with another position
+            stats.append({
+                'move': (from_row, from_col, to_row, to_col, promotion),
+                'uci': move_to_uci(from_row, from_col, to_row, to_col, promotion),
+                'san': board.get_san(from_row, from_col, to_row, to_col, promotion),
+                'games': white + draws + black,
+                'wins': white if white_to_move else black,
+                'draws': draws,
+                'losses': black if white_to_move else white,
+            })
+        stats.sort(key=lambda s: s['games'], reverse=True)
+        return stats
+
+    def close(self):
+        """Unmap the index file."""
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def _write_run(counts, directory):
+    """Spill in-memory counts to a sorted temporary run file."""
+    fd, path = tempfile.mkstemp(suffix='.run', dir=directory)
+    with os.fdopen(fd, 'wb') as f:
+        chunk = []
+        for key in sorted(counts):
+            white, draws, black = counts[key]
+            chunk.append(RECORD.pack(key >> 16, key & 0xFFFF, 0, white, draws, black))
+            if len(chunk) >= 65536:
+                f.write(b''.join(chunk))
+                chunk = []
+        f.write(b''.join(chunk))
+    return path
+
+
+def _read_run(path):
+    """Iterate (key, white, draws, black) records from a run file."""
+    with open(path, 'rb') as f:
+        while True:
+            data = f.read(RECORD.size * 65536)
+            if not data:
+                break
+            for position_hash, move, _, white, draws, black in RECORD.iter_unpack(data):
+                yield (position_hash << 16) | move, white, draws, black
+
+
+def build_index(pgn_paths, index_path=DEFAULT_INDEX_PATH, max_ply=DEFAULT_MAX_PLY,
+                min_games=1, run_size=DEFAULT_RUN_SIZE, progress=None):
+    """Replay PGN games and write a sorted position index.
+
+    Counts are spilled to sorted runs every run_size distinct keys and then
+    merged, so memory stays bounded for archives of any size. Returns a dict
+    with game, position and record counts.
+    """
+    directory = os.path.dirname(os.path.abspath(index_path))
+    board = ChessBoard()
+    counts = {}
+    runs = []
+    games = skipped = positions = 0
+    start = time.perf_counter()
+
+    try:
+        for pgn_path in pgn_paths:
+            for game in read_pgn(pgn_path):
+                column = RESULT_COLUMNS.get(game['result'])
+                if column is None:
+                    skipped += 1
+                    continue
+
+                fen = game['headers'].get('FEN')
+                if fen:
+                    try:
+                        board.set_fen(fen)
+                    except ValueError:
+                        skipped += 1
+                        continue
+                else:
+                    board.reset_board()
+
+                for san in game['moves'][:max_ply]:
+                    move = board.parse_san(san)
+                    if move is None:
+                        break
+                    key = (board.zobrist_hash() << 16) | encode_move(*move)
+                    stats = counts.get(key)
+                    if stats is None:
+                        counts[key] = stats = [0, 0, 0]
+                    stats[column] += 1
+                    positions += 1
+                    board.make_move(*move)
+
+                games += 1
+                if len(counts) >= run_size:
+                    runs.append(_write_run(counts, directory))
+                    counts = {}
+                if progress and games % 1000 == 0:
+                    progress(games, positions, time.perf_counter() - start)
+
+        if counts:
+            runs.append(_write_run(counts, directory))
+            counts = {}
+
+        records = _merge_runs(runs, index_path, min_games)
+    finally:
+        for path in runs:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    return {
+        'games': games,
+        'skipped': skipped,
+        'positions': positions,
+        'records': records,
+        'seconds': time.perf_counter() - start,
+    }
+
+
+def _merge_runs(runs, index_path, min_games):
+    """Merge sorted runs into the final index, summing duplicate keys."""
+    tmp_path = index_path + '.tmp'
+    records = 0
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(INDEX_MAGIC, 0))
+        chunk = []
+        current = None
+        for key, white, draws, black in heapq.merge(*(_read_run(path) for path in runs)):
+            if current is not None and current[0] == key:
+                current[1] += white
+                current[2] += draws
+                current[3] += black
+                continue
+            if current is not None and sum(current[1:]) >= min_games:
+                chunk.append(RECORD.pack(current[0] >> 16, current[0] & 0xFFFF, 0, *current[1:]))
+                records += 1
+            current = [key, white, draws, black]
+            if len(chunk) >= 65536:
+                f.write(b''.join(chunk))
+                chunk = []
+        if current is not None and sum(current[1:]) >= min_games:
+            chunk.append(RECORD.pack(current[0] >> 16, current[0] & 0xFFFF, 0, *current[1:]))
+            records += 1
+        f.write(b''.join(chunk))
+        f.seek(0)
+        f.write(HEADER.pack(INDEX_MAGIC, records))
+    os.replace(tmp_path, index_path)
+    return records
+
+
+def format_stats(stats, limit=12):
+    """Render move statistics as fixed-width text lines."""
+    lines = [f"{'Move':<8}{'Games':>7}{'Win%':>6}{'Draw%':>6}"]
+    for s in stats[:limit]:
+        games = s['games']
+        lines.append(f"{s['san']:<8}{games:>7}{100 * s['wins'] // games:>6}{100 * s['draws'] // games:>6}")
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or query the opening explorer index.")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    build = sub.add_parser('build', help="Build an index from PGN files")
+    build.add_argument('pgn', nargs='+')
+    build.add_argument('-o', '--output', default=DEFAULT_INDEX_PATH)
+    build.add_argument('--max-ply', type=int, default=DEFAULT_MAX_PLY)
+    build.add_argument('--min-games', type=int, default=1)
+    build.add_argument('--run-size', type=int, default=DEFAULT_RUN_SIZE)
+
+    query = sub.add_parser('query', help="Show move statistics for a FEN")
+    query.add_argument('index')
+    query.add_argument('fen', nargs='?', default=None)
+
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        def progress(games, positions, elapsed):
+            print(f"[EXPLORER] {games} games, {positions} positions, {games / elapsed:.0f} games/s")
+
+        summary = build_index(args.pgn, args.output, args.max_ply, args.min_games, args.run_size, progress)
+        print(f"[EXPLORER] Indexed {summary['games']} games ({summary['skipped']} skipped), "
+              f"{summary['records']} records in {summary['seconds']:.1f}s -> {args.output}")
+    else:
+        index = OpeningIndex(args.index)
+        board = ChessBoard(args.fen)
+        start = time.perf_counter()
+        stats = index.moves_for(board)
+        elapsed = (time.perf_counter() - start) * 1000
+        print(format_stats(stats) if stats else "Position not in index.")
+        print(f"[EXPLORER] {index.count} records, lookup {elapsed:.2f} ms")
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
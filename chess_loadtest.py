@@ -0,0 +1,606 @@
+"""
+Headless load generator for the online chess server.
+
+Simulates many asyncio clients that speak the same binary protocol as
+ChessGame: each client says HELLO, waits for COLOR, plays random legal moves
+(found with ChessBoard) after a random think time, acknowledges the moves it
+receives and chats at a configurable rate. When a game ends the client
+reconnects as a new player, so the server sees a steady stream of games.
+
+Opponents find each other through a "pair:<id>" chat line sent by white, which
+lets the harness measure move-relay latency: the time from one client writing
+a MOVE to its opponent reading it. ACK latency (MOVE written to ACK read) is
+measured as well. A separate monitoring connection polls STATS to track the
+server's counters and resident memory over time.
+
+With --spectators, the first two clients start a featured game before anyone
+else connects and that many spectators WATCH it. Spectator latency is measured
+from the featured player writing a move to each spectator reading it; a share
+of the spectators can be made to read slowly to exercise the server's resync
+and drop handling.
+
+Usage:
+    python chess_loadtest.py --clients 2000 --duration 60 [--spawn-server]
+    python chess_loadtest.py --clients 2 --spectators 5000 --slow-spectators 100
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import time
+
+from chess import ChessBoard, encode_move, decode_move
+from chess_protocol import (
+    HEADER, PROTOCOL_VERSION,
+    MSG_COLOR, MSG_MOVE, MSG_ACK, MSG_CHAT, MSG_ERROR, MSG_GAMEOVER, MSG_RESYNC, MSG_STATS, MSG_PING,
+    pack_frame, pack_hello, pack_move, pack_ack, pack_text, pack_watch, pack_pong,
+    unpack_u16, unpack_u32, unpack_u64, unpack_color, unpack_resync, unpack_text,
+)
+
+DEFAULT_THINK_MS = 100      # mean delay before a client answers a move
+DEFAULT_MAX_PLIES = 200     # clients abandon a game after this many half-moves
+CHAT_TEXT = "good luck, have fun"
+
+# Histogram buckets grow by 5% from 10 microseconds to about 100 seconds
+BUCKET_BASE = 10e-6
+BUCKET_GROWTH = 1.05
+BUCKET_COUNT = int(math.log(1e7) / math.log(BUCKET_GROWTH)) + 1
+
+
+class LatencyHistogram:
+    """Fixed-size log-bucket histogram; memory does not grow with the sample count."""
+
+    def __init__(self):
+        self.buckets = [0] * BUCKET_COUNT
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        index = 0
+        if seconds > BUCKET_BASE:
+            index = min(int(math.log(seconds / BUCKET_BASE) / math.log(BUCKET_GROWTH)) + 1, BUCKET_COUNT - 1)
+        self.buckets[index] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, p):
+        """Upper edge of the bucket holding the p-th percentile, in seconds."""
+        if not self.count:
+            return 0.0
+        rank = math.ceil(self.count * p / 100)
+        seen = 0
+        for index, n in enumerate(self.buckets):
+            seen += n
+            if seen >= rank:
+                return min(BUCKET_BASE * BUCKET_GROWTH ** index, self.max)
+        return self.max
+
+    def summary(self):
+        """Percentiles in milliseconds."""
+        ms = lambda s: round(s * 1000, 3)
+        return {
+            'count': self.count,
+            'mean': ms(self.total / self.count) if self.count else 0.0,
+            'p50': ms(self.percentile(50)),
+            'p90': ms(self.percentile(90)),
+            'p99': ms(self.percentile(99)),
+            'p999': ms(self.percentile(99.9)),
+            'max': ms(self.max),
+        }
+
+    def format_bars(self, width=40, rows=12):
+        """Render the histogram as text, merged into at most `rows` rows."""
+        used = [i for i, n in enumerate(self.buckets) if n]
+        if not used:
+            return "  (no samples)"
+        first, last = used[0], used[-1] + 1
+        step = max(1, math.ceil((last - first) / rows))
+        groups = []
+        for start in range(first, last, step):
+            end = min(start + step, last)
+            groups.append((BUCKET_BASE * BUCKET_GROWTH ** end, sum(self.buckets[start:end])))
+        peak = max(n for _, n in groups)
+        return '\n'.join(f"  <{edge * 1000:9.3f} ms {n:>9} {'#' * round(width * n / peak)}"
+                         for edge, n in groups)
+
+
+def random_legal_move(board, rng):
+    """Pick a random legal move by trying the side's pieces in random order."""
+    white = board.current_turn == 'white'
+    squares = [(r, c) for r in range(8) for c in range(8)
+               if board.board[r][c] != '.' and board.board[r][c].isupper() == white]
+    rng.shuffle(squares)
+    for row, col in squares:
+        targets = board.get_valid_moves_for_piece(row, col)
+        if targets:
+            to_row, to_col = rng.choice(targets)
+            promotion = None
+            if board.board[row][col] in 'Pp' and to_row in (0, 7):
+                promotion = 'Q' if white else 'q'
+            return row, col, to_row, to_col, promotion
+    return None
+
+
+class LoadClient:
+    """One simulated player; plays games back to back until the run stops."""
+
+    def __init__(self, harness, client_id):
+        self.harness = harness
+        self.id = client_id
+        self.rng = random.Random(client_id)
+        self.writer = None
+        self.board = None
+        self.white = None
+        self.opponent = None
+        self.seq = 0
+        self.pending = {}
+        self.last_move_sent = None
+        self.featured = False
+
+    def send(self, frame):
+        self.writer.write(frame)
+        self.harness.frames_sent += 1
+
+    def next_seq(self):
+        self.seq += 1
+        return self.seq
+
+    async def run(self):
+        while not self.harness.stopping:
+            try:
+                await self.play_game()
+            except (OSError, asyncio.IncompleteReadError):
+                if self.writer is not None and self.writer.is_closing():
+                    continue  # we hung up ourselves at the ply limit
+                self.harness.connection_errors += 1
+                await asyncio.sleep(1)
+
+    async def play_game(self):
+        """Connect as a new player and play one game."""
+        harness = self.harness
+        reader, self.writer = await asyncio.open_connection(harness.host, harness.port)
+        self.board = ChessBoard()
+        self.white = self.opponent = self.last_move_sent = None
+        self.seq = 0
+        self.pending.clear()
+        move_timer = None
+        chat_task = None
+        harness.connections += 1
+        try:
+            self.send(pack_hello(self.next_seq(), 0, harness.time_control))
+            while not harness.stopping:
+                version, msg_type, length, seq = HEADER.unpack(await reader.readexactly(HEADER.size))
+                if version != PROTOCOL_VERSION:
+                    harness.protocol_errors += 1
+                    return
+                payload = await reader.readexactly(length) if length else b''
+                now = time.perf_counter()
+                harness.frames_received += 1
+
+                if msg_type == MSG_MOVE:
+                    self.send(pack_ack(self.next_seq(), seq))
+                    opponent = self.opponent
+                    if opponent is not None and opponent.last_move_sent is not None:
+                        harness.relay_latency.add(now - opponent.last_move_sent)
+                        opponent.last_move_sent = None
+                    if not self.board.make_move(*decode_move(unpack_u16(payload), not self.white)):
+                        harness.desyncs += 1
+                    if self.game_over():
+                        return
+                    move_timer = self.schedule_move()
+                elif msg_type == MSG_PING:
+                    self.send(pack_pong(self.next_seq(), unpack_u64(payload)))
+                elif msg_type == MSG_ACK:
+                    sent = self.pending.pop(unpack_u32(payload), None)
+                    if sent is not None:
+                        harness.ack_latency.add(now - sent)
+                elif msg_type == MSG_COLOR:
+                    self.white, _ = unpack_color(payload)
+                    harness.games_started += self.white
+                    chat_task = asyncio.create_task(self.chat_loop())
+                    if self.white:
+                        self.send(pack_text(MSG_CHAT, self.next_seq(), f"pair:{self.id}"))
+                        move_timer = self.schedule_move()
+                elif msg_type == MSG_CHAT:
+                    text = unpack_text(payload)
+                    if text.startswith('pair:'):
+                        self.opponent = harness.clients[int(text[5:])]
+                        self.opponent.opponent = self
+                    else:
+                        harness.chats_received += 1
+                elif msg_type == MSG_RESYNC:
+                    _, fen, _ = unpack_resync(payload)
+                    self.board.set_fen(fen)
+                    move_timer = self.schedule_move()
+                elif msg_type == MSG_ERROR:
+                    harness.server_errors += 1
+                elif msg_type == MSG_GAMEOVER:
+                    harness.games_finished += self.white
+                    return
+        finally:
+            if move_timer is not None:
+                move_timer.cancel()
+            if chat_task is not None:
+                chat_task.cancel()
+            if self.featured:
+                harness.end_featured_game()
+            harness.connections -= 1
+            self.writer.close()
+
+    def game_over(self):
+        """Stop after max plies; both clients reach the limit on the same move."""
+        if len(self.board.move_history) >= self.harness.max_plies:
+            self.harness.games_abandoned += self.white
+            return True
+        return False
+
+    def schedule_move(self):
+        """Answer after an exponentially distributed think time if it is our turn."""
+        if (self.board.current_turn == 'white') != self.white:
+            return None
+        delay = self.rng.expovariate(1000 / self.harness.think_ms) if self.harness.think_ms else 0
+        return asyncio.get_running_loop().call_later(delay, self.play_move)
+
+    def play_move(self):
+        if self.writer.is_closing():
+            return
+        start = time.perf_counter()
+        move = random_legal_move(self.board, self.rng)
+        self.harness.movegen_seconds += time.perf_counter() - start
+        if move is None:
+            return  # mate or stalemate; the server announces GAMEOVER
+        self.board.make_move(*move)
+        seq = self.next_seq()
+        self.last_move_sent = self.pending[seq] = time.perf_counter()
+        if self.featured:
+            self.harness.featured_moves[len(self.board.move_history)] = self.last_move_sent
+        self.send(pack_move(seq, encode_move(*move)))
+        self.harness.moves_sent += 1
+        if self.game_over():
+            self.writer.close()
+
+    async def chat_loop(self):
+        """Send chat lines as a Poisson process at chat_rate messages per second."""
+        rate = self.harness.chat_rate
+        if rate <= 0:
+            return
+        while not self.writer.is_closing():
+            await asyncio.sleep(self.rng.expovariate(rate))
+            if self.writer.is_closing():
+                break
+            self.send(pack_text(MSG_CHAT, self.next_seq(), CHAT_TEXT))
+            self.harness.chats_sent += 1
+
+
+class SpectatorClient:
+    """Watches a game; slow spectators sleep after every frame they read."""
+
+    def __init__(self, harness, slow):
+        self.harness = harness
+        self.slow = slow
+        self.writer = None
+
+    async def run(self):
+        while not self.harness.stopping:
+            try:
+                await self.watch()
+            except (OSError, asyncio.IncompleteReadError):
+                if self.writer is None or not self.writer.is_closing():
+                    self.harness.spectator_drops += 1
+                await asyncio.sleep(0.5)
+
+    async def watch(self):
+        """Follow the longest-running game until it ends."""
+        harness = self.harness
+        reader, self.writer = await asyncio.open_connection(harness.host, harness.port)
+        try:
+            self.writer.write(pack_watch(1, 0))
+            snapshots = 0
+            while not harness.stopping:
+                _, msg_type, length, seq = HEADER.unpack(await reader.readexactly(HEADER.size))
+                if length:
+                    await reader.readexactly(length)
+                now = time.perf_counter()
+                harness.spectator_frames += 1
+                if msg_type == MSG_MOVE:
+                    sent = harness.featured_moves.get(seq)
+                    if sent is not None:
+                        harness.spectator_latency.add(now - sent)
+                elif msg_type == MSG_RESYNC:
+                    # The first snapshot is the join; later ones mean we fell behind
+                    harness.spectator_resyncs += snapshots > 0
+                    snapshots += 1
+                elif msg_type in (MSG_GAMEOVER, MSG_ERROR):
+                    return
+                if self.slow:
+                    await asyncio.sleep(harness.slow_read_ms / 1000)
+        finally:
+            self.writer.close()
+
+
+class LoadTest:
+    """Runs the clients, the STATS monitor and the periodic report."""
+
+    def __init__(self, host, port, clients, duration, think_ms=DEFAULT_THINK_MS, chat_rate=0.05,
+                 ramp=500, max_plies=DEFAULT_MAX_PLIES, interval=5, spectators=0,
+                 slow_spectators=0, slow_read_ms=200, time_control=0):
+        self.host = host
+        self.port = port
+        self.duration = duration
+        self.think_ms = think_ms
+        self.chat_rate = chat_rate
+        self.ramp = ramp
+        self.max_plies = max_plies
+        self.interval = interval
+        self.stopping = False
+        self.clients = [LoadClient(self, i) for i in range(clients)]
+        self.spectators = [SpectatorClient(self, i < slow_spectators) for i in range(spectators)]
+        self.slow_read_ms = slow_read_ms
+        self.time_control = time_control
+        self.featured_moves = {}
+        self.spectator_latency = LatencyHistogram()
+        self.spectator_frames = self.spectator_resyncs = self.spectator_drops = 0
+        self.relay_latency = LatencyHistogram()
+        self.ack_latency = LatencyHistogram()
+        self.loop_lag = LatencyHistogram()
+        self.connections = 0
+        self.frames_sent = self.frames_received = 0
+        self.moves_sent = self.chats_sent = self.chats_received = 0
+        self.games_started = self.games_finished = self.games_abandoned = 0
+        self.connection_errors = self.protocol_errors = self.server_errors = self.desyncs = 0
+        self.movegen_seconds = 0.0
+        self.samples = []
+        self._stats_reader = self._stats_writer = None
+
+    async def run(self):
+        """Ramp up the clients, run for the configured duration and return a report."""
+        start = time.perf_counter()
+        try:
+            self._stats_reader, self._stats_writer = await asyncio.open_connection(self.host, self.port)
+        except OSError as e:
+            print(f"[LOADTEST] STATS monitor could not connect: {e}")
+        monitor = asyncio.create_task(self.monitor(start))
+        lag_probe = asyncio.create_task(self.measure_loop_lag())
+        tasks = []
+        clients = self.clients
+        if self.spectators and len(clients) >= 2:
+            tasks += await self.start_featured_game()
+            clients = clients[2:]
+        for client in self.spectators + clients:
+            tasks.append(asyncio.create_task(client.run()))
+            if self.ramp and len(tasks) % max(1, self.ramp // 100) == 0:
+                await asyncio.sleep(0.01)
+        remaining = self.duration - (time.perf_counter() - start)
+        if remaining > 0:
+            await asyncio.sleep(remaining)
+
+        self.stopping = True
+        elapsed = time.perf_counter() - start
+        for client in self.clients + self.spectators:
+            if client.writer is not None:
+                client.writer.close()
+        await asyncio.wait(tasks, timeout=5)
+        for task in tasks:
+            task.cancel()
+        monitor.cancel()
+        lag_probe.cancel()
+        await asyncio.gather(monitor, lag_probe, return_exceptions=True)
+        await self.sample(start)
+        if self._stats_writer is not None:
+            self._stats_writer.close()
+        return self.report(elapsed)
+
+    async def start_featured_game(self):
+        """Pair the first two clients before anyone else connects."""
+        featured = self.clients[:2]
+        for client in featured:
+            client.featured = True
+        tasks = [asyncio.create_task(client.run()) for client in featured]
+        for _ in range(500):
+            if all(client.white is not None for client in featured):
+                break
+            await asyncio.sleep(0.01)
+        else:
+            print("[LOADTEST] Warning: the featured game did not start; is the server idle?")
+        return tasks
+
+    def end_featured_game(self):
+        """Spectators go on to watch other games, which are not timed."""
+        for client in self.clients[:2]:
+            client.featured = False
+        self.featured_moves.clear()
+
+    async def measure_loop_lag(self, period=0.05):
+        """Track how late our own event loop wakes up. High lag means the generator,
+        not the server, is the bottleneck and latencies are overstated."""
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + period
+            await asyncio.sleep(period)
+            self.loop_lag.add(max(0.0, loop.time() - expected))
+
+    async def monitor(self, start):
+        """Sample counters every interval until cancelled."""
+        while True:
+            await self.sample(start)
+            print(f"[LOADTEST] {self.format_sample(self.samples[-1])}")
+            await asyncio.sleep(self.interval)
+
+    async def sample(self, start):
+        """Record one time-series point; server counters come from STATS polled on a
+        connection that never joins a game."""
+        server = {}
+        writer = self._stats_writer
+        if writer is not None and not writer.is_closing():
+            try:
+                writer.write(pack_frame(MSG_STATS, 0))
+                _, _, length, _ = HEADER.unpack(await self._stats_reader.readexactly(HEADER.size))
+                server = json.loads(unpack_text(await self._stats_reader.readexactly(length)))
+            except (OSError, asyncio.IncompleteReadError, ValueError):
+                pass
+        self.samples.append({
+            't': round(time.perf_counter() - start, 1),
+            'connections': self.connections,
+            'moves_sent': self.moves_sent,
+            'chats_sent': self.chats_sent,
+            'relay_p50_ms': self.relay_latency.summary()['p50'],
+            'relay_p99_ms': self.relay_latency.summary()['p99'],
+            'server': server,
+        })
+
+    def format_sample(self, sample):
+        server = sample['server']
+        text = (f"t={sample['t']:.0f}s conns={sample['connections']} moves={sample['moves_sent']} "
+                f"relay p50={sample['relay_p50_ms']}ms p99={sample['relay_p99_ms']}ms")
+        if server:
+            text += (f" | server games={server.get('games_active')} "
+                     f"relayed={server.get('moves_relayed')} mem={server.get('memory_kb')}KiB")
+        return text
+
+    def report(self, elapsed):
+        """Summary of the whole run."""
+        memory = [(s['t'], s['server']['memory_kb']) for s in self.samples
+                  if s['server'].get('memory_kb') is not None]
+        growth = None
+        if len(memory) >= 2:
+            (t0, m0), (t1, m1) = memory[0], memory[-1]
+            growth = {'start_kb': m0, 'end_kb': m1, 'peak_kb': max(m for _, m in memory),
+                      'kb_per_minute': round((m1 - m0) * 60 / (t1 - t0), 1) if t1 > t0 else 0.0}
+        server = self.samples[-1]['server'] if self.samples else {}
+        return {
+            'clients': len(self.clients),
+            'seconds': round(elapsed, 1),
+            'moves_sent': self.moves_sent,
+            'moves_per_second': round(self.moves_sent / elapsed, 1),
+            'chats_sent': self.chats_sent,
+            'chats_received': self.chats_received,
+            'frames_per_second': round((self.frames_sent + self.frames_received) / elapsed, 1),
+            'games_started': self.games_started,
+            'games_finished': self.games_finished,
+            'games_abandoned': self.games_abandoned,
+            'peak_games_active': max((s['server'].get('games_active', 0) for s in self.samples), default=0),
+            'relay_latency_ms': self.relay_latency.summary(),
+            'ack_latency_ms': self.ack_latency.summary(),
+            'client_loop_lag_ms': self.loop_lag.summary(),
+            'client_movegen_ms': round(self.movegen_seconds * 1000 / max(1, self.moves_sent), 3),
+            'errors': {'connection': self.connection_errors, 'protocol': self.protocol_errors,
+                       'server': self.server_errors, 'desync': self.desyncs},
+            'spectators': {
+                'count': len(self.spectators),
+                'slow': sum(s.slow for s in self.spectators),
+                'frames': self.spectator_frames,
+                'resyncs': self.spectator_resyncs,
+                'drops': self.spectator_drops,
+                'latency_ms': self.spectator_latency.summary(),
+            } if self.spectators else None,
+            'server': server,
+            'memory': growth,
+            'samples': self.samples,
+        }
+
+
+def raise_file_limit(needed):
+    """Raise the open-file soft limit toward the hard limit for many sockets."""
+    try:
+        import resource
+    except ImportError:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft != resource.RLIM_INFINITY and soft < needed:
+        target = needed if hard == resource.RLIM_INFINITY else min(needed, hard)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (target, hard))
+        if target < needed:
+            print(f"[LOADTEST] Warning: open-file limit is {target}, "
+                  f"about {needed} needed (run the server on another machine or raise ulimit -n)")
+
+
+def print_report(report):
+    print(f"[LOADTEST] {report['clients']} clients for {report['seconds']}s: "
+          f"{report['moves_per_second']} moves/s, {report['frames_per_second']} frames/s, "
+          f"peak {report['peak_games_active']} concurrent games")
+    print(f"[LOADTEST] Games: {report['games_started']} started, {report['games_finished']} finished, "
+          f"{report['games_abandoned']} abandoned at the ply limit, "
+          f"{report['server'].get('time_forfeits', 0)} lost on time; errors {report['errors']}")
+    for name in ('relay_latency_ms', 'ack_latency_ms', 'client_loop_lag_ms'):
+        s = report[name]
+        print(f"[LOADTEST] {name}: n={s['count']} mean={s['mean']} p50={s['p50']} "
+              f"p90={s['p90']} p99={s['p99']} p99.9={s['p999']} max={s['max']}")
+    spectators = report['spectators']
+    if spectators:
+        s = spectators['latency_ms']
+        print(f"[LOADTEST] Spectators: {spectators['count']} ({spectators['slow']} slow), "
+              f"{spectators['frames']} frames, {spectators['resyncs']} catch-up resyncs, {spectators['drops']} dropped; "
+              f"fan-out {report['server'].get('fanout_us_per_frame')} us/frame on the server")
+        print(f"[LOADTEST] spectator_latency_ms: n={s['count']} mean={s['mean']} p50={s['p50']} "
+              f"p90={s['p90']} p99={s['p99']} p99.9={s['p999']} max={s['max']}")
+    if report['client_loop_lag_ms']['p99'] > 10:
+        print("[LOADTEST] Warning: the generator's event loop is lagging; use fewer clients, "
+              "a longer --think-ms or several generator processes against the same server")
+    if report['memory']:
+        m = report['memory']
+        print(f"[LOADTEST] Server memory: {m['start_kb']} -> {m['end_kb']} KiB "
+              f"(peak {m['peak_kb']}, {m['kb_per_minute']:+} KiB/min)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the online chess server.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5001)
+    parser.add_argument('--clients', type=int, default=1000)
+    parser.add_argument('--duration', type=float, default=60, help="seconds to run")
+    parser.add_argument('--think-ms', type=float, default=DEFAULT_THINK_MS,
+                        help="mean think time per move (0 = answer at once)")
+    parser.add_argument('--chat-rate', type=float, default=0.05,
+                        help="chat messages per client per second")
+    parser.add_argument('--ramp', type=int, default=500, help="new clients per second (0 = all at once)")
+    parser.add_argument('--max-plies', type=int, default=DEFAULT_MAX_PLIES)
+    parser.add_argument('--interval', type=float, default=5, help="seconds between STATS samples")
+    parser.add_argument('--time-control', type=int, default=0,
+                        help="seconds per player; exercises the server clocks and flag timers")
+    parser.add_argument('--spectators', type=int, default=0, help="spectators watching the featured game")
+    parser.add_argument('--slow-spectators', type=int, default=0,
+                        help="how many of the spectators read slowly")
+    parser.add_argument('--slow-read-ms', type=float, default=200, help="delay after each frame for slow spectators")
+    parser.add_argument('--spawn-server', action='store_true',
+                        help="start chess_server.py as a subprocess for the run")
+    parser.add_argument('--json', help="write the full report, including samples, to this file")
+    args = parser.parse_args()
+
+    raise_file_limit((args.clients + args.spectators) * (2 if args.spawn_server else 1) + 64)
+
+    server = None
+    if args.spawn_server:
+        script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'chess_server.py')
+        server = subprocess.Popen([sys.executable, script, '--host', args.host, '--port', str(args.port)])
+        time.sleep(1)
+
+    test = LoadTest(args.host, args.port, args.clients, args.duration, args.think_ms,
+                    args.chat_rate, args.ramp, args.max_plies, args.interval, args.spectators,
+                    args.slow_spectators, args.slow_read_ms, args.time_control)
+    try:
+        report = asyncio.run(test.run())
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    print_report(report)
+    if report['relay_latency_ms']['count']:
+        print("[LOADTEST] Move relay latency:")
+        print(test.relay_latency.format_bars())
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"[LOADTEST] Report written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,348 @@
+"""
+Forced-mate solver using depth-first proof-number search (df-pn).
+
+The side to move is the attacker. OR nodes are attacker moves (one mating
+move is enough), AND nodes are defender moves (every reply must lose).
+Proof and disproof numbers steer the search toward the cheapest part of the
+tree left to prove, so forced mates with checks and few replies are found
+long before a full-width search would get there. Depth is bounded in
+attacker moves. Mate in 1, 2, ... N are tried in turn, so the mate reported
+is the shortest one. The node table is bounded: when full, the half holding
+the least search effort is dropped.
+
+Usage:
+    python chess_mate.py "<FEN>" [--max-moves 5] [--time 10]
+    python chess_mate.py puzzles.epd [--max-moves 5] [--time 10] [--table 1000000]
+
+EPD records may carry "dm <n>" (direct mate in n) and "bm" operations; they
+are checked against the solution.
+"""
+
+import argparse
+import time
+
+from chess import ChessBoard, read_epd
+
+INF = 10 ** 9
+DEFAULT_MAX_MOVES = 5
+DEFAULT_TIME_LIMIT = 10.0       # seconds per position
+DEFAULT_TABLE_SIZE = 1_000_000  # node table entries before garbage collection
+PROOF_COUNT_LIMIT = 100_000     # stop counting proof-tree nodes beyond this
+
+KNIGHT_STEPS = [(-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1)]
+KING_STEPS = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]
+ROOK_DIRECTIONS = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+BISHOP_DIRECTIONS = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
+
+
+class _Timeout(Exception):
+    pass
+
+
+def _candidate_squares(grid, kind, white, row, col):
+    """Pseudo-legal destinations: move geometry with blockers, before the king-safety test."""
+    if kind == 'p':
+        step = -1 if white else 1
+        targets = []
+        ahead = row + step
+        if 0 <= ahead < 8:
+            if grid[ahead][col] == '.':
+                targets.append((ahead, col))
+                if row == (6 if white else 1) and grid[ahead + step][col] == '.':
+                    targets.append((ahead + step, col))
+            for c in (col - 1, col + 1):
+                if 0 <= c < 8:
+                    targets.append((ahead, c))  # captures and en passant; is_valid_move decides
+        return targets
+    if kind == 'n' or kind == 'k':
+        targets = [(row + dr, col + dc) for dr, dc in (KNIGHT_STEPS if kind == 'n' else KING_STEPS)
+                   if 0 <= row + dr < 8 and 0 <= col + dc < 8]
+        if kind == 'k' and col == 4:
+            targets += [(row, 2), (row, 6)]
+        return targets
+
+    directions = ROOK_DIRECTIONS if kind == 'r' else BISHOP_DIRECTIONS if kind == 'b' \
+        else ROOK_DIRECTIONS + BISHOP_DIRECTIONS
+    targets = []
+    for dr, dc in directions:
+        r, c = row + dr, col + dc
+        while 0 <= r < 8 and 0 <= c < 8:
+            targets.append((r, c))
+            if grid[r][c] != '.':
+                break
+            r += dr
+            c += dc
+    return targets
+
+
+def legal_moves(board):
+    """Legal moves for the side to move as (from_row, from_col, to_row, to_col, promotion)."""
+    white = board.current_turn == 'white'
+    grid = board.board
+    moves = []
+    for row in range(8):
+        for col in range(8):
+            piece = grid[row][col]
+            if piece == '.' or piece.isupper() != white:
+                continue
+            kind = piece.lower()
+            for to_row, to_col in _candidate_squares(grid, kind, white, row, col):
+                if not board.is_valid_move(row, col, to_row, to_col):
+                    continue
+                if kind == 'p' and to_row in (0, 7):
+                    for promotion in ('QNRB' if white else 'qnrb'):
+                        moves.append((row, col, to_row, to_col, promotion))
+                else:
+                    moves.append((row, col, to_row, to_col, None))
+    return moves
+
+
+def _save(board):
+    return ([row[:] for row in board.board], board.current_turn, board.white_king_pos, board.black_king_pos,
+            board.white_king_moved, board.black_king_moved,
+            board.white_rook_kingside_moved, board.white_rook_queenside_moved,
+            board.black_rook_kingside_moved, board.black_rook_queenside_moved,
+            board.en_passant_target, board.halfmove_clock, board.fullmove_number)
+
+
+def _restore(board, state):
+    (rows, board.current_turn, board.white_king_pos, board.black_king_pos,
+     board.white_king_moved, board.black_king_moved,
+     board.white_rook_kingside_moved, board.white_rook_queenside_moved,
+     board.black_rook_kingside_moved, board.black_rook_queenside_moved,
+     board.en_passant_target, board.halfmove_clock, board.fullmove_number) = state
+    for row, saved in zip(board.board, rows):
+        row[:] = saved
+    board.move_history.pop()
+
+
+def move_san(board, move):
+    """SAN for a legal move, with '+' or '#'."""
+    san = board.get_san(*move)
+    state = _save(board)
+    board._apply_move(*move)
+    if board.is_in_check():
+        san += '#' if not legal_moves(board) else '+'
+    _restore(board, state)
+    return san
+
+
+class MateSolver:
+    """df-pn search for forced mates; one instance can solve many positions."""
+
+    def __init__(self, table_size=DEFAULT_TABLE_SIZE, time_limit=DEFAULT_TIME_LIMIT):
+        self.table_size = table_size
+        self.time_limit = time_limit
+        self.table = {}         # (zobrist, attacker moves left) -> [pn, dn, nodes spent]
+        self.nodes = 0
+        self.collections = 0
+        self.deadline = None
+
+    def solve(self, fen, max_moves=DEFAULT_MAX_MOVES):
+        """Look for a forced mate for the side to move in at most max_moves moves.
+
+        Returns a dict with 'status' ('mate', 'no mate' or 'timeout'), 'mate'
+        (moves), 'move' (first move as a ChessBoard move tuple), 'pv' (SAN),
+        'nodes', 'seconds', 'nps', 'proof_size' and 'table' (entries in use).
+        """
+        board = ChessBoard(fen)
+        self.table.clear()
+        self.nodes = 0
+        self.collections = 0
+        start = time.perf_counter()
+        self.deadline = start + self.time_limit if self.time_limit else None
+
+        status, mate = 'no mate', None
+        try:
+            for moves_left in range(1, max_moves + 1):
+                self._mid(board, moves_left, True, INF, INF)
+                pn, dn = self._lookup(board.zobrist_hash(), moves_left)
+                if pn == 0:
+                    status, mate = 'mate', moves_left
+                    break
+        except _Timeout:
+            status = 'timeout'
+            board = ChessBoard(fen)  # the search was interrupted mid-move
+        elapsed = time.perf_counter() - start
+
+        result = {'status': status, 'mate': mate, 'move': None, 'pv': [], 'nodes': self.nodes,
+                  'seconds': elapsed, 'nps': self.nodes / elapsed if elapsed else 0.0,
+                  'proof_size': 0, 'table': len(self.table), 'collections': self.collections}
+        if mate:
+            result['pv'], moves = self._principal_variation(board, mate)
+            result['move'] = moves[0] if moves else None
+            result['proof_size'] = self._proof_size(board, mate, True, [0])
+        return result
+
+    def _lookup(self, key, moves_left):
+        entry = self.table.get((key, moves_left))
+        return (entry[0], entry[1]) if entry else (1, 1)
+
+    def _store(self, key, pn, dn, work):
+        if len(self.table) >= self.table_size and key not in self.table:
+            # Keep the half of the table that cost the most nodes to compute
+            keep = sorted(self.table.items(), key=lambda item: item[1][2], reverse=True)[:self.table_size // 2]
+            self.table = dict(keep)
+            self.collections += 1
+        self.table[key] = [pn, dn, work]
+
+    def _mid(self, board, moves_left, or_node, thpn, thdn):
+        """Expand the node until its proof or disproof number reaches its threshold."""
+        self.nodes += 1
+        if self.deadline and self.nodes & 255 == 0 and time.perf_counter() > self.deadline:
+            raise _Timeout()
+        start_nodes = self.nodes
+        key = (board.zobrist_hash(), moves_left)
+
+        # Terminal nodes: out of attacker moves, checkmate or stalemate
+        if not or_node and moves_left == 0 and not board.is_in_check():
+            self._store(key, INF, 0, 1)
+            return
+        moves = legal_moves(board) if moves_left or not or_node else []
+        if not moves:
+            mated = not or_node and board.is_in_check()
+            self._store(key, 0 if mated else INF, INF if mated else 0, 1)
+            return
+        if not or_node and moves_left == 0:
+            self._store(key, INF, 0, 1)
+            return
+
+        child_left = moves_left - 1 if or_node else moves_left
+        children = []
+        for move in moves:
+            state = _save(board)
+            board._apply_move(*move)
+            children.append((move, board.zobrist_hash()))
+            _restore(board, state)
+
+        while True:
+            values = [self._lookup(child, child_left) for _, child in children]
+            if or_node:
+                pn = min(v[0] for v in values)
+                dn = min(INF, sum(v[1] for v in values))
+            else:
+                pn = min(INF, sum(v[0] for v in values))
+                dn = min(v[1] for v in values)
+            if pn >= thpn or dn >= thdn:
+                break
+
+            # Most promising child and the runner-up value that bounds its threshold
+            index = 0 if or_node else 1
+            order = sorted(range(len(values)), key=lambda i: values[i][index])
+            best = order[0]
+            second = values[order[1]][index] if len(order) > 1 else INF
+            child_pn, child_dn = values[best]
+            if or_node:
+                child_thpn = min(thpn, second + 1)
+                child_thdn = min(INF, thdn - dn + child_dn)
+            else:
+                child_thpn = min(INF, thpn - pn + child_pn)
+                child_thdn = min(thdn, second + 1)
+
+            state = _save(board)
+            board._apply_move(*children[best][0])
+            self._mid(board, child_left, not or_node, child_thpn, child_thdn)
+            _restore(board, state)
+
+        self._store(key, pn, dn, self.nodes - start_nodes + 1)
+
+    def _child_entries(self, board, moves_left, or_node):
+        """(move, table entry or None) for every child of a node."""
+        child_left = moves_left - 1 if or_node else moves_left
+        children = []
+        for move in legal_moves(board):
+            state = _save(board)
+            board._apply_move(*move)
+            entry = self.table.get((board.zobrist_hash(), child_left))
+            _restore(board, state)
+            children.append((move, entry))
+        return children
+
+    def _principal_variation(self, board, mate):
+        """Mating line: a proven attacker move, then the defence that took the most effort to refute."""
+        board = ChessBoard(board.get_fen())
+        sans, moves = [], []
+        moves_left, or_node = mate, True
+        while True:
+            children = [(move, entry) for move, entry in self._child_entries(board, moves_left, or_node)]
+            if not children:
+                break
+            if or_node:
+                proven = [(move, entry) for move, entry in children if entry and entry[0] == 0]
+                if not proven:
+                    break
+                move = min(proven, key=lambda item: item[1][2])[0]
+            else:
+                move = max(children, key=lambda item: item[1][2] if item[1] else 0)[0]
+            sans.append(move_san(board, move))
+            moves.append(move)
+            board._apply_move(*move)
+            if or_node:
+                moves_left -= 1
+            or_node = not or_node
+        return sans, moves
+
+    def _proof_size(self, board, moves_left, or_node, count):
+        """Nodes in the proof tree (one mating move per OR node, every reply at AND nodes)."""
+        count[0] += 1
+        if count[0] >= PROOF_COUNT_LIMIT:
+            return count[0]
+        children = self._child_entries(board, moves_left, or_node)
+        if or_node:
+            children = [min(((m, e) for m, e in children if e and e[0] == 0), key=lambda item: item[1][2],
+                            default=(None, None))]
+        for move, entry in children:
+            if move is None or not entry or entry[0] != 0:
+                continue
+            state = _save(board)
+            board._apply_move(*move)
+            self._proof_size(board, moves_left - 1 if or_node else moves_left, not or_node, count)
+            _restore(board, state)
+        return count[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find forced mates with proof-number search.")
+    parser.add_argument('source', help="a FEN string or an EPD file")
+    parser.add_argument('--max-moves', type=int, default=DEFAULT_MAX_MOVES)
+    parser.add_argument('--time', type=float, default=DEFAULT_TIME_LIMIT, help="seconds per position")
+    parser.add_argument('--table', type=int, default=DEFAULT_TABLE_SIZE, help="node table entries")
+    args = parser.parse_args()
+
+    if args.source.lower().endswith(('.epd', '.fen')):
+        positions = [(board.get_fen(), ops) for board, ops in read_epd(args.source)]
+    else:
+        positions = [(args.source, {})]
+
+    solver = MateSolver(args.table, args.time)
+    solved = agreed = nodes = 0
+    seconds = 0.0
+    for number, (fen, ops) in enumerate(positions, 1):
+        ident = (ops.get('id') or [f"#{number}"])[0]
+        expected = int(ops['dm'][0]) if ops.get('dm') else None
+        limit = max(args.max_moves, expected or 0)
+        result = solver.solve(fen, limit)
+        nodes += result['nodes']
+        seconds += result['seconds']
+
+        line = f"[MATE] {ident}: "
+        if result['status'] == 'mate':
+            solved += 1
+            line += f"mate in {result['mate']}: {' '.join(result['pv'])}"
+            bm = [san.rstrip('+#!?') for san in ops.get('bm', [])]
+            ok = (expected is None or result['mate'] == expected) and \
+                (not bm or result['pv'][0].rstrip('+#') in bm)
+            agreed += ok
+            if not ok:
+                line += f"  (expected {'dm ' + str(expected) if expected else ''} {' '.join(bm)})"
+        else:
+            line += result['status'] + (f" within {limit}" if result['status'] == 'no mate' else "")
+        print(line + f"  [{result['nodes']} nodes, {result['nps']:.0f} nodes/s, proof {result['proof_size']}, "
+                     f"table {result['table']}]")
+
+    print(f"[MATE] {solved}/{len(positions)} mates found ({agreed} matching dm/bm), {nodes} nodes in "
+          f"{seconds:.1f}s, {nodes / seconds if seconds else 0:.0f} nodes/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+"""
+Incremental NNUE-style evaluation for the Python rules engine.
+
+The network is the usual perspective design. There are 768 input features
+(piece and colour on a square), and the feature transformer maps them into
+two accumulators of `hidden` int16 values, one seen from each side. A single
+output neuron reads both accumulators after a clipped ReLU, the side to
+move's accumulator first. At most 32 inputs are active and a move changes
+only two to four of them. So NNUEEvaluator keeps a stack of accumulators
+instead of recomputing them: push(move) adds and subtracts the few weight
+rows the move touches, pop() goes back to the parent position, and the
+output layer reads the accumulator directly.
+
+Weights are trained offline and stored quantized. The feature transformer
+uses scale QA and the output layer scale QB, all as int16. They are read
+from an .npz (ft_weight, ft_bias, out_weight, out_bias) or from the flat
+little-endian int16 file written by common NNUE trainers, in the same order.
+
+Usage:
+    python chess_nnue.py eval "<FEN>" [--weights net.npz|net.bin]
+    python chess_nnue.py bench [--weights net.bin | --hidden 256] [--games 20] [--plies 80]
+"""
+
+import argparse
+import random
+import time
+
+import numpy as np
+
+from chess import ChessBoard
+from chess_eval import PIECE_PLANES, BENCH_FENS
+from chess_mate import legal_moves
+
+INPUTS = 768                # 12 piece planes x 64 squares
+DEFAULT_HIDDEN = 256
+QA = 255                    # feature transformer quantization (clipped ReLU ceiling)
+QB = 64                     # output layer quantization
+EVAL_SCALE = 400            # network output -> centipawns
+MAX_PLY = 256               # accumulator stack depth
+
+# Piece and square -> (feature seen by white, feature seen by black). Black sees
+# the board flipped vertically with the colours swapped, so a black pawn on e7
+# is to black what a white pawn on e2 is to white.
+_FEATURES = {
+    piece: [(index * 64 + square, ((index + 6) % 12) * 64 + (square ^ 56)) for square in range(64)]
+    for index, piece in enumerate(PIECE_PLANES)
+}
+
+
+def board_features(board):
+    """Active features of a position as (white view, black view) index lists."""
+    white, black = [], []
+    for row, pieces in enumerate(board.board):
+        for col, piece in enumerate(pieces):
+            if piece != '.':
+                w, b = _FEATURES[piece][row * 8 + col]
+                white.append(w)
+                black.append(b)
+    return white, black
+
+
+def move_features(board, move):
+    """(added, removed) feature pairs for a legal move, computed before the move is made.
+
+    Mirrors ChessBoard._apply_move: captures, en passant, castling rooks and
+    promotions (to the given piece, else a queen).
+    """
+    from_row, from_col, to_row, to_col = move[:4]
+    promotion = move[4] if len(move) > 4 else None
+    rows = board.board
+    piece = rows[from_row][from_col]
+
+    removed = [_FEATURES[piece][from_row * 8 + from_col]]
+    added = []
+    captured = rows[to_row][to_col]
+    if captured != '.':
+        removed.append(_FEATURES[captured][to_row * 8 + to_col])
+
+    if piece in 'Pp':
+        if board.en_passant_target == (to_row, to_col):
+            removed.append(_FEATURES['p' if piece == 'P' else 'P'][from_row * 8 + to_col])
+        elif to_row in (0, 7):
+            piece = promotion or ('Q' if piece == 'P' else 'q')
+    elif piece in 'Kk' and abs(to_col - from_col) == 2:
+        rook_from, rook_to = (7, to_col - 1) if to_col > from_col else (0, to_col + 1)
+        rook = rows[from_row][rook_from]
+        removed.append(_FEATURES[rook][from_row * 8 + rook_from])
+        added.append(_FEATURES[rook][from_row * 8 + rook_to])
+
+    added.append(_FEATURES[piece][to_row * 8 + to_col])
+    return added, removed
+
+
+class NNUEWeights:
+    """Quantized network parameters."""
+
+    def __init__(self, ft_weight, ft_bias, out_weight, out_bias):
+        self.ft_weight = np.ascontiguousarray(ft_weight, dtype=np.int16).reshape(INPUTS, -1)
+        self.hidden = self.ft_weight.shape[1]
+        self.ft_bias = np.asarray(ft_bias, dtype=np.int16).reshape(self.hidden)
+        # Output weights for (white accumulator, black accumulator), one order per side to move.
+        # float64 keeps the dot product exact for any int16 network of this shape.
+        out_weight = np.asarray(out_weight, dtype=np.int16).reshape(2, self.hidden).astype(np.float64)
+        self.out_white = out_weight.ravel()
+        self.out_black = out_weight[::-1].ravel()
+        self.out_bias = int(np.asarray(out_bias).reshape(-1)[0])
+
+    @classmethod
+    def random(cls, hidden=DEFAULT_HIDDEN, seed=1):
+        """An untrained network of the given size, for benchmarks."""
+        rng = np.random.default_rng(seed)
+        return cls(rng.integers(-32, 33, (INPUTS, hidden)), rng.integers(0, 64, hidden),
+                   rng.integers(-64, 65, 2 * hidden), rng.integers(-1024, 1025))
+
+    def save(self, path):
+        np.savez(path, ft_weight=self.ft_weight, ft_bias=self.ft_bias,
+                 out_weight=self.out_white.astype(np.int16), out_bias=np.array([self.out_bias], np.int16))
+
+    @classmethod
+    def load(cls, path, hidden=None):
+        """Load an .npz, or a raw int16 file (hidden size inferred unless given)."""
+        if path.lower().endswith('.npz'):
+            with np.load(path) as data:
+                return cls(data['ft_weight'], data['ft_bias'], data['out_weight'], data['out_bias'])
+
+        values = np.fromfile(path, dtype='<i2')
+        hidden = hidden or (len(values) - 1) // (INPUTS + 3)
+        needed = INPUTS * hidden + 3 * hidden + 1
+        if hidden <= 0 or len(values) < needed:
+            raise ValueError(f"{path}: {len(values)} int16 values is too short for a {hidden}-wide network")
+        offsets = np.cumsum([0, INPUTS * hidden, hidden, 2 * hidden, 1])
+        return cls(*(values[a:b] for a, b in zip(offsets, offsets[1:])))
+
+    def refresh(self, white, black, out=None):
+        """Accumulators computed from scratch for the given active features."""
+        if out is None:
+            out = np.empty((2, self.hidden), dtype=np.int16)
+        np.add(self.ft_bias, self.ft_weight[white].sum(axis=0, dtype=np.int16), out=out[0])
+        np.add(self.ft_bias, self.ft_weight[black].sum(axis=0, dtype=np.int16), out=out[1])
+        return out
+
+    def output(self, accumulators, white_to_move, scratch=None):
+        """Centipawns for the side to move; scratch is an optional (2, hidden) float64 buffer."""
+        if scratch is None:
+            scratch = np.empty((2, self.hidden))
+        np.copyto(scratch, accumulators)
+        np.minimum(scratch, QA, out=scratch)
+        np.maximum(scratch, 0, out=scratch)
+        weights = self.out_white if white_to_move else self.out_black
+        return (int(np.dot(scratch.ravel(), weights)) + self.out_bias) * EVAL_SCALE // (QA * QB)
+
+    def evaluate(self, board):
+        """Full evaluation of a ChessBoard, without any incremental state."""
+        return self.output(self.refresh(*board_features(board)), board.current_turn == 'white')
+
+
+class NNUEEvaluator:
+    """Accumulator stack for one ChessBoard being searched.
+
+    Call push(move) just before making a legal move on the board and pop()
+    after taking it back; evaluate() scores the board's current position.
+    """
+
+    def __init__(self, weights, board=None, max_ply=MAX_PLY):
+        self.weights = weights
+        self.stack = np.empty((max_ply + 1, 2, weights.hidden), dtype=np.int16)
+        self.scratch = np.empty((2, weights.hidden))
+        self.ply = 0
+        self.board = None
+        if board is not None:
+            self.reset(board)
+
+    def reset(self, board):
+        self.board = board
+        self.ply = 0
+        self.weights.refresh(*board_features(board), out=self.stack[0])
+
+    def push(self, move):
+        added, removed = move_features(self.board, move)
+        weight = self.weights.ft_weight
+        previous, current = self.stack[self.ply], self.stack[self.ply + 1]
+        white, black = current
+        (w, b), *added = added
+        np.add(previous[0], weight[w], out=white)
+        np.add(previous[1], weight[b], out=black)
+        for w, b in added:
+            white += weight[w]
+            black += weight[b]
+        for w, b in removed:
+            white -= weight[w]
+            black -= weight[b]
+        self.ply += 1
+
+    def pop(self):
+        self.ply -= 1
+
+    def evaluate(self):
+        return self.weights.output(self.stack[self.ply], self.board.current_turn == 'white', self.scratch)
+
+
+def random_games(count, plies, seed=1):
+    """(start FEN, moves) for random legal playouts from the benchmark positions."""
+    rng = random.Random(seed)
+    games = []
+    for number in range(count):
+        fen = BENCH_FENS[number % len(BENCH_FENS)]
+        board = ChessBoard(fen)
+        moves = []
+        for _ in range(plies):
+            legal = legal_moves(board)
+            if not legal:
+                break
+            moves.append(rng.choice(legal))
+            board._apply_move(*moves[-1])
+        games.append((fen, moves))
+    return games
+
+
+def bench(weights, games, repeat=3):
+    """Evals/s along the games for incremental updates and for full recomputation.
+
+    Both loops make the same moves on the board; a loop that only makes the
+    moves is timed too and subtracted, so the rates are for evaluation alone.
+    Returns a dict of rates and the number of positions where the incremental
+    score (going forward, and again after pop) differed from the full one.
+    """
+    positions = sum(len(moves) for _, moves in games)
+    evaluator = NNUEEvaluator(weights, max_ply=max(len(moves) for _, moves in games))
+
+    def timed(step, setup=None):
+        best = float('inf')
+        for _ in range(repeat):
+            boards = [ChessBoard(fen) for fen, _ in games]
+            start = time.perf_counter()
+            for board, (_, moves) in zip(boards, games):
+                if setup:
+                    setup(board)
+                for move in moves:
+                    step(board, move)
+            best = min(best, time.perf_counter() - start)
+        return best
+
+    def incremental(board, move):
+        evaluator.push(move)
+        board._apply_move(*move)
+        evaluator.evaluate()
+
+    def full(board, move):
+        board._apply_move(*move)
+        weights.evaluate(board)
+
+    moves_only = timed(lambda board, move: board._apply_move(*move))
+    incremental_time = timed(incremental, evaluator.reset) - moves_only
+    full_time = timed(full) - moves_only
+
+    # Check the incremental scores against full recomputation, forwards and after pop
+    mismatches = 0
+    for fen, moves in games:
+        board = ChessBoard(fen)
+        evaluator.reset(board)
+        expected = [weights.evaluate(board)]
+        for move in moves:
+            evaluator.push(move)
+            board._apply_move(*move)
+            expected.append(weights.evaluate(board))
+            mismatches += evaluator.evaluate() != expected[-1]
+        for ply in range(len(moves) - 1, -1, -1):
+            evaluator.pop()
+            board.current_turn = 'white' if board.current_turn == 'black' else 'black'
+            mismatches += evaluator.evaluate() != expected[ply]
+
+    return {'positions': positions, 'incremental': positions / max(incremental_time, 1e-9),
+            'full': positions / max(full_time, 1e-9), 'mismatches': mismatches}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incremental NNUE-style evaluator.")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    one = sub.add_parser('eval', help="Evaluate one position")
+    one.add_argument('fen', nargs='?', default=BENCH_FENS[0])
+    one.add_argument('--weights', help="network file (.npz or raw int16); default: random network")
+
+    speed = sub.add_parser('bench', help="Incremental updates vs full recomputation")
+    speed.add_argument('--weights', help="network file (.npz or raw int16); default: random network")
+    speed.add_argument('--hidden', type=int, default=DEFAULT_HIDDEN, help="accumulator size of the random network")
+    speed.add_argument('--games', type=int, default=20)
+    speed.add_argument('--plies', type=int, default=80)
+    speed.add_argument('--repeat', type=int, default=3)
+
+    args = parser.parse_args()
+    weights = NNUEWeights.load(args.weights) if args.weights else \
+        NNUEWeights.random(getattr(args, 'hidden', DEFAULT_HIDDEN))
+    source = args.weights or "random network"
+
+    if args.command == 'eval':
+        board = ChessBoard(args.fen)
+        score = weights.evaluate(board)
+        white = score if board.current_turn == 'white' else -score
+        print(f"[NNUE] {source}, 768x{weights.hidden}x2 -> 1")
+        print(f"[NNUE] {score:+d} cp for the side to move ({white:+d} white's view)")
+        return
+
+    games = random_games(args.games, args.plies)
+    result = bench(weights, games, args.repeat)
+    print(f"[NNUE] {source}, hidden {weights.hidden}, {result['positions']} positions from {len(games)} games")
+    print(f"[NNUE] incremental {result['incremental']:,.0f} evals/s ({1e6 / result['incremental']:.1f} us), "
+          f"full recompute {result['full']:,.0f} evals/s ({1e6 / result['full']:.1f} us), "
+          f"speedup {result['incremental'] / result['full']:.1f}x")
+    print(f"[NNUE] {result['mismatches']} incremental/full mismatches")
+
+
+if __name__ == "__main__":
+    main()
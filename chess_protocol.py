@@ -0,0 +1,219 @@
+"""
+Binary wire protocol for online chess.
+
+Every message is one frame: an 8-byte header followed by the payload.
+
+    header  <BBHI   version, message type, payload length, sequence number
+
+Each side numbers its frames with its own increasing sequence. Moves are
+acknowledged with an ACK carrying the move's sequence number. A reconnecting
+client sends HELLO with the session token it got in COLOR and the server
+answers with RESYNC (move count, FEN and the game's moves) so both sides
+agree on the position and the move list.
+
+    HELLO     <QI       session token (0 = new player), time control in seconds (0 = none)
+    COLOR     <BQ       1 if white, session token
+    MOVE      <H        move packed by chess.encode_move
+    ACK       <I        sequence number being acknowledged
+    CHAT      utf-8
+    ERROR     utf-8
+    GAMEOVER  utf-8     "<result> <reason>"
+    RESYNC    <H ascii  move count, FEN; then optionally NUL and the game's moves as <H each
+    STATS     utf-8     JSON (empty payload = request)
+    WATCH     <I        game id to spectate (0 = the longest-running game)
+    PING      <Q        server timestamp in microseconds
+    PONG      <Q        the PING timestamp, echoed straight back
+    CLOCK     <IIB      white ms, black ms, running clock (0 none, 1 white, 2 black)
+
+A spectator gets a RESYNC snapshot, then the game's MOVE frames and finally
+GAMEOVER. Spectator frames are numbered by ply rather than per connection, so
+the server can encode each move once and send the same bytes to everyone.
+
+In timed games the clocks live on the server. It pings each player to
+estimate the round trip, sends a CLOCK snapshot after every move and decides
+time forfeits itself; clients only interpolate between snapshots.
+"""
+
+import struct
+
+PROTOCOL_VERSION = 1
+HEADER = struct.Struct('<BBHI')
+MAX_PAYLOAD = 4096
+
+MSG_HELLO = 1
+MSG_COLOR = 2
+MSG_MOVE = 3
+MSG_ACK = 4
+MSG_CHAT = 5
+MSG_ERROR = 6
+MSG_GAMEOVER = 7
+MSG_RESYNC = 8
+MSG_STATS = 9
+MSG_WATCH = 10
+MSG_PING = 11
+MSG_PONG = 12
+MSG_CLOCK = 13
+
+_U16 = struct.Struct('<H')
+_U32 = struct.Struct('<I')
+_U64 = struct.Struct('<Q')
+_COLOR = struct.Struct('<BQ')
+_HELLO = struct.Struct('<QI')
+_CLOCK = struct.Struct('<IIB')
+
+
+class ProtocolError(Exception):
+    """Raised for frames that do not follow the protocol."""
+
+
+def pack_frame(msg_type, seq, payload=b''):
+    """Build one frame."""
+    if len(payload) > MAX_PAYLOAD:
+        raise ProtocolError(f"payload too large ({len(payload)} bytes)")
+    return HEADER.pack(PROTOCOL_VERSION, msg_type, len(payload), seq & 0xFFFFFFFF) + payload
+
+
+def pack_hello(seq, token=0, time_control=0):
+    return pack_frame(MSG_HELLO, seq, _HELLO.pack(token, time_control or 0))
+
+
+def pack_color(seq, white, token):
+    return pack_frame(MSG_COLOR, seq, _COLOR.pack(1 if white else 0, token))
+
+
+def pack_move(seq, move):
+    return pack_frame(MSG_MOVE, seq, _U16.pack(move))
+
+
+def pack_ack(seq, acked_seq):
+    return pack_frame(MSG_ACK, seq, _U32.pack(acked_seq))
+
+
+def pack_text(msg_type, seq, text):
+    """CHAT, ERROR, GAMEOVER and STATS frames carry UTF-8 text (truncated to fit)."""
+    return pack_frame(msg_type, seq, text.encode('utf-8')[:MAX_PAYLOAD])
+
+
+def pack_watch(seq, game_id=0):
+    return pack_frame(MSG_WATCH, seq, _U32.pack(game_id))
+
+
+def pack_ping(seq, timestamp):
+    return pack_frame(MSG_PING, seq, _U64.pack(timestamp))
+
+
+def pack_pong(seq, timestamp):
+    return pack_frame(MSG_PONG, seq, _U64.pack(timestamp))
+
+
+def pack_clock(seq, white_ms, black_ms, running):
+    return pack_frame(MSG_CLOCK, seq, _CLOCK.pack(white_ms, black_ms, running))
+
+
+def pack_resync(seq, move_count, fen, moves=()):
+    """RESYNC frame; the move list is left out if it would not fit in one frame."""
+    payload = _U16.pack(move_count) + fen.encode('ascii')
+    if moves and len(payload) + 1 + 2 * len(moves) <= MAX_PAYLOAD:
+        payload += b'\0' + struct.pack(f'<{len(moves)}H', *moves)
+    return pack_frame(MSG_RESYNC, seq, payload)
+
+
+def unpack_u16(payload):
+    return _U16.unpack_from(payload)[0]
+
+
+def unpack_u32(payload):
+    return _U32.unpack_from(payload)[0]
+
+
+def unpack_u64(payload):
+    return _U64.unpack_from(payload)[0]
+
+
+def unpack_color(payload):
+    """Return (white, token) from a COLOR payload."""
+    white, token = _COLOR.unpack_from(payload)
+    return bool(white), token
+
+
+def unpack_hello(payload):
+    """Return (token, time_control); older clients send only the token."""
+    if len(payload) >= _HELLO.size:
+        return _HELLO.unpack_from(payload)
+    return _U64.unpack_from(payload)[0], 0
+
+
+def unpack_clock(payload):
+    """Return (white_ms, black_ms, running) from a CLOCK payload."""
+    return _CLOCK.unpack_from(payload)
+
+
+def unpack_resync(payload):
+    """Return (move_count, fen, moves) from a RESYNC payload; moves is empty if it was left out."""
+    data = bytes(payload[2:])
+    fen, _, moves = data.partition(b'\0')
+    return _U16.unpack_from(payload)[0], fen.decode('ascii'), struct.unpack(f'<{len(moves) // 2}H', moves)
+
+
+def unpack_text(payload):
+    return bytes(payload).decode('utf-8', errors='replace')
+
+
+class FrameBuffer:
+    """Fixed-size receive buffer that parses frames in place.
+
+    Data is received straight into a bytearray with recv_into and frames are
+    returned as memoryview slices of it, so nothing is copied per message.
+    Consumed bytes are reclaimed by moving the unparsed tail to the front when
+    the free space runs out. Payload views are only valid until the next
+    recv_into/feed call.
+    """
+
+    def __init__(self, capacity=4 * (HEADER.size + MAX_PAYLOAD)):
+        self.buffer = bytearray(capacity)
+        self.view = memoryview(self.buffer)
+        self.start = 0
+        self.end = 0
+
+    def _make_room(self):
+        if self.start == self.end:
+            self.start = self.end = 0
+        elif self.end == len(self.buffer) and self.start:
+            pending = self.end - self.start
+            self.buffer[:pending] = self.view[self.start:self.end]
+            self.start, self.end = 0, pending
+
+    def recv_into(self, sock):
+        """Receive from a socket into the free space; returns bytes read (0 = closed)."""
+        self._make_room()
+        n = sock.recv_into(self.view[self.end:])
+        self.end += n
+        return n
+
+    def feed(self, data):
+        """Append received bytes (for transports that hand out bytes objects)."""
+        while data:
+            self._make_room()
+            room = len(self.buffer) - self.end
+            if room == 0:
+                raise ProtocolError("receive buffer overflow")
+            chunk = data[:room]
+            self.view[self.end:self.end + len(chunk)] = chunk
+            self.end += len(chunk)
+            data = data[room:]
+
+    def frames(self):
+        """Yield (msg_type, seq, payload_view) for every complete frame buffered."""
+        view = self.view
+        while self.end - self.start >= HEADER.size:
+            version, msg_type, length, seq = HEADER.unpack_from(view, self.start)
+            if version != PROTOCOL_VERSION:
+                raise ProtocolError(f"unsupported protocol version {version}")
+            if length > MAX_PAYLOAD:
+                raise ProtocolError(f"frame too large ({length} bytes)")
+            frame_end = self.start + HEADER.size + length
+            if frame_end > self.end:
+                break
+            payload = view[self.start + HEADER.size:frame_end]
+            self.start = frame_end
+            yield msg_type, seq, payload
@@ -0,0 +1,558 @@
+"""
+Asyncio game server for online chess.
+
+Clients speak the framed binary protocol in chess_protocol and are paired in
+arrival order (first one plays white). Every move is validated on a headless
+ChessBoard before it is relayed to the opponent, and chat is relayed with a
+length cap. A client that drops out of a running game has RECONNECT_GRACE
+seconds to come back with its session token; it then gets a RESYNC with the
+current position and move list. Otherwise the opponent wins by forfeit.
+
+A connection may send STATS before HELLO to read the server counters (including
+resident memory) without joining the pairing queue; chess_loadtest uses this.
+
+Instead of HELLO a connection may send WATCH to spectate a game. Each move is
+encoded once per game and the same frame is written to every spectator. A
+spectator whose unsent data exceeds SPECTATOR_QUEUE_LIMIT stops receiving
+moves until its queue drains, then gets a fresh RESYNC snapshot; one that does
+not drain within SPECTATOR_CATCHUP_TIMEOUT is disconnected.
+
+Timed games (HELLO carries the time control; players are only paired with
+the same control) keep their clocks here. A move is charged from the moment
+the previous move was received to the moment this one is, minus the mover's
+smoothed round-trip time (measured with PING/PONG, capped at
+MAX_LAG_COMPENSATION). Both players and the spectators get a CLOCK snapshot
+after every move, and a timer per turn flags the side whose time runs out.
+
+Usage:
+    python chess_server.py [--host 0.0.0.0] [--port 5001]
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import secrets
+import socket
+import sys
+import time
+
+from chess import ChessBoard, encode_move, decode_move
+from chess_protocol import (
+    HEADER, MAX_PAYLOAD, PROTOCOL_VERSION,
+    MSG_HELLO, MSG_MOVE, MSG_ACK, MSG_CHAT, MSG_ERROR, MSG_GAMEOVER, MSG_STATS, MSG_WATCH, MSG_PONG,
+    pack_color, pack_move, pack_ack, pack_text, pack_resync, pack_ping, pack_clock,
+    unpack_u16, unpack_u32, unpack_u64, unpack_text, unpack_hello,
+)
+
+MAX_CHAT = 500                  # characters relayed per chat message
+WRITE_BUFFER_LIMIT = 64 * 1024  # pending outgoing bytes before a client counts as stuck
+RECONNECT_GRACE = 30            # seconds a disconnected player's game is kept open
+SPECTATOR_QUEUE_LIMIT = 4096    # unsent bytes before a spectator is paused for a resync
+SPECTATOR_SNDBUF = 8192         # small kernel send buffer so backlog shows up in our queue
+SPECTATOR_CATCHUP_TIMEOUT = 10  # seconds a paused spectator has to drain before it is dropped
+PING_INTERVAL = 2               # seconds between round-trip probes in timed games
+MAX_LAG_COMPENSATION = 0.5      # most network time refunded per move, in seconds
+MAX_TIME_CONTROL = 3 * 3600     # longest accepted time control, in seconds
+
+
+def memory_kb():
+    """Resident memory of this process in KiB (peak RSS where /proc is unavailable)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') // 1024
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    except ImportError:
+        return None
+    return peak // 1024 if sys.platform == 'darwin' else peak  # bytes on macOS, KiB elsewhere
+
+
+class Player:
+    """One client session; survives reconnects until its game ends."""
+
+    __slots__ = ('id', 'token', 'writer', 'game', 'color', 'send_seq', 'forfeit_timer',
+                 'time_control', 'rtt')
+
+    def __init__(self, player_id, writer, time_control=0):
+        self.id = player_id
+        self.token = secrets.randbits(64) or 1
+        self.writer = writer
+        self.game = None
+        self.color = None
+        self.send_seq = 0
+        self.forfeit_timer = None
+        self.time_control = time_control
+        self.rtt = None
+
+    def lag_compensation(self):
+        """Network time refunded on each move: the smoothed round trip, capped."""
+        return min(self.rtt or 0.0, MAX_LAG_COMPENSATION)
+
+    def next_seq(self):
+        self.send_seq += 1
+        return self.send_seq
+
+
+class Spectator:
+    """A read-only connection following one game."""
+
+    __slots__ = ('writer', 'game', 'paused')
+
+    def __init__(self, writer, game):
+        self.writer = writer
+        self.game = game
+        self.paused = False
+
+
+class Game:
+    """A game between two players with the authoritative board."""
+
+    __slots__ = ('id', 'board', 'players', 'started', 'spectators',
+                 'time_control', 'clocks', 'turn_started', 'flag_timer')
+
+    def __init__(self, game_id, white, black, time_control=0):
+        self.id = game_id
+        self.board = ChessBoard()
+        self.players = {'white': white, 'black': black}
+        self.started = time.monotonic()
+        self.spectators = set()
+        self.time_control = time_control
+        self.clocks = {'white': float(time_control), 'black': float(time_control)}
+        self.turn_started = self.started
+        self.flag_timer = None
+
+    def opponent(self, player):
+        return self.players['black' if player.color == 'white' else 'white']
+
+    def clock_snapshot(self, now):
+        """(white_ms, black_ms, running) with the running turn charged up to now."""
+        turn = self.board.current_turn
+        clocks = dict(self.clocks)
+        clocks[turn] = max(0.0, clocks[turn] - (now - self.turn_started))
+        return int(clocks['white'] * 1000), int(clocks['black'] * 1000), 1 if turn == 'white' else 2
+
+
+class ChessServer:
+    """Pairs clients into games and relays validated moves and chat."""
+
+    def __init__(self, host='0.0.0.0', port=5001):
+        self.host = host
+        self.port = port
+        self.server = None
+        self.waiting = {}
+        self.games = {}
+        self.sessions = {}
+        self._player_ids = itertools.count(1)
+        self._game_ids = itertools.count(1)
+        self._ping_task = None
+        self.started = time.monotonic()
+        self.counters = {
+            'connections_total': 0,
+            'connections_active': 0,
+            'games_total': 0,
+            'games_finished': 0,
+            'moves_relayed': 0,
+            'moves_rejected': 0,
+            'chats_relayed': 0,
+            'slow_disconnects': 0,
+            'reconnects': 0,
+            'protocol_errors': 0,
+            'spectators_total': 0,
+            'spectator_frames': 0,
+            'spectator_resyncs': 0,
+            'spectators_dropped': 0,
+            'time_forfeits': 0,
+            'late_moves': 0,
+        }
+        self.fanout_seconds = 0.0
+        self.lag_refunded = 0.0
+
+    async def start(self):
+        """Start listening."""
+        self.server = await asyncio.start_server(self.handle_client, self.host, self.port)
+        self._ping_task = asyncio.create_task(self._ping_players())
+        print(f"[SERVER] Listening on {self.host}:{self.port}")
+
+    async def _ping_players(self):
+        """Probe the round trip of everyone in a timed game."""
+        while True:
+            await asyncio.sleep(PING_INTERVAL)
+            for game in list(self.games.values()):
+                if game.time_control:
+                    for player in game.players.values():
+                        self.ping(player)
+
+    def ping(self, player):
+        self.send(player, pack_ping(player.next_seq(), int(time.monotonic() * 1e6)))
+
+    async def serve_forever(self, stats_interval=0):
+        """Run until cancelled, optionally printing counters periodically."""
+        await self.start()
+        async with self.server:
+            if stats_interval:
+                asyncio.create_task(self._log_stats(stats_interval))
+            await self.server.serve_forever()
+
+    async def _log_stats(self, interval):
+        while True:
+            await asyncio.sleep(interval)
+            print(f"[SERVER] {json.dumps(self.stats())}")
+
+    def stats(self):
+        """Connection and game counters."""
+        stats = dict(self.counters)
+        stats['games_active'] = len(self.games)
+        stats['waiting'] = len(self.waiting)
+        stats['lag_refunded_ms_per_move'] = round(self.lag_refunded * 1000 / max(1, self.counters['moves_relayed']), 3)
+        stats['spectators_active'] = sum(len(g.spectators) for g in self.games.values())
+        stats['fanout_us_per_frame'] = round(self.fanout_seconds * 1e6 / max(1, self.counters['spectator_frames']), 3)
+        stats['uptime'] = round(time.monotonic() - self.started, 1)
+        stats['memory_kb'] = memory_kb()
+        return stats
+
+    async def handle_client(self, reader, writer):
+        """Serve one connection until it closes."""
+        self.counters['connections_total'] += 1
+        self.counters['connections_active'] += 1
+        writer.transport.set_write_buffer_limits(high=WRITE_BUFFER_LIMIT)
+        player = None
+        spectator = None
+
+        try:
+            while not writer.is_closing():
+                version, msg_type, length, seq = HEADER.unpack(await reader.readexactly(HEADER.size))
+                if version != PROTOCOL_VERSION or length > MAX_PAYLOAD:
+                    self.counters['protocol_errors'] += 1
+                    break
+                payload = await reader.readexactly(length) if length else b''
+                received = time.monotonic()
+
+                if player is None:
+                    if msg_type == MSG_STATS:
+                        # Monitoring connections may poll counters without joining a game
+                        writer.write(pack_text(MSG_STATS, seq, json.dumps(self.stats())))
+                        continue
+                    if spectator is not None:
+                        continue
+                    if msg_type == MSG_WATCH and length >= 4:
+                        spectator = self.watch(writer, unpack_u32(payload))
+                        continue
+                    if msg_type != MSG_HELLO or length < 8:
+                        self.counters['protocol_errors'] += 1
+                        break
+                    player = self.hello(writer, *unpack_hello(payload))
+                else:
+                    self.handle_message(player, msg_type, seq, payload, received)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.counters['connections_active'] -= 1
+            if player is not None and player.writer is writer:
+                self.disconnect(player)
+            if spectator is not None and spectator.game is not None:
+                spectator.game.spectators.discard(spectator)
+            if not writer.is_closing():
+                writer.close()
+
+    def hello(self, writer, token, time_control=0):
+        """Attach a connection to a new session, or resume a disconnected one."""
+        player = self.sessions.get(token) if token else None
+        if player is not None and player.game is not None:
+            if player.writer is not None and not player.writer.is_closing():
+                player.writer.close()
+            player.writer = writer
+            if player.forfeit_timer:
+                player.forfeit_timer.cancel()
+                player.forfeit_timer = None
+            self.counters['reconnects'] += 1
+            game = player.game
+            self.send(player, pack_color(player.next_seq(), player.color == 'white', player.token))
+            self.send(player, pack_resync(player.next_seq(), len(game.board.move_history), game.board.get_fen(),
+                                          game.board.move_history))
+            if game.time_control:
+                self.ping(player)
+                self.send(player, pack_clock(player.next_seq(), *game.clock_snapshot(time.monotonic())))
+            return player
+
+        time_control = min(time_control, MAX_TIME_CONTROL)
+        player = Player(next(self._player_ids), writer, time_control)
+        self.sessions[player.token] = player
+        self.pair(player)
+        return player
+
+    def watch(self, writer, game_id):
+        """Attach a spectator to a game and send it the current position."""
+        if game_id:
+            game = self.games.get(game_id)
+        else:
+            game = next(iter(self.games.values()), None)
+        if game is None:
+            writer.write(pack_text(MSG_ERROR, 0, "no such game"))
+            writer.close()
+            return None
+
+        sock = writer.get_extra_info('socket')
+        if sock is not None:
+            try:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SPECTATOR_SNDBUF)
+            except OSError:
+                pass
+        writer.transport.set_write_buffer_limits(high=SPECTATOR_QUEUE_LIMIT)
+
+        spectator = Spectator(writer, game)
+        game.spectators.add(spectator)
+        self.counters['spectators_total'] += 1
+        board = game.board
+        writer.write(pack_resync(len(board.move_history), len(board.move_history), board.get_fen()))
+        if game.time_control:
+            writer.write(pack_clock(len(board.move_history), *game.clock_snapshot(time.monotonic())))
+        return spectator
+
+    def broadcast(self, game, frame):
+        """Write one pre-encoded frame to every spectator of a game."""
+        if not game.spectators:
+            return
+        start = time.perf_counter()
+        sent = 0
+        for spectator in game.spectators:
+            if spectator.paused:
+                continue
+            transport = spectator.writer.transport
+            if transport.is_closing():
+                continue
+            if transport.get_write_buffer_size() > SPECTATOR_QUEUE_LIMIT:
+                spectator.paused = True
+                asyncio.create_task(self.catch_up(spectator))
+                continue
+            transport.write(frame)
+            sent += 1
+        self.counters['spectator_frames'] += sent
+        self.fanout_seconds += time.perf_counter() - start
+
+    async def catch_up(self, spectator):
+        """Wait for a paused spectator to drain, then resend the position."""
+        writer = spectator.writer
+        try:
+            await asyncio.wait_for(writer.drain(), SPECTATOR_CATCHUP_TIMEOUT)
+        except (asyncio.TimeoutError, ConnectionError):
+            self.counters['spectators_dropped'] += 1
+            if spectator.game is not None:
+                spectator.game.spectators.discard(spectator)
+            writer.transport.abort()  # close() would wait for the backlog to flush
+            return
+        game = spectator.game
+        if game is None or writer.is_closing():
+            return
+        board = game.board
+        spectator.paused = False
+        self.counters['spectator_resyncs'] += 1
+        writer.write(pack_resync(len(board.move_history), len(board.move_history), board.get_fen()))
+
+    def handle_message(self, player, msg_type, seq, payload, received):
+        """Dispatch one frame from a client."""
+        if msg_type == MSG_MOVE and len(payload) >= 2:
+            self.handle_move(player, seq, unpack_u16(payload), received)
+        elif msg_type == MSG_PONG and len(payload) >= 8:
+            self.handle_pong(player, unpack_u64(payload), received)
+        elif msg_type == MSG_CHAT:
+            self.handle_chat(player, unpack_text(payload))
+        elif msg_type == MSG_STATS:
+            self.send(player, pack_text(MSG_STATS, player.next_seq(), json.dumps(self.stats())))
+        elif msg_type != MSG_ACK:
+            self.counters['protocol_errors'] += 1
+
+    def send(self, player, frame):
+        """Queue a frame for a client; drop clients that stop reading."""
+        writer = player.writer
+        if writer is None or writer.is_closing():
+            return
+        if writer.transport.get_write_buffer_size() > WRITE_BUFFER_LIMIT:
+            self.counters['slow_disconnects'] += 1
+            writer.close()
+            return
+        writer.write(frame)
+
+    def pair(self, player):
+        """Match a new player with one waiting for the same time control, or make them wait."""
+        waiting = self.waiting.get(player.time_control)
+        if waiting is None or waiting.writer is None:
+            self.waiting[player.time_control] = player
+            return
+
+        white = self.waiting.pop(player.time_control)
+        game = Game(next(self._game_ids), white, player, player.time_control)
+        self.games[game.id] = game
+        self.counters['games_total'] += 1
+        for color, p in game.players.items():
+            p.game = game
+            p.color = color
+            self.send(p, pack_color(p.next_seq(), color == 'white', p.token))
+        if game.time_control:
+            for p in game.players.values():
+                self.ping(p)
+            self.send_clocks(game, game.started)
+            self.arm_flag_timer(game)
+
+    def handle_pong(self, player, timestamp, received):
+        """Fold one round-trip sample into the player's smoothed RTT."""
+        sample = received - timestamp / 1e6
+        if sample < 0:
+            return
+        player.rtt = sample if player.rtt is None else 0.875 * player.rtt + 0.125 * sample
+
+    def handle_move(self, player, seq, move, received):
+        """Validate a move on the game board, charge the clock, acknowledge it and relay it."""
+        game = player.game
+        if game is None:
+            self.send(player, pack_text(MSG_ERROR, player.next_seq(), "no active game"))
+            return
+
+        board = game.board
+        if board.current_turn != player.color:
+            self.reject(player, game, "not your turn")
+            return
+
+        if game.time_control:
+            elapsed = received - game.turn_started
+            refund = min(player.lag_compensation(), elapsed)
+            used = elapsed - refund
+            if used >= game.clocks[player.color]:
+                self.counters['late_moves'] += 1
+                self.flag(game, player.color)
+                return
+
+        from_r, from_c, to_r, to_c, promotion = decode_move(move, player.color == 'white')
+        if not board.make_move(from_r, from_c, to_r, to_c, promotion):
+            self.reject(player, game, "illegal move")
+            return
+
+        self.counters['moves_relayed'] += 1
+        self.send(player, pack_ack(player.next_seq(), seq))
+        opponent = game.opponent(player)
+        move = encode_move(from_r, from_c, to_r, to_c, promotion)
+        self.send(opponent, pack_move(opponent.next_seq(), move))
+        self.broadcast(game, pack_move(len(board.move_history), move))
+
+        if game.time_control:
+            game.clocks[player.color] -= used
+            game.turn_started = received
+            self.lag_refunded += refund
+            self.send_clocks(game, received)
+            self.arm_flag_timer(game)
+
+        if board.is_checkmate():
+            self.end_game(game, '1-0' if player.color == 'white' else '0-1', "checkmate")
+        elif board.is_stalemate():
+            self.end_game(game, '1/2-1/2', "stalemate")
+        elif board.halfmove_clock >= 100:
+            self.end_game(game, '1/2-1/2', "50-move rule")
+
+    def send_clocks(self, game, now):
+        """Send a clock snapshot to both players and the spectators."""
+        snapshot = game.clock_snapshot(now)
+        for p in game.players.values():
+            self.send(p, pack_clock(p.next_seq(), *snapshot))
+        self.broadcast(game, pack_clock(len(game.board.move_history), *snapshot))
+
+    def arm_flag_timer(self, game):
+        """Schedule the time forfeit of the side to move, allowing for its lag refund."""
+        if game.flag_timer:
+            game.flag_timer.cancel()
+        color = game.board.current_turn
+        delay = game.clocks[color] + game.players[color].lag_compensation()
+        game.flag_timer = asyncio.get_running_loop().call_later(delay, self.check_flag, game, color)
+
+    def check_flag(self, game, color):
+        """Flag timer fired: end the game if that side is still on move and out of time."""
+        game.flag_timer = None
+        if game.id not in self.games or game.board.current_turn != color:
+            return
+        overdue = time.monotonic() - game.turn_started - game.players[color].lag_compensation()
+        if overdue < game.clocks[color]:
+            self.arm_flag_timer(game)  # the lag estimate grew since the timer was set
+            return
+        self.flag(game, color)
+
+    def flag(self, game, color):
+        """The side to move ran out of time."""
+        self.counters['time_forfeits'] += 1
+        game.clocks[color] = 0.0
+        self.end_game(game, '0-1' if color == 'white' else '1-0', "time forfeit")
+
+    def reject(self, player, game, reason):
+        """Refuse a move and resend the authoritative position."""
+        self.counters['moves_rejected'] += 1
+        self.send(player, pack_text(MSG_ERROR, player.next_seq(), reason))
+        self.send(player, pack_resync(player.next_seq(), len(game.board.move_history), game.board.get_fen(),
+                                      game.board.move_history))
+
+    def handle_chat(self, player, text):
+        """Relay a chat message to the opponent."""
+        if player.game is None:
+            return
+        self.counters['chats_relayed'] += 1
+        opponent = player.game.opponent(player)
+        self.send(opponent, pack_text(MSG_CHAT, opponent.next_seq(), text[:MAX_CHAT]))
+
+    def end_game(self, game, result, reason):
+        """Announce the result and release both players and the spectators."""
+        if game.flag_timer:
+            game.flag_timer.cancel()
+            game.flag_timer = None
+        self.broadcast(game, pack_text(MSG_GAMEOVER, len(game.board.move_history), f"{result} {reason}"))
+        for spectator in game.spectators:
+            spectator.game = None
+            spectator.writer.close()
+        game.spectators.clear()
+        for p in game.players.values():
+            self.send(p, pack_text(MSG_GAMEOVER, p.next_seq(), f"{result} {reason}"))
+            p.game = None
+            if p.forfeit_timer:
+                p.forfeit_timer.cancel()
+                p.forfeit_timer = None
+            if p.writer is None:
+                self.sessions.pop(p.token, None)
+        self.games.pop(game.id, None)
+        self.counters['games_finished'] += 1
+
+    def disconnect(self, player):
+        """Connection lost: keep a running game open for RECONNECT_GRACE seconds."""
+        player.writer = None
+        if self.waiting.get(player.time_control) is player:
+            del self.waiting[player.time_control]
+        if player.game is None:
+            self.sessions.pop(player.token, None)
+            return
+        loop = asyncio.get_running_loop()
+        player.forfeit_timer = loop.call_later(RECONNECT_GRACE, self.forfeit, player)
+
+    def forfeit(self, player):
+        """A disconnected player did not come back in time."""
+        player.forfeit_timer = None
+        if player.game is not None and player.writer is None:
+            self.end_game(player.game, '0-1' if player.color == 'white' else '1-0', "opponent disconnected")
+        self.sessions.pop(player.token, None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Online chess game server.")
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5001)
+    parser.add_argument('--stats-interval', type=float, default=0,
+                        help="print counters every N seconds (0 = off)")
+    args = parser.parse_args()
+
+    server = ChessServer(args.host, args.port)
+    try:
+        asyncio.run(server.serve_forever(args.stats_interval))
+    except KeyboardInterrupt:
+        print(f"[SERVER] Stopped. {json.dumps(server.stats())}")
+
+
+if __name__ == "__main__":
+    main()
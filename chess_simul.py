@@ -0,0 +1,407 @@
+"""
+Simultaneous exhibition: one human against many bot boards.
+
+Every board shares one fixed pool of engine processes, so the number of
+Stockfish processes stays at --engines however many boards are open. Bot
+move requests wait in a priority queue ordered by how long each board has
+been waiting, so the board whose player moved first is answered first.
+When the oldest request has waited longer than PREEMPT_AFTER, the search
+that has run longest is cut short with the UCI 'stop' command (the engine
+answers at once with its best move so far). Starting a new game on a board,
+or leaving the simul, cancels the board's request, including a search
+already running; a reply that was already on its way is ignored.
+
+Usage:
+    python chess_simul.py [--boards 6] [--engines 2] [--difficulty medium]
+    python chess_simul.py --headless --boards 24 --engines 2 [--moves 20] [--path ./stockfish]
+"""
+
+import argparse
+import heapq
+import math
+import queue
+import random
+import threading
+import time
+import tkinter as tk
+from tkinter import messagebox, Frame, Label, Button
+
+from chess import ChessBoard, StockfishEngine, PIECES
+
+DEFAULT_BOARDS = 6
+DEFAULT_ENGINES = 2
+PREEMPT_AFTER = 1.5         # s the oldest request may wait before the longest search is stopped
+MIN_SEARCH = 0.2            # s a search runs before it may be preempted
+MOVETIMES = {'easy': 500, 'medium': 1000, 'hard': 2000}  # ms per bot move, as in ChessGame
+STATUS_REFRESH_MS = 500
+
+
+class EnginePool:
+    """A fixed set of engine processes shared by any number of boards."""
+
+    def __init__(self, size=DEFAULT_ENGINES, difficulty='medium', path=None,
+                 preempt_after=PREEMPT_AFTER, engine_factory=None):
+        self.size = max(1, size)
+        self.preempt_after = preempt_after
+        self.engine_factory = engine_factory or (lambda: StockfishEngine(difficulty, path))
+        self.engines = []
+        self.queue = []         # heap of (enqueued_at, seq, board_id, fen, movetime, callback)
+        self.searches = {}      # worker index -> running search
+        self.cond = threading.Condition()
+        self.seq = 0
+        self.closed = False
+        self.stats = {'requests': 0, 'moves': 0, 'cancelled': 0, 'preempted': 0,
+                      'wait_total': 0.0, 'wait_max': 0.0}
+
+    def start(self):
+        """Start the engines and their worker threads; False if no engine could be started."""
+        self.engines = [self.engine_factory() for _ in range(self.size)]
+        if not all(engine.process for engine in self.engines):
+            self.close()
+            return False
+        for index in range(self.size):
+            threading.Thread(target=self._worker, args=(index,), daemon=True).start()
+        threading.Thread(target=self._monitor, daemon=True).start()
+        return True
+
+    def request(self, board_id, fen, movetime, callback):
+        """Queue a search; callback(board_id, uci_move) is called from a worker thread."""
+        self.cancel(board_id)
+        with self.cond:
+            self.seq += 1
+            heapq.heappush(self.queue, (time.perf_counter(), self.seq, board_id, fen, movetime, callback))
+            self.stats['requests'] += 1
+            self.cond.notify_all()
+
+    def cancel(self, board_id):
+        """Drop the board's queued request and stop its running search; no callback follows."""
+        with self.cond:
+            kept = [item for item in self.queue if item[2] != board_id]
+            if len(kept) != len(self.queue):
+                self.stats['cancelled'] += len(self.queue) - len(kept)
+                self.queue = kept
+                heapq.heapify(self.queue)
+            # Stop under the lock: the worker cannot start its next search until it
+            # takes the lock again, so the stop reaches this search or an idle engine
+            for index, search in self.searches.items():
+                if search['board'] == board_id and not search['cancelled']:
+                    search['cancelled'] = True
+                    self.engines[index].stop()
+
+    def snapshot(self):
+        """Queue and engine state for status displays."""
+        with self.cond:
+            now = time.perf_counter()
+            return dict(self.stats, engines=len(self.engines), busy=len(self.searches), queued=len(self.queue),
+                        oldest_wait=now - self.queue[0][0] if self.queue else 0.0)
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.queue.clear()
+            self.cond.notify_all()
+        for engine in self.engines:
+            engine.stop()
+            engine.close()
+
+    def _worker(self, index):
+        engine = self.engines[index]
+        while True:
+            with self.cond:
+                while not self.queue and not self.closed:
+                    self.cond.wait()
+                if self.closed:
+                    return
+                enqueued, _, board_id, fen, movetime, callback = heapq.heappop(self.queue)
+                now = time.perf_counter()
+                self.stats['wait_total'] += now - enqueued
+                self.stats['wait_max'] = max(self.stats['wait_max'], now - enqueued)
+                search = self.searches[index] = {'board': board_id, 'started': now,
+                                                 'stopped': False, 'cancelled': False}
+
+            move = engine.get_best_move(fen, movetime)
+
+            with self.cond:
+                del self.searches[index]
+                if search['cancelled'] or self.closed:
+                    self.stats['cancelled'] += 1
+                    continue
+                self.stats['moves'] += 1
+            callback(board_id, move)
+
+    def _monitor(self):
+        """Preempt the longest-running search while a request has waited too long."""
+        while True:
+            with self.cond:
+                self.cond.wait(0.05)
+                if self.closed:
+                    return
+                now = time.perf_counter()
+                if self.queue and now - self.queue[0][0] > self.preempt_after:
+                    running = [(search['started'], index) for index, search in self.searches.items()
+                               if not search['stopped'] and now - search['started'] >= MIN_SEARCH]
+                    if running:
+                        index = min(running)[1]
+                        self.searches[index]['stopped'] = True
+                        self.stats['preempted'] += 1
+                        # Still holding the lock, so this cannot hit the worker's next search
+                        self.engines[index].stop()
+
+
+def random_move(board, rng):
+    moves = [(r, c, tr, tc) for r in range(8) for c in range(8) for tr, tc in board.get_valid_moves_for_piece(r, c)]
+    return rng.choice(moves) if moves else None
+
+
+def game_over_text(board):
+    """Result text if the game on this board has ended, else None."""
+    if board.is_checkmate():
+        return "You win!" if board.current_turn == 'black' else "Bot wins"
+    if board.is_stalemate() or board.halfmove_clock >= 100 or board.is_insufficient_material():
+        return "Draw"
+    return None
+
+
+class SimulGame:
+    """One window with a small board per bot; the human plays white on all of them."""
+
+    def __init__(self, parent, boards=DEFAULT_BOARDS, engines=DEFAULT_ENGINES, difficulty='medium', on_exit=None):
+        self.parent = parent
+        self.on_exit = on_exit
+        self.movetime = MOVETIMES.get(difficulty, 1000)
+        self.status_job = None
+
+        self.pool = EnginePool(engines, difficulty)
+        if not self.pool.start():
+            messagebox.showwarning("Stockfish Not Found",
+                                   "Stockfish engine not found. Please place stockfish.exe in the same folder.")
+            self.exit()
+            return
+
+        self.frame = Frame(parent, bg='#2c3e50')
+        self.frame.pack(fill='both', expand=True)
+        header = Frame(self.frame, bg='#2c3e50')
+        header.pack(fill='x', pady=5)
+        Label(header, text=f"Simul vs {boards} bots ({difficulty})", font=("Arial", 16, "bold"),
+              bg='#2c3e50', fg='white').pack(side='left', padx=10)
+        Button(header, text="Main Menu", font=("Arial", 12), bg='#95a5a6', fg='white',
+               command=self.confirm_exit).pack(side='right', padx=5)
+        self.status_label = Label(header, font=("Arial", 10), bg='#2c3e50', fg='#ecf0f1')
+        self.status_label.pack(side='right', padx=10)
+
+        columns = 3 if boards <= 6 else 4
+        rows = math.ceil(boards / columns)
+        self.square = max(16, min(40, (1080 // columns - 12) // 8, (820 // rows - 40) // 8))
+        grid = Frame(self.frame, bg='#2c3e50')
+        grid.pack()
+        self.boards = []
+        for board_id in range(boards):
+            cell = Frame(grid, bg='#2c3e50', padx=4, pady=4)
+            cell.grid(row=board_id // columns, column=board_id % columns)
+            canvas = tk.Canvas(cell, width=8 * self.square, height=8 * self.square, highlightthickness=3)
+            canvas.pack()
+            footer = Frame(cell, bg='#2c3e50')
+            footer.pack(fill='x')
+            label = Label(footer, font=("Arial", 10), bg='#2c3e50', fg='white')
+            label.pack(side='left')
+            entry = {'id': board_id, 'board': ChessBoard(), 'canvas': canvas, 'label': label, 'game': 0,
+                     'selected': None, 'targets': [], 'waiting': False, 'result': None, 'items': {}}
+            Button(footer, text="New", font=("Arial", 9), bg='#95a5a6', fg='white',
+                   command=lambda e=entry: self.reset_board(e)).pack(side='right')
+            canvas.bind('<Button-1>', lambda event, e=entry: self.on_click(e, event))
+            self.create_items(entry)
+            self.boards.append(entry)
+            self.draw(entry)
+        self.update_status()
+
+    def create_items(self, entry):
+        canvas, size = entry['canvas'], self.square
+        for row in range(8):
+            for col in range(8):
+                square = canvas.create_rectangle(col * size, row * size, (col + 1) * size, (row + 1) * size,
+                                                 outline='')
+                piece = canvas.create_text(col * size + size / 2, row * size + size / 2,
+                                           font=("Arial", int(size * 0.6)))
+                entry['items'][(row, col)] = (square, piece)
+
+    def draw(self, entry):
+        board, canvas = entry['board'], entry['canvas']
+        targets = set(entry['targets'])
+        for (row, col), (square, piece) in entry['items'].items():
+            if (row, col) == entry['selected']:
+                color = '#f7ec5d'
+            elif (row, col) in targets:
+                color = '#7fc97f'
+            else:
+                color = '#f0d9b5' if (row + col) % 2 == 0 else '#b58863'
+            canvas.itemconfigure(square, fill=color)
+            symbol = board.board[row][col]
+            canvas.itemconfigure(piece, text=PIECES.get(symbol, ''))
+
+        if entry['result']:
+            entry['label'].config(text=entry['result'])
+            canvas.config(highlightbackground='#7f8c8d')
+        elif entry['waiting']:
+            entry['label'].config(text="Bot thinking...")
+            canvas.config(highlightbackground='#2c3e50')
+        else:
+            entry['label'].config(text="Your move")
+            canvas.config(highlightbackground='#27ae60')
+
+    def on_click(self, entry, event):
+        if entry['waiting'] or entry['result']:
+            return
+        board = entry['board']
+        row, col = event.y // self.square, event.x // self.square
+        if not (0 <= row < 8 and 0 <= col < 8):
+            return
+
+        if entry['selected'] and (row, col) in entry['targets']:
+            from_row, from_col = entry['selected']
+            promotion = 'Q' if board.board[from_row][from_col] == 'P' and row == 0 else None
+            board.make_move(from_row, from_col, row, col, promotion)
+            entry['selected'], entry['targets'] = None, []
+            entry['result'] = game_over_text(board)
+            if not entry['result']:
+                entry['waiting'] = True
+                self.pool.request(entry['id'], board.get_fen(), self.movetime,
+                                  lambda board_id, uci, game=entry['game']: self.on_engine_move(board_id, uci, game))
+        elif board.is_white_piece(board.board[row][col]):
+            entry['selected'] = (row, col)
+            entry['targets'] = board.get_valid_moves_for_piece(row, col)
+        else:
+            entry['selected'], entry['targets'] = None, []
+        self.draw(entry)
+
+    def reset_board(self, entry):
+        """Start a new game on one board, cancelling its bot move if one is pending."""
+        self.pool.cancel(entry['id'])
+        entry['game'] += 1
+        entry.update(board=ChessBoard(), selected=None, targets=[], waiting=False, result=None)
+        self.draw(entry)
+
+    def on_engine_move(self, board_id, uci, game):
+        """Worker thread: hand the bot's move to the Tk thread."""
+        self.parent.after(0, self.apply_engine_move, board_id, uci, game)
+
+    def apply_engine_move(self, board_id, uci, game):
+        entry = self.boards[board_id]
+        if not entry['waiting'] or game != entry['game']:
+            return  # the board was reset since this move was requested
+        entry['waiting'] = False
+        board = entry['board']
+        move = board.parse_uci(uci) if uci else None
+        if move is None or not board.make_move(*move):
+            entry['result'] = "Bot resigned"
+        else:
+            entry['result'] = game_over_text(board)
+        self.draw(entry)
+
+    def update_status(self):
+        """Refresh the shared-engine summary in the header."""
+        self.status_job = None
+        try:
+            s = self.pool.snapshot()
+            served = s['moves'] or 1
+            open_boards = sum(1 for entry in self.boards if not entry['result'])
+            self.status_label.config(
+                text=f"{open_boards} games on | engines {s['busy']}/{s['engines']} busy, {s['queued']} queued "
+                     f"(oldest {s['oldest_wait']:.1f}s) | avg wait {s['wait_total'] / served:.2f}s, "
+                     f"max {s['wait_max']:.1f}s | preempted {s['preempted']}")
+        except tk.TclError:
+            return
+        self.status_job = self.parent.after(STATUS_REFRESH_MS, self.update_status)
+
+    def confirm_exit(self):
+        if messagebox.askyesno("Exit Simul", "Return to main menu?"):
+            self.exit()
+
+    def exit(self):
+        if self.status_job:
+            self.parent.after_cancel(self.status_job)
+            self.status_job = None
+        self.pool.close()
+        for widget in self.parent.winfo_children():
+            widget.destroy()
+        if self.on_exit:
+            self.on_exit()
+
+
+def run_headless(boards, engines, difficulty, path, moves, think, seed=1):
+    """Play random human moves on every board against the shared pool and report scheduling stats."""
+    rng = random.Random(seed)
+    pool = EnginePool(engines, difficulty, path)
+    if not pool.start():
+        raise SystemExit("[SIMUL] No engine found")
+
+    replies = queue.Queue()
+    games = [{'board': ChessBoard(), 'waiting': False, 'done': False, 'due': time.perf_counter() + rng.random() * think}
+             for _ in range(boards)]
+    waits = []
+    start = time.perf_counter()
+    try:
+        while not all(game['done'] for game in games):
+            now = time.perf_counter()
+            for board_id, game in enumerate(games):
+                if game['done'] or game['waiting'] or now < game['due']:
+                    continue
+                board = game['board']
+                move = random_move(board, rng)
+                if move is None or len(board.move_history) >= 2 * moves:
+                    game['done'] = True
+                    continue
+                board.make_move(*move, 'Q' if board.board[move[0]][move[1]] == 'P' and move[2] == 0 else None)
+                if game_over_text(board):
+                    game['done'] = True
+                    continue
+                game['waiting'] = now
+                pool.request(board_id, board.get_fen(), MOVETIMES.get(difficulty, 1000),
+                             lambda bid, uci: replies.put((bid, uci, time.perf_counter())))
+            try:
+                board_id, uci, answered = replies.get(timeout=0.01)
+            except queue.Empty:
+                continue
+            game = games[board_id]
+            waits.append(answered - game['waiting'])
+            game['waiting'] = False
+            game['due'] = answered + rng.random() * think
+            move = game['board'].parse_uci(uci) if uci else None
+            if move is None or not game['board'].make_move(*move) or game_over_text(game['board']):
+                game['done'] = True
+    finally:
+        stats = pool.snapshot()
+        pool.close()
+
+    elapsed = time.perf_counter() - start
+    waits.sort()
+    print(f"[SIMUL] {boards} boards, {stats['engines']} engine processes, {stats['moves']} bot moves in {elapsed:.1f}s")
+    if waits:
+        print(f"[SIMUL] reply time avg {sum(waits) / len(waits):.2f}s, p95 {waits[int(len(waits) * 0.95)]:.2f}s, "
+              f"max {waits[-1]:.2f}s; queue wait avg {stats['wait_total'] / max(1, stats['moves']):.2f}s, "
+              f"max {stats['wait_max']:.2f}s; {stats['preempted']} searches preempted")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simul: one player against many bots sharing a few engines.")
+    parser.add_argument('--boards', type=int, default=DEFAULT_BOARDS)
+    parser.add_argument('--engines', type=int, default=DEFAULT_ENGINES)
+    parser.add_argument('--difficulty', choices=sorted(MOVETIMES), default='medium')
+    parser.add_argument('--headless', action='store_true', help="simulate the human and print scheduling stats")
+    parser.add_argument('--path', help="Stockfish binary (headless)")
+    parser.add_argument('--moves', type=int, default=20, help="moves per board (headless)")
+    parser.add_argument('--think', type=float, default=2.0, help="max seconds the simulated human thinks")
+    args = parser.parse_args()
+
+    if args.headless:
+        run_headless(args.boards, args.engines, args.difficulty, args.path, args.moves, args.think)
+        return
+
+    root = tk.Tk()
+    root.title("Chess Simul")
+    root.geometry("1100x900")
+    SimulGame(root, args.boards, args.engines, args.difficulty, on_exit=root.destroy)
+    root.mainloop()
+
+
+if __name__ == "__main__":
+    main()
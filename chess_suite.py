@@ -0,0 +1,194 @@
+"""
+EPD test-suite runner for engine strength and speed.
+
+Every position of an EPD suite with bm (best move) or am (avoid move)
+operations, such as WAC or Bratko-Kopec, is searched by one or more engines
+under a fixed time or node limit, several searches at a time in a process
+pool. A position is solved when the engine's final move is one of the bm
+moves and none of the am moves. Time-to-solve is the point where the
+principal variation switched to a solving move for the last time. Engines
+use the chess_tournament spec format (name, type, path and UCI options);
+the first engine is the baseline the others are compared against.
+
+Usage:
+    python chess_suite.py wac.epd --engine "name=new,path=./stockfish,Threads=1" \
+        [--engine "name=base,path=./stockfish-old"] [--movetime 1000 | --nodes 1000000] \
+        [--concurrency 4] [--json suite.json]
+"""
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from chess import ChessBoard, read_epd
+from chess_tournament import parse_engine_spec, get_engine, init_worker
+
+DEFAULT_MOVETIME = 1000     # ms per position
+SEARCH_TIMEOUT = 300        # s to wait for 'bestmove' under a node limit
+
+
+def load_suite(path):
+    """Positions with bm/am operations as dicts of id, fen, bm and am (SAN without +/#/!/?)."""
+    positions = []
+    for number, (board, ops) in enumerate(read_epd(path), 1):
+        bm = [strip_san(san) for san in ops.get('bm', [])]
+        am = [strip_san(san) for san in ops.get('am', [])]
+        if not bm and not am:
+            continue
+        ident = (ops.get('id') or [f"#{number}"])[0]
+        positions.append({'id': ident, 'fen': board.get_fen(), 'bm': bm, 'am': am})
+    return positions
+
+
+def strip_san(san):
+    return san.rstrip('+#!?')
+
+
+def uci_to_san(board, uci):
+    """SAN for a UCI move in this position, or None if the move is not legal."""
+    move = board.parse_uci(uci) if uci else None
+    if move is None or not board.is_valid_move(*move[:4]):
+        return None
+    return board.get_san(*move)
+
+
+def is_solution(san, bm, am):
+    return san is not None and (not bm or san in bm) and san not in am
+
+
+def solve_position(task):
+    """Search one suite position in a worker process and return its record."""
+    engine = get_engine(task['engine'])
+    board = ChessBoard(task['fen'])
+    # Workers reuse engines across positions; start each search from an empty hash
+    if not engine.new_game():
+        raise RuntimeError(f"Engine {task['engine']['name']} did not answer isready")
+    movetime, nodes = task['movetime'], task['nodes']
+
+    start = time.perf_counter()
+    if hasattr(engine, 'analyze'):
+        timeout = SEARCH_TIMEOUT if nodes else movetime / 1000 + 30
+        result = engine.analyze(task['fen'], movetime=movetime, nodes=nodes, timeout=timeout)
+    else:
+        result = {'best': engine.get_best_move(task['fen'], movetime or 0), 'nodes': 0, 'time': 0, 'trace': []}
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    best = uci_to_san(board, result['best'])
+    solved = is_solution(best, task['bm'], task['am'])
+    search_ms = result['time'] or elapsed_ms
+
+    # The solution counts from the last switch of the PV to a solving move
+    solve_ms = solve_nodes = None
+    if solved:
+        solve_ms, solve_nodes = search_ms, result['nodes']
+        sans = {}
+        for time_ms, searched, uci in reversed(result['trace']):
+            if uci not in sans:
+                sans[uci] = uci_to_san(board, uci)
+            if not is_solution(sans[uci], task['bm'], task['am']):
+                break
+            solve_ms, solve_nodes = time_ms, searched
+
+    return {
+        'engine': task['engine']['name'], 'id': task['id'], 'bm': task['bm'], 'am': task['am'],
+        'best': best, 'solved': solved, 'solve_ms': solve_ms, 'solve_nodes': solve_nodes,
+        'time_ms': search_ms, 'nodes': result['nodes'],
+    }
+
+
+def run_suite(engines, positions, movetime=None, nodes=None, concurrency=2, progress=None):
+    """Search every position with every engine and return a summary dict per engine plus all records."""
+    if not movetime and not nodes:
+        movetime = DEFAULT_MOVETIME
+    # Interleave the engines so they all progress at the same pace
+    tasks = [dict(position, engine=engine, movetime=movetime, nodes=nodes)
+             for position in positions for engine in engines]
+
+    records = []
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=concurrency, initializer=init_worker) as pool:
+        for future in as_completed([pool.submit(solve_position, task) for task in tasks]):
+            records.append(future.result())
+            if progress:
+                progress(records[-1], len(records), len(tasks), time.perf_counter() - start)
+
+    order = {position['id']: i for i, position in enumerate(positions)}
+    engine_order = {engine['name']: i for i, engine in enumerate(engines)}
+    records.sort(key=lambda r: (order[r['id']], engine_order[r['engine']]))
+    summaries = {}
+    for engine in engines:
+        mine = [r for r in records if r['engine'] == engine['name']]
+        solved = [r for r in mine if r['solved']]
+        search_ms = sum(r['time_ms'] for r in mine)
+        summaries[engine['name']] = {
+            'positions': len(mine),
+            'solved': len(solved),
+            'avg_solve_ms': sum(r['solve_ms'] for r in solved) / len(solved) if solved else None,
+            'nps': sum(r['nodes'] for r in mine) / (search_ms / 1000) if search_ms else 0.0,
+            'search_seconds': search_ms / 1000,
+            'unsolved': [r['id'] for r in mine if not r['solved']],
+        }
+    return {
+        'limit': {'movetime': movetime, 'nodes': nodes},
+        'seconds': time.perf_counter() - start,
+        'engines': summaries,
+        'records': records,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run an EPD test suite (bm/am) against one or more engines.")
+    parser.add_argument('suite')
+    parser.add_argument('--engine', action='append', required=True,
+                        help="engine spec, e.g. 'name=new,path=./stockfish,Hash=64' (repeat to compare)")
+    limit = parser.add_mutually_exclusive_group()
+    limit.add_argument('--movetime', type=int, help=f"ms per position (default {DEFAULT_MOVETIME})")
+    limit.add_argument('--nodes', type=int, help="node limit per position")
+    parser.add_argument('--concurrency', type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument('--json', help="write the summary and every result as JSON")
+    args = parser.parse_args()
+
+    engines = [parse_engine_spec(spec) for spec in args.engine]
+    names = set()
+    for engine in engines:
+        while engine['name'] in names:
+            engine['name'] += "'"
+        names.add(engine['name'])
+
+    positions = load_suite(args.suite)
+    if not positions:
+        parser.error(f"{args.suite} has no positions with bm or am operations")
+    print(f"[SUITE] {len(positions)} positions x {len(engines)} engines, "
+          f"{f'{args.nodes} nodes' if args.nodes else f'{args.movetime or DEFAULT_MOVETIME} ms'} each")
+
+    def progress(record, done, total, elapsed):
+        if done % 25 == 0 or done == total:
+            print(f"[SUITE] {done}/{total} searches, {elapsed:.0f}s")
+
+    summary = run_suite(engines, positions, args.movetime, args.nodes, args.concurrency, progress)
+
+    for name, s in summary['engines'].items():
+        solve = f"{s['avg_solve_ms'] / 1000:.2f}s" if s['avg_solve_ms'] is not None else "-"
+        print(f"[SUITE] {name}: {s['solved']}/{s['positions']} solved "
+              f"({s['solved'] / s['positions'] * 100:.1f}%), avg time-to-solve {solve}, "
+              f"{s['nps'] / 1000:.0f} knps")
+
+    baseline = engines[0]['name']
+    base_unsolved = set(summary['engines'][baseline]['unsolved'])
+    for engine in engines[1:]:
+        unsolved = set(summary['engines'][engine['name']]['unsolved'])
+        lost = [p['id'] for p in positions if p['id'] in unsolved - base_unsolved]
+        gained = [p['id'] for p in positions if p['id'] in base_unsolved - unsolved]
+        print(f"[SUITE] {engine['name']} vs {baseline}: +{len(gained)} -{len(lost)}"
+              + (f"  lost: {' '.join(lost[:20])}" if lost else ""))
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+        print(f"[SUITE] JSON: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,396 @@
+"""
+Headless engine-vs-engine tournament runner.
+
+Plays engine A against engine B from an opening suite (each opening once with
+each colour), runs several games at a time in a process pool, adjudicates with
+ChessBoard and stops early once an SPRT test reaches a decision.
+
+Engines are given as comma-separated key=value lists. Known keys are name,
+type (stockfish or random), path, difficulty and movetime; every other key is
+sent to the engine as a UCI option:
+
+    python chess_tournament.py \
+        --engine "name=new,path=./stockfish,movetime=100,Hash=64" \
+        --engine "name=base,path=./stockfish-old,movetime=100" \
+        --openings openings.epd --games 400 --concurrency 4 \
+        --pgn tournament.pgn --json tournament.json
+"""
+
+import argparse
+import atexit
+import json
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from datetime import date
+
+from chess import ChessBoard, StockfishEngine, read_epd, read_pgn, format_pgn, move_to_uci
+
+DEFAULT_MOVETIME = 100      # ms per move
+DEFAULT_MAX_PLIES = 400     # adjudicate as a draw after this many half-moves
+ENGINE_KEYS = ('name', 'type', 'path', 'difficulty', 'movetime')
+
+
+class RandomEngine:
+    """Plays a uniformly random legal move. Useful as a baseline and for smoke tests."""
+
+    def __init__(self, seed=None):
+        self.process = True
+        self.rng = random.Random(seed)
+
+    def get_best_move(self, fen, movetime=0):
+        board = ChessBoard(fen)
+        moves = [(r, c, tr, tc) for r in range(8) for c in range(8)
+                 for tr, tc in board.get_valid_moves_for_piece(r, c)]
+        if not moves:
+            return None
+        return move_to_uci(*self.rng.choice(moves))
+
+    def new_game(self):
+        return True
+
+    def close(self):
+        pass
+
+
+def parse_engine_spec(text):
+    """Parse 'name=x,path=y,Hash=64' into an engine spec dict."""
+    spec = {'type': 'stockfish', 'movetime': DEFAULT_MOVETIME, 'options': {}}
+    for item in text.split(','):
+        if not item.strip():
+            continue
+        key, _, value = item.partition('=')
+        key, value = key.strip(), value.strip()
+        if key == 'movetime':
+            spec['movetime'] = int(value)
+        elif key in ENGINE_KEYS:
+            spec[key] = value
+        else:
+            spec['options'][key] = value
+    spec.setdefault('name', spec.get('path') or spec['type'])
+    return spec
+
+
+# Engines are started once per worker process and reused for every game it plays
+_worker_engines = {}
+
+
+def get_engine(spec):
+    """The engine for a spec in this worker process, started on first use."""
+    key = json.dumps(spec, sort_keys=True)
+    engine = _worker_engines.get(key)
+    if engine is None:
+        if spec['type'] == 'random':
+            engine = RandomEngine()
+        else:
+            engine = StockfishEngine(spec.get('difficulty', 'hard'), spec.get('path'), spec['options'])
+            if not engine.process:
+                raise RuntimeError(f"Could not start engine {spec['name']}")
+        _worker_engines[key] = engine
+    return engine
+
+
+def _close_worker_engines():
+    for engine in _worker_engines.values():
+        engine.close()
+    _worker_engines.clear()
+
+
+def init_worker():
+    """ProcessPoolExecutor initializer: close this worker's engines when it exits."""
+    atexit.register(_close_worker_engines)
+
+
+def play_game(task):
+    """Play one game in a worker process and return its record."""
+    white_spec, black_spec = task['white'], task['black']
+    engines = {'white': get_engine(white_spec), 'black': get_engine(black_spec)}
+    movetimes = {'white': white_spec['movetime'], 'black': black_spec['movetime']}
+    # Engines are reused across games; clear hash and history so games stay independent
+    for side, engine in engines.items():
+        if not engine.new_game():
+            raise RuntimeError(f"Engine {task[side]['name']} did not answer isready")
+
+    board = ChessBoard(task['fen']) if task['fen'] else ChessBoard()
+    repetitions = {board.zobrist_hash(): 1}
+    moves = []
+    start = time.perf_counter()
+    result = termination = None
+
+    while result is None:
+        if len(moves) >= task['max_plies']:
+            result, termination = '1/2-1/2', 'max plies'
+            break
+
+        side = board.current_turn
+        uci = engines[side].get_best_move(board.get_fen(), movetimes[side])
+        move = board.parse_uci(uci) if uci else None
+        if move is None or not board.is_valid_move(*move[:4]):
+            result = '0-1' if side == 'white' else '1-0'
+            termination = f"illegal move {uci!r}"
+            break
+
+        san = board.get_san(*move)
+        board.make_move(*move)
+
+        in_check = board.is_in_check()
+        if not board.has_legal_moves():
+            if in_check:
+                moves.append(san + '#')
+                result = '1-0' if side == 'white' else '0-1'
+                termination = 'checkmate'
+            else:
+                moves.append(san)
+                result, termination = '1/2-1/2', 'stalemate'
+            break
+
+        moves.append(san + '+' if in_check else san)
+
+        position = board.zobrist_hash()
+        repetitions[position] = repetitions.get(position, 0) + 1
+        if repetitions[position] >= 3:
+            result, termination = '1/2-1/2', 'threefold repetition'
+        elif board.halfmove_clock >= 100:
+            result, termination = '1/2-1/2', '50-move rule'
+        elif board.is_insufficient_material():
+            result, termination = '1/2-1/2', 'insufficient material'
+
+    return {
+        'index': task['index'],
+        'opening': task['opening'],
+        'fen': task['fen'],
+        'white': white_spec['name'],
+        'black': black_spec['name'],
+        'result': result,
+        'termination': termination,
+        'moves': moves,
+        'seconds': time.perf_counter() - start,
+    }
+
+
+def load_openings(path):
+    """Load opening start FENs from an EPD/FEN file or the end positions of PGN games."""
+    if path.lower().endswith('.pgn'):
+        fens = []
+        for game in read_pgn(path):
+            board = ChessBoard(game['headers'].get('FEN'))
+            for san in game['moves']:
+                move = board.parse_san(san)
+                if move is None:
+                    break
+                board.make_move(*move)
+            fens.append(board.get_fen())
+        return fens
+    return [board.get_fen() for board, _ in read_epd(path)]
+
+
+def score_to_elo(score):
+    """Elo difference for an expected score."""
+    score = min(max(score, 1e-6), 1 - 1e-6)
+    return -400 * math.log10(1 / score - 1)
+
+
+def elo_to_score(elo):
+    """Expected score for an Elo difference."""
+    return 1 / (1 + 10 ** (-elo / 400))
+
+
+def elo_estimate(wins, draws, losses):
+    """Return (elo, 95% error margin) from a W/D/L record."""
+    games = wins + draws + losses
+    if games == 0:
+        return 0.0, 0.0
+    score = (wins + draws / 2) / games
+    variance = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / games
+    stderr = math.sqrt(variance / games)
+    margin = (score_to_elo(score + 1.96 * stderr) - score_to_elo(score - 1.96 * stderr)) / 2
+    return score_to_elo(score) + 0.0, margin  # avoid printing -0.0
+
+
+def sprt_llr(wins, draws, losses, elo0, elo1):
+    """Log-likelihood ratio of H1 (elo1) vs H0 (elo0), normal approximation of the trinomial GSPRT."""
+    games = wins + draws + losses
+    if games == 0:
+        return 0.0
+    score = (wins + draws / 2) / games
+    variance = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / games
+    if variance <= 0:
+        return 0.0
+    s0, s1 = elo_to_score(elo0), elo_to_score(elo1)
+    return games * (s1 - s0) * (2 * score - s0 - s1) / (2 * variance)
+
+
+def sprt_bounds(alpha, beta):
+    """Lower and upper LLR bounds for the given error rates."""
+    return math.log(beta / (1 - alpha)), math.log((1 - beta) / alpha)
+
+
+def run_tournament(engine_a, engine_b, openings, games, concurrency=2, sprt=None,
+                   max_plies=DEFAULT_MAX_PLIES, pgn_path=None, progress=None):
+    """Play up to `games` games of engine A vs engine B and return a summary dict.
+
+    sprt is an optional dict with elo0, elo1, alpha and beta; when the LLR
+    crosses a bound no further games are started.
+    """
+    if not openings:
+        openings = [None]
+
+    tasks = []
+    for i in range(games):
+        fen = openings[(i // 2) % len(openings)]
+        a_white = i % 2 == 0
+        tasks.append({
+            'index': i + 1,
+            'opening': (i // 2) % len(openings) + 1,
+            'fen': fen,
+            'white': engine_a if a_white else engine_b,
+            'black': engine_b if a_white else engine_a,
+            'max_plies': max_plies,
+        })
+
+    bounds = sprt_bounds(sprt['alpha'], sprt['beta']) if sprt else None
+    wins = draws = losses = 0
+    llr = 0.0
+    decision = None
+    records = []
+    pgn_file = open(pgn_path, 'w', encoding='utf-8') if pgn_path else None
+    start = time.perf_counter()
+
+    try:
+        with ProcessPoolExecutor(max_workers=concurrency, initializer=init_worker) as pool:
+            pending = set()
+            next_task = 0
+            while pending or (next_task < len(tasks) and decision is None):
+                while decision is None and next_task < len(tasks) and len(pending) < concurrency:
+                    pending.add(pool.submit(play_game, tasks[next_task]))
+                    next_task += 1
+
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    record = future.result()
+                    records.append(record)
+
+                    a_white = record['index'] % 2 == 1  # engine A has white in odd-numbered games
+                    if record['result'] == '1/2-1/2':
+                        draws += 1
+                    elif (record['result'] == '1-0') == a_white:
+                        wins += 1
+                    else:
+                        losses += 1
+
+                    if pgn_file:
+                        pgn_file.write(_game_pgn(record) + '\n')
+                        pgn_file.flush()
+
+                    if sprt and decision is None:
+                        llr = sprt_llr(wins, draws, losses, sprt['elo0'], sprt['elo1'])
+                        if llr <= bounds[0]:
+                            decision = 'H0'
+                        elif llr >= bounds[1]:
+                            decision = 'H1'
+
+                    if progress:
+                        progress(len(records), wins, draws, losses, llr, time.perf_counter() - start)
+    finally:
+        if pgn_file:
+            pgn_file.close()
+
+    elapsed = time.perf_counter() - start
+    elo, margin = elo_estimate(wins, draws, losses)
+    records.sort(key=lambda r: r['index'])
+    return {
+        'engine_a': engine_a,
+        'engine_b': engine_b,
+        'games': len(records),
+        'wins': wins,
+        'draws': draws,
+        'losses': losses,
+        'score': (wins + draws / 2) / len(records) if records else 0.0,
+        'elo': elo,
+        'elo_margin': margin,
+        'sprt': dict(sprt, llr=llr, lower=bounds[0], upper=bounds[1], decision=decision) if sprt else None,
+        'seconds': elapsed,
+        'games_per_hour': len(records) / elapsed * 3600 if elapsed > 0 else 0.0,
+        'terminations': _count_terminations(records),
+        'results': [{k: r[k] for k in ('index', 'opening', 'white', 'black', 'result', 'termination', 'seconds')}
+                    for r in records],
+    }
+
+
+def _count_terminations(records):
+    counts = {}
+    for record in records:
+        reason = 'illegal move' if record['termination'].startswith('illegal') else record['termination']
+        counts[reason] = counts.get(reason, 0) + 1
+    return counts
+
+
+def _game_pgn(record):
+    headers = {
+        'Event': 'Engine tournament',
+        'Site': '?',
+        'Date': date.today().strftime('%Y.%m.%d'),
+        'Round': record['index'],
+        'White': record['white'],
+        'Black': record['black'],
+        'Result': record['result'],
+    }
+    if record['fen']:
+        headers['SetUp'] = '1'
+        headers['FEN'] = record['fen']
+    headers['Termination'] = record['termination']
+    return format_pgn(headers, record['moves'], record['result'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run an engine-vs-engine match with SPRT.")
+    parser.add_argument('--engine', action='append', required=True,
+                        help="engine spec, e.g. 'name=new,path=./stockfish,movetime=100' (give twice)")
+    parser.add_argument('--openings', help="EPD/FEN or PGN file with start positions")
+    parser.add_argument('--games', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument('--max-plies', type=int, default=DEFAULT_MAX_PLIES)
+    parser.add_argument('--sprt', nargs=2, type=float, metavar=('ELO0', 'ELO1'))
+    parser.add_argument('--alpha', type=float, default=0.05)
+    parser.add_argument('--beta', type=float, default=0.05)
+    parser.add_argument('--pgn', default='tournament.pgn')
+    parser.add_argument('--json', default='tournament.json')
+    args = parser.parse_args()
+
+    if len(args.engine) != 2:
+        parser.error("exactly two --engine specs are required")
+    engine_a, engine_b = (parse_engine_spec(spec) for spec in args.engine)
+    if engine_a['name'] == engine_b['name']:
+        engine_b['name'] += ' (B)'
+
+    openings = load_openings(args.openings) if args.openings else []
+    sprt = None
+    if args.sprt:
+        sprt = {'elo0': args.sprt[0], 'elo1': args.sprt[1], 'alpha': args.alpha, 'beta': args.beta}
+
+    def progress(played, wins, draws, losses, llr, elapsed):
+        elo, margin = elo_estimate(wins, draws, losses)
+        line = f"[TOURNAMENT] {played} games  +{wins} ={draws} -{losses}  Elo {elo:+.1f} +/- {margin:.1f}"
+        if sprt:
+            line += f"  LLR {llr:.2f}"
+        print(line + f"  {played / elapsed * 3600:.0f} games/h")
+
+    summary = run_tournament(engine_a, engine_b, openings, args.games, args.concurrency, sprt,
+                             args.max_plies, args.pgn, progress)
+
+    with open(args.json, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2)
+
+    print(f"[TOURNAMENT] {engine_a['name']} vs {engine_b['name']}: +{summary['wins']} ={summary['draws']} "
+          f"-{summary['losses']}, Elo {summary['elo']:+.1f} +/- {summary['elo_margin']:.1f}")
+    if sprt:
+        print(f"[TOURNAMENT] SPRT [{sprt['elo0']}, {sprt['elo1']}]: LLR {summary['sprt']['llr']:.2f} "
+              f"({summary['sprt']['lower']:.2f}, {summary['sprt']['upper']:.2f}) -> "
+              f"{summary['sprt']['decision'] or 'inconclusive'}")
+    print(f"[TOURNAMENT] {summary['games_per_hour']:.0f} games/hour, PGN: {args.pgn}, JSON: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
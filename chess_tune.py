@@ -0,0 +1,286 @@
+"""
+Texel-style tuning of the chess_eval weights.
+
+`prepare` turns labelled games into compact arrays: PGN games are replayed
+with ChessBoard and every position after the opening plies is stored with
+the game result; EPD records are taken as they are, labelled by their c9
+operation ("1-0", "0-1", "1/2-1/2"). The output .npz holds (N, 64) uint8 piece
+codes, the side to move and the result from white's point of view.
+
+`tune` fits the linear evaluation by minimising the Texel loss: the mean
+squared error between the result and sigmoid(K * eval / 400), with K fitted
+to the starting weights first (or a log loss with --loss logloss). Features
+are extracted once with chess_eval, gradients are computed over shuffled
+mini-batches with NumPy and the weights are updated with Adam. The optimizer
+state is checkpointed after every epoch, so an interrupted run continues
+with --resume.
+
+Usage:
+    python chess_tune.py prepare games.pgn [more.pgn|quiet.epd ...] -o positions.npz
+    python chess_tune.py tune positions.npz -o tuned.npz --epochs 20 [--resume]
+    python chess_eval.py eval "<FEN>" --weights tuned.npz
+"""
+
+import argparse
+import math
+import os
+import time
+
+import numpy as np
+
+from chess import ChessBoard, read_pgn, read_epd
+from chess_eval import EvalWeights, encode_squares, board_squares, extract_features, evaluate, eval_gradient
+
+RESULT_SCORES = {'1-0': 1.0, '1/2-1/2': 0.5, '0-1': 0.0}
+DEFAULT_SKIP_PLIES = 8          # opening positions say little about the result
+FEATURE_CHUNK = 100_000         # positions per feature-extraction batch (bounds peak memory)
+CHECKPOINT_VERSION = 1
+
+
+def _flush(squares, chunks):
+    if squares:
+        chunks.append(encode_squares(squares))
+        squares.clear()
+
+
+def prepare_positions(paths, skip_plies=DEFAULT_SKIP_PLIES, max_positions=None, progress=None):
+    """Collect (codes, white_to_move, results) from PGN and labelled EPD files."""
+    chunks = []
+    results = []
+    white_to_move = []
+    pending = []
+    total = games = 0
+    start = time.perf_counter()
+
+    def add(board, score):
+        nonlocal total
+        pending.append(board_squares(board))
+        white_to_move.append(board.current_turn == 'white')
+        results.append(score)
+        total += 1
+        if len(pending) >= FEATURE_CHUNK:
+            _flush(pending, chunks)
+
+    for path in paths:
+        if path.lower().endswith(('.epd', '.fen')):
+            for board, ops in read_epd(path):
+                label = (ops.get('c9') or [None])[0]
+                if label in RESULT_SCORES:
+                    add(board, RESULT_SCORES[label])
+                if max_positions and total >= max_positions:
+                    break
+            continue
+
+        board = ChessBoard()
+        for game in read_pgn(path):
+            score = RESULT_SCORES.get(game['result'])
+            if score is None:
+                continue
+            fen = game['headers'].get('FEN')
+            try:
+                board.set_fen(fen) if fen else board.reset_board()
+            except ValueError:
+                continue
+            for ply, san in enumerate(game['moves']):
+                move = board.parse_san(san)
+                if move is None or not board.make_move(*move):
+                    break
+                if ply + 1 >= skip_plies:
+                    add(board, score)
+            games += 1
+            if progress and games % 1000 == 0:
+                progress(games, total, time.perf_counter() - start)
+            if max_positions and total >= max_positions:
+                break
+        if max_positions and total >= max_positions:
+            break
+
+    _flush(pending, chunks)
+    if not chunks:
+        raise ValueError("No labelled positions found")
+    codes = np.concatenate(chunks)[:max_positions]
+    n = len(codes)
+    return codes, np.array(white_to_move[:n], dtype=bool), np.array(results[:n], dtype=np.float32)
+
+
+def save_positions(path, codes, white_to_move, results):
+    np.savez_compressed(path, codes=codes, white_to_move=white_to_move, results=results)
+
+
+def load_positions(path):
+    with np.load(path) as data:
+        return data['codes'], data['white_to_move'], data['results']
+
+
+def extract_all(codes, chunk=FEATURE_CHUNK):
+    """Features for every position, extracted in chunks and stored as int16."""
+    parts = [extract_features(codes[i:i + chunk]) for i in range(0, len(codes), chunk)]
+    return {key: np.concatenate([p[key] for p in parts]).astype(np.int16) for key in parts[0]}
+
+
+def _slice(features, index):
+    return {key: value[index] for key, value in features.items()}
+
+
+def sigmoid(scores, k):
+    return 1.0 / (1.0 + np.power(10.0, -k * scores / 400.0))
+
+
+def texel_loss(scores, results, k, loss='mse'):
+    p = sigmoid(scores, k)
+    if loss == 'logloss':
+        p = np.clip(p, 1e-7, 1 - 1e-7)
+        return float(-np.mean(results * np.log(p) + (1 - results) * np.log(1 - p)))
+    return float(np.mean((results - p) ** 2))
+
+
+def fit_k(scores, results, loss='mse', lo=0.1, hi=4.0, iterations=40):
+    """Scaling constant that best maps the current scores onto the results (golden-section search)."""
+    ratio = (math.sqrt(5) - 1) / 2
+    a, b = lo, hi
+    c, d = b - ratio * (b - a), a + ratio * (b - a)
+    fc, fd = texel_loss(scores, results, c, loss), texel_loss(scores, results, d, loss)
+    for _ in range(iterations):
+        if fc < fd:
+            b, d, fd = d, c, fc
+            c = b - ratio * (b - a)
+            fc = texel_loss(scores, results, c, loss)
+        else:
+            a, c, fc = c, d, fd
+            d = a + ratio * (b - a)
+            fd = texel_loss(scores, results, d, loss)
+    return (a + b) / 2
+
+
+def _save_checkpoint(path, state):
+    tmp_path = path + '.tmp.npz'
+    np.savez(tmp_path, **state)
+    os.replace(tmp_path, path)
+
+
+def tune(codes, results, weights=None, epochs=10, lr=1.0, batch_size=16384, loss='mse', k=None,
+         checkpoint=None, resume=False, seed=1, progress=None):
+    """Fit the evaluation weights; returns (weights, history).
+
+    The checkpoint holds the weights, Adam moments, K and the epoch count, and
+    is replaced atomically after each epoch. With resume=True a matching
+    checkpoint is loaded and training continues after its last epoch.
+    """
+    features = extract_all(codes)
+    vector = (weights or EvalWeights()).to_vector()
+    m = np.zeros_like(vector)
+    v = np.zeros_like(vector)
+    step = 0
+    first_epoch = 0
+    history = []
+
+    if resume and checkpoint and os.path.exists(checkpoint):
+        with np.load(checkpoint) as state:
+            if int(state['version']) != CHECKPOINT_VERSION or int(state['positions']) != len(codes):
+                raise ValueError(f"Checkpoint {checkpoint} does not match this position set")
+            vector, m, v = state['weights'].copy(), state['m'].copy(), state['v'].copy()
+            step, first_epoch, k = int(state['step']), int(state['epoch']), float(state['k'])
+            history = [dict(zip(('epoch', 'loss', 'seconds'), row)) for row in state['history'].tolist()]
+
+    if k is None:
+        k = fit_k(evaluate(codes, None, EvalWeights.from_vector(vector), features), results, loss)
+
+    beta1, beta2, eps = 0.9, 0.999, 1e-8
+    n = len(codes)
+    for epoch in range(first_epoch, epochs):
+        start = time.perf_counter()
+        order = np.random.default_rng([seed, epoch]).permutation(n)  # same order whether resumed or not
+        for offset in range(0, n, batch_size):
+            index = np.sort(order[offset:offset + batch_size])
+            batch_codes = codes[index]
+            batch_features = _slice(features, index)
+            batch_results = results[index]
+            scores = evaluate(batch_codes, None, EvalWeights.from_vector(vector), batch_features)
+
+            # d loss / d score for the Texel sigmoid (or the log loss)
+            p = sigmoid(scores, k)
+            scale = k * math.log(10) / 400
+            if loss == 'logloss':
+                dscore = (p - batch_results) * scale
+            else:
+                dscore = -2.0 * (batch_results - p) * p * (1 - p) * scale
+            grad = eval_gradient(batch_codes, batch_features, dscore / len(index))
+
+            step += 1
+            m = beta1 * m + (1 - beta1) * grad
+            v = beta2 * v + (1 - beta2) * grad * grad
+            vector -= lr * (m / (1 - beta1 ** step)) / (np.sqrt(v / (1 - beta2 ** step)) + eps)
+
+        elapsed = time.perf_counter() - start
+        epoch_loss = texel_loss(evaluate(codes, None, EvalWeights.from_vector(vector), features), results, k, loss)
+        history.append({'epoch': epoch + 1, 'loss': epoch_loss, 'seconds': elapsed})
+        if checkpoint:
+            _save_checkpoint(checkpoint, {
+                'version': CHECKPOINT_VERSION, 'positions': n, 'weights': vector, 'm': m, 'v': v,
+                'step': step, 'epoch': epoch + 1, 'k': k,
+                'history': np.array([[h['epoch'], h['loss'], h['seconds']] for h in history]),
+            })
+        if progress:
+            progress(epoch + 1, epoch_loss, elapsed, n, k)
+
+    return EvalWeights.from_vector(vector), history
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Texel tuning of the batch evaluator.")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    prep = sub.add_parser('prepare', help="Extract labelled positions from PGN/EPD files")
+    prep.add_argument('inputs', nargs='+')
+    prep.add_argument('-o', '--output', default='positions.npz')
+    prep.add_argument('--skip-plies', type=int, default=DEFAULT_SKIP_PLIES)
+    prep.add_argument('--max-positions', type=int)
+
+    fit = sub.add_parser('tune', help="Fit evaluation weights to a prepared position set")
+    fit.add_argument('positions')
+    fit.add_argument('-o', '--output', default='tuned.npz')
+    fit.add_argument('--start', help="starting weights (default: built-in)")
+    fit.add_argument('--epochs', type=int, default=10)
+    fit.add_argument('--lr', type=float, default=1.0, help="Adam step size in centipawns")
+    fit.add_argument('--batch-size', type=int, default=16384)
+    fit.add_argument('--loss', choices=('mse', 'logloss'), default='mse')
+    fit.add_argument('--k', type=float, help="sigmoid scale (default: fitted to the starting weights)")
+    fit.add_argument('--checkpoint', help="checkpoint file (default: <output>.ckpt.npz)")
+    fit.add_argument('--resume', action='store_true', help="continue from the checkpoint")
+
+    args = parser.parse_args()
+
+    if args.command == 'prepare':
+        def progress(games, positions, elapsed):
+            print(f"[TUNE] {games} games, {positions} positions, {games / elapsed:.0f} games/s")
+
+        start = time.perf_counter()
+        codes, white_to_move, results = prepare_positions(args.inputs, args.skip_plies, args.max_positions, progress)
+        save_positions(args.output, codes, white_to_move, results)
+        print(f"[TUNE] {len(codes)} positions (white scores {results.mean():.3f}) in "
+              f"{time.perf_counter() - start:.1f}s -> {args.output} "
+              f"({os.path.getsize(args.output) / max(1, len(codes)):.1f} bytes/position)")
+        return
+
+    codes, _, results = load_positions(args.positions)
+    start_weights = EvalWeights.load(args.start) if args.start else EvalWeights()
+    checkpoint = args.checkpoint or os.path.splitext(args.output)[0] + '.ckpt.npz'
+
+    start_scores = evaluate(codes, None, start_weights)
+    initial = texel_loss(start_scores, results, args.k or fit_k(start_scores, results, args.loss), args.loss)
+    print(f"[TUNE] {len(codes)} positions, starting loss {initial:.6f}")
+
+    def progress(epoch, loss, elapsed, n, k):
+        print(f"[TUNE] epoch {epoch}: loss {loss:.6f}, {elapsed:.2f}s "
+              f"({n / elapsed:,.0f} positions/s, {elapsed * 1_000_000 / n:.1f}s per 1M positions), K={k:.3f}")
+
+    weights, history = tune(codes, results, start_weights, args.epochs, args.lr, args.batch_size, args.loss,
+                            args.k, checkpoint, args.resume, progress=progress)
+    weights.save(args.output)
+    if history:
+        print(f"[TUNE] Loss {initial:.6f} -> {history[-1]['loss']:.6f}; "
+              f"material {np.round(weights.material).astype(int).tolist()} -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
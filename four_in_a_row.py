@@ -1,7 +1,9 @@
 import tkinter as tk
 from tkinter import messagebox
+import argparse
 import random
-import copy
+import threading
+import time
 
 # Game constants
 ROWS = 6
@@ -52,6 +54,337 @@ THEMES = {
 
 BOT_DIFFICULTIES = ["Easy", "Medium", "Hard", "Impossible"]
 
+# Bitboard layout: bit col * HEIGHT + row is the cell in column col, row counted
+# from the bottom. The extra guard bit on top of each column always stays empty,
+# so shifted masks never carry a line from one column into the next.
+HEIGHT = ROWS + 1
+CENTER_MASK = ((1 << ROWS) - 1) << (COLS // 2 * HEIGHT)
+SHIFTS = (1, HEIGHT, HEIGHT - 1, HEIGHT + 1)    # vertical, horizontal, both diagonals
+
+# Impossible bot search
+IMPOSSIBLE_TIME = 1.0       # seconds the Impossible bot may think per move
+SOLVER_MIN_MOVES = 16       # discs on the board before the Impossible bot tries the exact solver
+SOLVER_SHARE = 0.6          # part of IMPOSSIBLE_TIME the solver may use; the search gets the rest
+TT_SIZE = 131071            # transposition table slots (prime, so key % size mixes all bits)
+WIN_SCORE = 100000          # a win scores WIN_SCORE minus the discs on the board, so faster wins score higher
+CENTER_ORDER = (3, 2, 4, 1, 5, 0, 6)
+EXACT, LOWER, UPPER = 0, 1, 2
+
+
+def _window_masks():
+    """Every run of CONNECT_N cells on the board as a bitmask."""
+    masks = []
+    for col in range(COLS):
+        for row in range(ROWS):
+            for dc, dr in ((0, 1), (1, 0), (1, 1), (1, -1)):
+                cells = [(col + i * dc, row + i * dr) for i in range(CONNECT_N)]
+                if all(0 <= c < COLS and 0 <= r < ROWS for c, r in cells):
+                    masks.append(sum(1 << (c * HEIGHT + r) for c, r in cells))
+    return masks
+
+
+WINDOWS = _window_masks()
+
+
+def has_four(bits):
+    """True if the mask holds four in a row in any direction."""
+    for shift in SHIFTS:
+        pairs = bits & (bits >> shift)
+        if pairs & (pairs >> 2 * shift):
+            return True
+    return False
+
+
+class BitBoard:
+    """Connect Four position: one bitmask per player plus the column heights.
+
+    Drop and undo are O(1) and a win test is a few shifts and ANDs. Rows in
+    the public methods are GUI rows (0 = top) so the UI can use them directly.
+    """
+
+    def __init__(self, moves=()):
+        self.bits = [0, 0, 0]           # indexed by player 1 / 2; index 0 unused
+        self.heights = [0] * COLS       # discs in each column
+        self.moves = []                 # columns played, in order
+        for col in moves:
+            self.drop(col, 1 + len(self.moves) % 2)
+
+    def can_drop(self, col):
+        return self.heights[col] < ROWS
+
+    def valid_columns(self):
+        return [c for c in range(COLS) if self.heights[c] < ROWS]
+
+    def drop_row(self, col):
+        """GUI row the next disc in this column lands on, or None if it is full."""
+        return ROWS - 1 - self.heights[col] if self.heights[col] < ROWS else None
+
+    def drop(self, col, player):
+        """Drop a disc and return the GUI row it landed on."""
+        height = self.heights[col]
+        self.bits[player] |= 1 << (col * HEIGHT + height)
+        self.heights[col] = height + 1
+        self.moves.append(col)
+        return ROWS - 1 - height
+
+    def undo(self):
+        """Take back the last drop and return (col, player)."""
+        col = self.moves.pop()
+        self.heights[col] -= 1
+        bit = 1 << (col * HEIGHT + self.heights[col])
+        player = 1 if self.bits[1] & bit else 2
+        self.bits[player] ^= bit
+        return col, player
+
+    def cell(self, row, col):
+        bit = 1 << (col * HEIGHT + ROWS - 1 - row)
+        if self.bits[1] & bit:
+            return 1
+        if self.bits[2] & bit:
+            return 2
+        return None
+
+    def is_win(self, player):
+        return has_four(self.bits[player])
+
+    def is_winning_move(self, col, player):
+        """True if dropping player's disc in col would complete four in a row."""
+        height = self.heights[col]
+        return height < ROWS and has_four(self.bits[player] | (1 << (col * HEIGHT + height)))
+
+    def is_full(self):
+        return len(self.moves) == ROWS * COLS
+
+    def count(self, player, mask):
+        return bin(self.bits[player] & mask).count('1')
+
+    def key(self):
+        """Unique integer for the position."""
+        return self.bits[1] | (self.bits[2] << (COLS * HEIGHT))
+
+    def line_through(self, row, col):
+        """Cells of the longest run of at least CONNECT_N through (row, col), or []."""
+        color = self.cell(row, col)
+        for dr, dc in ((0, 1), (1, 0), (1, 1), (1, -1)):
+            before, after = [], []
+            r, c = row - dr, col - dc
+            while 0 <= r < ROWS and 0 <= c < COLS and self.cell(r, c) == color:
+                before.append((r, c))
+                r, c = r - dr, c - dc
+            r, c = row + dr, col + dc
+            while 0 <= r < ROWS and 0 <= c < COLS and self.cell(r, c) == color:
+                after.append((r, c))
+                r, c = r + dr, c + dc
+            if len(before) + 1 + len(after) >= CONNECT_N:
+                return before[::-1] + [(row, col)] + after
+        return []
+
+
+def evaluate_window(own, theirs, empty):
+    score = 0
+    if own == 4:
+        score += 100
+    elif own == 3 and empty == 1:
+        score += 5
+    elif own == 2 and empty == 2:
+        score += 2
+    if theirs == 3 and empty == 1:
+        score -= 7
+    return score
+
+
+def evaluate(board, player):
+    """Heuristic score for player: centre discs and open windows, minus the same for the opponent."""
+    own_bits, their_bits = board.bits[player], board.bits[3 - player]
+    score = (bin(own_bits & CENTER_MASK).count('1') - bin(their_bits & CENTER_MASK).count('1')) * 6
+    for window in WINDOWS:
+        own = bin(own_bits & window).count('1')
+        theirs = bin(their_bits & window).count('1')
+        if own or theirs:
+            empty = CONNECT_N - own - theirs
+            score += evaluate_window(own, theirs, empty) - evaluate_window(theirs, own, empty)
+    return score
+
+
+class TranspositionTable:
+    """Fixed number of slots indexed by key % size.
+
+    A slot keeps the deeper of two entries, but entries left over from an
+    earlier search are always replaced, so the table never fills up with
+    stale positions.
+    """
+
+    def __init__(self, size=TT_SIZE):
+        self.size = size
+        self.slots = [None] * size      # (key, depth, flag, score, move, generation)
+        self.generation = 0
+
+    def new_search(self):
+        self.generation += 1
+
+    def get(self, key):
+        entry = self.slots[key % self.size]
+        return entry if entry is not None and entry[0] == key else None
+
+    def put(self, key, depth, flag, score, move):
+        index = key % self.size
+        old = self.slots[index]
+        if old is None or old[0] == key or old[5] != self.generation or depth >= old[1]:
+            self.slots[index] = (key, depth, flag, score, move, self.generation)
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+class ImpossibleSearch:
+    """Iterative-deepening negamax with a transposition table and a time budget.
+
+    Every iteration tries the best move stored for a position first and the
+    remaining columns centre-first, so each depth starts from what the
+    previous one learned. The move from the last finished iteration is used.
+    """
+
+    def __init__(self, time_limit=IMPOSSIBLE_TIME, table_size=TT_SIZE):
+        self.time_limit = time_limit
+        self.table = TranspositionTable(table_size)
+        self.nodes = 0
+        self.depth = 0
+        self.score = 0
+        self.deadline = None
+
+    def choose(self, board, player, time_limit=None):
+        """Best column for player to drop in, or None if the board is full.
+
+        time_limit overrides the per-move budget for this call only.
+        """
+        if not board.valid_columns():
+            return None
+        self.table.new_search()
+        self.nodes = self.depth = 0
+        self.deadline = time.perf_counter() + (self.time_limit if time_limit is None else time_limit)
+        start = len(board.moves)
+        best = None
+        for depth in range(1, ROWS * COLS - start + 1):
+            try:
+                self.score, best = self.negamax(board, player, depth, -WIN_SCORE, WIN_SCORE)
+            except SearchTimeout:
+                while len(board.moves) > start:
+                    board.undo()
+                break
+            self.depth = depth
+            if abs(self.score) > WIN_SCORE - ROWS * COLS - 1:
+                break   # the game is decided; deeper searches cannot change the result
+        return best
+
+    def negamax(self, board, player, depth, alpha, beta):
+        """(score for player, best column) searched depth drops ahead."""
+        self.nodes += 1
+        if self.nodes & 1023 == 0 and time.perf_counter() > self.deadline:
+            raise SearchTimeout
+
+        columns = board.valid_columns()
+        if not columns:
+            return 0, None
+        for col in columns:
+            if board.is_winning_move(col, player):
+                return WIN_SCORE - len(board.moves) - 1, col
+        if depth == 0:
+            return evaluate(board, player), None
+
+        key = board.key()
+        entry = self.table.get(key)
+        first = None
+        if entry is not None:
+            _, entry_depth, flag, score, first, _ = entry
+            if entry_depth >= depth:
+                if flag == EXACT:
+                    return score, first
+                if flag == LOWER:
+                    alpha = max(alpha, score)
+                else:
+                    beta = min(beta, score)
+                if alpha >= beta:
+                    return score, first
+
+        original_alpha = alpha
+        order = [first] if first is not None else []
+        order += [col for col in CENTER_ORDER if col != first and board.heights[col] < ROWS]
+        best_score, best_move = -WIN_SCORE - 1, order[0]
+        for col in order:
+            board.drop(col, player)
+            score = -self.negamax(board, 3 - player, depth - 1, -beta, -alpha)[0]
+            board.undo()
+            if score > best_score:
+                best_score, best_move = score, col
+            alpha = max(alpha, score)
+            if alpha >= beta:
+                break
+
+        if best_score <= original_alpha:
+            flag = UPPER
+        elif best_score >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self.table.put(key, depth, flag, best_score, best_move)
+        return best_score, best_move
+
+
+def perft(board, depth, player=1):
+    """Positions reachable in depth drops, not continuing past a win (for benchmarks)."""
+    if depth == 0:
+        return 1
+    total = 0
+    for col in range(COLS):
+        if board.heights[col] < ROWS:
+            if board.is_winning_move(col, player):
+                total += 1
+                continue
+            board.drop(col, player)
+            total += perft(board, depth - 1, 3 - player)
+            board.undo()
+    return total
+
+
+def benchmark(depth=7, playouts=20000, think=IMPOSSIBLE_TIME, seed=1):
+    """Print bitboard throughput (perft and random playouts) and Impossible search depth."""
+    board = BitBoard()
+    start = time.perf_counter()
+    positions = perft(board, depth)
+    elapsed = time.perf_counter() - start
+    print(f"[FOUR] perft({depth}) = {positions:,} positions in {elapsed:.2f}s, "
+          f"{positions / elapsed:,.0f} positions/s")
+
+    rng = random.Random(seed)
+    positions = 0
+    start = time.perf_counter()
+    for _ in range(playouts):
+        player = 1
+        while not board.is_full():
+            col = rng.choice(board.valid_columns())
+            board.drop(col, player)
+            positions += 1
+            if board.is_win(player):
+                break
+            player = 3 - player
+        while board.moves:
+            board.undo()
+    elapsed = time.perf_counter() - start
+    print(f"[FOUR] {playouts:,} random games, {positions:,} drops with win test and undo in {elapsed:.2f}s, "
+          f"{positions / elapsed:,.0f} positions/s")
+
+    search = ImpossibleSearch(think)
+    for moves in ([], [3, 3, 2, 4], [3, 2, 3, 3, 4, 4, 2, 5]):
+        board = BitBoard(moves)
+        start = time.perf_counter()
+        col = search.choose(board, 1 + len(moves) % 2)
+        elapsed = time.perf_counter() - start
+        print(f"[FOUR] Impossible after {len(moves)} moves: column {col + 1}, depth {search.depth}, "
+              f"score {search.score}, {search.nodes:,} nodes in {elapsed:.2f}s "
+              f"({search.nodes / elapsed:,.0f} nodes/s)")
+
+
 class FourInARow:
     def __init__(self, root):
         self.root = root
@@ -65,6 +398,10 @@ class FourInARow:
         self.replay_index = 0
         self.replay_mode = False
         self.bot_difficulty = "Medium"
+        self.impossible = ImpossibleSearch()
+        self.solver = None
+        self.bot_request = 0                    # bumped to drop the result of a search still running
+        self.search_lock = threading.Lock()     # one Impossible search at a time
         self.create_menu()
 
     def apply_theme(self):
@@ -80,6 +417,7 @@ class FourInARow:
                     pass
 
     def create_menu(self):
+        self.bot_request += 1
         self.clear_window()
         self.replay_mode = False
         self.apply_theme()
@@ -134,8 +472,9 @@ class FourInARow:
             widget.destroy()
 
     def start_game(self, bot=False):
+        self.bot_request += 1
         self.bot_enabled = bot
-        self.board = [[None for _ in range(COLS)] for _ in range(ROWS)]
+        self.board = BitBoard()
         self.move_stack = []
         self.move_count = 0
         self.current_player = 1
@@ -209,7 +548,7 @@ class FourInARow:
     def update_board_ui(self):
         for r in range(ROWS):
             for c in range(COLS):
-                val = self.board[r][c]
+                val = self.board.cell(r, c)
                 b = self.cell_buttons[r][c]
                 if (r, c) in self.win_line:
                     b.config(bg=self.theme["hl"])
@@ -226,7 +565,7 @@ class FourInARow:
                 btn.config(state=tk.DISABLED)
             return
         for c in range(COLS):
-            if self.board[0][c] is None:
+            if self.board.can_drop(c):
                 self.drop_buttons[c].config(state=tk.NORMAL, cursor="hand2")
             else:
                 self.drop_buttons[c].config(state=tk.DISABLED, cursor="arrow")
@@ -237,12 +576,11 @@ class FourInARow:
     def drop_piece(self, col):
         if self.winner or self.replay_mode:
             return
-        row = self.get_drop_row(col)
-        if row is None:
+        if not self.board.can_drop(col):
             return
-        self.move_stack.append((copy.deepcopy(self.board), self.current_player, copy.deepcopy(self.win_line)))
+        self.move_stack.append((self.current_player, self.win_line))
         self.replay_moves.append(col)
-        self.board[row][col] = self.current_player
+        row = self.board.drop(col, self.current_player)
         self.move_count += 1
         self.check_game_end(row, col)
         if not self.winner and not self.is_draw():
@@ -261,10 +599,7 @@ class FourInARow:
             self.enable_columns()
 
     def get_drop_row(self, col):
-        for r in reversed(range(ROWS)):
-            if self.board[r][col] is None:
-                return r
-        return None
+        return self.board.drop_row(col)
 
     def check_game_end(self, last_row, last_col):
         winner, line = self.check_winner(last_row, last_col)
@@ -290,26 +625,10 @@ class FourInARow:
             self.show_end_screen(winner=None)
 
     def is_draw(self):
-        return all(self.board[0][c] is not None for c in range(COLS)) and not self.winner
+        return self.board.is_full() and not self.winner
 
     def check_winner(self, last_row, last_col):
-        color = self.board[last_row][last_col]
-        directions = [(0,1), (1,0), (1,1), (1,-1)]
-        for dr, dc in directions:
-            line = [(last_row, last_col)]
-            # Negative direction
-            r, c = last_row-dr, last_col-dc
-            while 0<=r<ROWS and 0<=c<COLS and self.board[r][c]==color:
-                line.insert(0, (r,c))
-                r, c = r-dr, c-dc
-            # Positive direction
-            r, c = last_row+dr, last_col+dc
-            while 0<=r<ROWS and 0<=c<COLS and self.board[r][c]==color:
-                line.append((r,c))
-                r, c = r+dr, c+dc
-            if len(line) >= CONNECT_N:
-                return color, line
-        return None, []
+        return self.check_winner_board(self.board, last_row, last_col)
 
     def show_end_screen(self, winner=None):
         if self.replay_mode:
@@ -352,32 +671,28 @@ class FourInARow:
         elif difficulty == "Hard":
             col = self.bot_hard()
         elif difficulty == "Impossible":
-            col = self.bot_impossible()
+            # Searches take up to IMPOSSIBLE_TIME, so they run off the Tk thread on a copy of the board
+            self.bot_request += 1
+            threading.Thread(target=self.bot_impossible, args=(self.bot_request, BitBoard(self.board.moves)),
+                             daemon=True).start()
+            return
         else:
             col = self.bot_medium()
         if col is not None:
             self.drop_piece(col)
 
     def bot_easy(self):
-        valid_cols = [c for c in range(COLS) if self.board[0][c] is None]
+        valid_cols = self.board.valid_columns()
         return random.choice(valid_cols)
 
     def bot_medium(self):
-        valid_cols = [c for c in range(COLS) if self.board[0][c] is None]
+        valid_cols = self.board.valid_columns()
         for c in valid_cols:
-            r = self.get_drop_row(c)
-            self.board[r][c] = 2
-            if self.check_winner(r, c)[0] == 2:
-                self.board[r][c] = None
+            if self.board.is_winning_move(c, 2):
                 return c
-            self.board[r][c] = None
         for c in valid_cols:
-            r = self.get_drop_row(c)
-            self.board[r][c] = 1
-            if self.check_winner(r, c)[0] == 1:
-                self.board[r][c] = None
+            if self.board.is_winning_move(c, 1):
                 return c
-            self.board[r][c] = None
         if 3 in valid_cols:
             return 3
         for c in [0,6,1,5,2,4]:
@@ -386,37 +701,18 @@ class FourInARow:
         return random.choice(valid_cols) if valid_cols else None
 
     def bot_hard(self):
-        valid_cols = [c for c in range(COLS) if self.board[0][c] is None]
+        valid_cols = self.board.valid_columns()
         for c in valid_cols:
-            r = self.get_drop_row(c)
-            self.board[r][c] = 2
-            if self.check_winner(r, c)[0] == 2:
-                self.board[r][c] = None
+            if self.board.is_winning_move(c, 2):
                 return c
-            self.board[r][c] = None
         for c in valid_cols:
-            r = self.get_drop_row(c)
-            self.board[r][c] = 1
-            if self.check_winner(r, c)[0] == 1:
-                self.board[r][c] = None
+            if self.board.is_winning_move(c, 1):
                 return c
-            self.board[r][c] = None
         safe_cols = []
         for c in valid_cols:
-            r = self.get_drop_row(c)
-            self.board[r][c] = 2
-            opp_wins = False
-            for cc in valid_cols:
-                if cc == c:
-                    rr = r-1
-                else:
-                    rr = self.get_drop_row(cc)
-                if rr is not None:
-                    self.board[rr][cc] = 1
-                    if self.check_winner(rr, cc)[0] == 1:
-                        opp_wins = True
-                    self.board[rr][cc] = None
-            self.board[r][c] = None
+            self.board.drop(c, 2)
+            opp_wins = any(self.board.is_winning_move(cc, 1) for cc in valid_cols)
+            self.board.undo()
             if not opp_wins:
                 safe_cols.append(c)
         if safe_cols:
@@ -429,131 +725,54 @@ class FourInARow:
         else:
             return self.bot_medium()
 
-    def bot_impossible(self):
-        col, _ = self.minimax(self.board, depth=5, alpha=-float('inf'), beta=float('inf'), maximizing=True)
+    def bot_impossible(self, request, board):
+        """Worker thread: pick the move for board and hand it to Tk."""
+        with self.search_lock:
+            if request != self.bot_request:
+                return  # superseded while waiting for the previous search
+            deadline = time.perf_counter() + IMPOSSIBLE_TIME
+            col = self.solver_move(board, IMPOSSIBLE_TIME * SOLVER_SHARE)
+            if col is None:
+                col = self.impossible.choose(board, 2, max(0.0, deadline - time.perf_counter()))
+        self.root.after(0, self.apply_bot_move, request, col)
+
+    def apply_bot_move(self, request, col):
+        """Play the Impossible bot's move unless the game moved on since it was requested."""
+        if request != self.bot_request or self.winner or self.replay_mode:
+            return
         if col is None:
-            return self.bot_hard()
-        return col
-
-    def minimax(self, board, depth, alpha, beta, maximizing):
-        valid_cols = [c for c in range(COLS) if board[0][c] is None]
-        is_terminal, winner = self.is_terminal_node(board)
-        if depth == 0 or is_terminal:
-            if is_terminal:
-                if winner == 2:
-                    return None, 100000
-                elif winner == 1:
-                    return None, -100000
-                else:
-                    return None, 0
-            return None, self.score_position(board, 2)
-        if maximizing:
-            value = -float('inf')
-            chosen_col = random.choice(valid_cols)
-            for col in valid_cols:
-                r = self.get_drop_row_board(board, col)
-                temp_board = copy.deepcopy(board)
-                temp_board[r][col] = 2
-                _, score = self.minimax(temp_board, depth-1, alpha, beta, False)
-                if score > value:
-                    value = score
-                    chosen_col = col
-                alpha = max(alpha, value)
-                if alpha >= beta:
-                    break
-            return chosen_col, value
-        else:
-            value = float('inf')
-            chosen_col = random.choice(valid_cols)
-            for col in valid_cols:
-                r = self.get_drop_row_board(board, col)
-                temp_board = copy.deepcopy(board)
-                temp_board[r][col] = 1
-                _, score = self.minimax(temp_board, depth-1, alpha, beta, True)
-                if score < value:
-                    value = score
-                    chosen_col = col
-                beta = min(beta, value)
-                if alpha >= beta:
-                    break
-            return chosen_col, value
+            col = self.bot_hard()
+        if col is not None:
+            self.drop_piece(col)
 
-    def is_terminal_node(self, board):
-        for c in range(COLS):
-            r = self.get_drop_row_board(board, c)
-            if r is not None:
-                for player in [1,2]:
-                    board[r][c] = player
-                    winner, _ = self.check_winner_board(board, r, c)
-                    board[r][c] = None
-                    if winner:
-                        return True, winner
-        if all(board[0][c] is not None for c in range(COLS)):
-            return True, None
-        return False, None
-
-    def score_position(self, board, player):
-        opp = 1 if player == 2 else 2
-        score = 0
-        center = [board[r][COLS//2] for r in range(ROWS)]
-        score += center.count(player) * 6
-        for r in range(ROWS):
-            for c in range(COLS-3):
-                window = [board[r][c+i] for i in range(4)]
-                score += self.evaluate_window(window, player, opp)
-        for c in range(COLS):
-            for r in range(ROWS-3):
-                window = [board[r+i][c] for i in range(4)]
-                score += self.evaluate_window(window, player, opp)
-        for r in range(ROWS-3):
-            for c in range(COLS-3):
-                window = [board[r+i][c+i] for i in range(4)]
-                score += self.evaluate_window(window, player, opp)
-            for c in range(3, COLS):
-                window = [board[r+i][c-i] for i in range(4)]
-                score += self.evaluate_window(window, player, opp)
-        return score
-
-    def evaluate_window(self, window, player, opp):
-        score = 0
-        if window.count(player) == 4:
-            score += 100
-        elif window.count(player) == 3 and window.count(None) == 1:
-            score += 5
-        elif window.count(player) == 2 and window.count(None) == 2:
-            score += 2
-        if window.count(opp) == 3 and window.count(None) == 1:
-            score -= 7
-        return score
-
-    def get_drop_row_board(self, board, col):
-        for r in reversed(range(ROWS)):
-            if board[r][col] is None:
-                return r
-        return None
+    def solver_move(self, board, time_limit):
+        """Perfect move from the solver, or None if it cannot finish within time_limit."""
+        if len(board.moves) < SOLVER_MIN_MOVES:
+            return None
+        from four_in_a_row_solver import Solver, SolverTimeout
+
+        if self.solver is None:
+            self.solver = Solver()
+        try:
+            col, _ = self.solver.best_move(board, time_limit)
+        except SolverTimeout:
+            return None
+        return col
 
     def check_winner_board(self, board, last_row, last_col):
-        color = board[last_row][last_col]
-        directions = [(0,1), (1,0), (1,1), (1,-1)]
-        for dr, dc in directions:
-            line = [(last_row, last_col)]
-            r, c = last_row-dr, last_col-dc
-            while 0<=r<ROWS and 0<=c<COLS and board[r][c]==color:
-                line.insert(0, (r,c))
-                r, c = r-dr, c-dc
-            r, c = last_row+dr, last_col+dc
-            while 0<=r<ROWS and 0<=c<COLS and board[r][c]==color:
-                line.append((r,c))
-                r, c = r+dr, c+dc
-            if len(line) >= CONNECT_N:
-                return color, line
-        return None, []
+        color = board.cell(last_row, last_col)
+        if color is None or not board.is_win(color):
+            return None, []
+        line = board.line_through(last_row, last_col)
+        return (color, line) if line else (None, [])
 
     # ---------------- UNDO -----------------------
     def undo_move(self):
         if not self.move_stack or self.replay_mode:
             return
-        self.board, self.current_player, self.win_line = self.move_stack.pop()
+        self.bot_request += 1
+        self.current_player, self.win_line = self.move_stack.pop()
+        self.board.undo()
         self.winner = None
         self.update_board_ui()
         self.enable_columns()
@@ -570,6 +789,7 @@ class FourInARow:
             return
         self.replay_index = 0
         self.replay_mode = True
+        self.bot_request += 1
         self.clear_window()
         self.apply_theme()
         top = tk.Frame(self.root, bg=self.theme["bg"])
@@ -613,20 +833,15 @@ class FourInARow:
         self.create_menu()
 
     def show_replay_state(self):
-        board = [[None for _ in range(COLS)] for _ in range(ROWS)]
+        board = BitBoard()
         current_player = 1
         win_line = []
         winner = None
         for idx in range(self.replay_index):
             col = self.replay_moves[idx]
-            row = None
-            for r in reversed(range(ROWS)):
-                if board[r][col] is None:
-                    board[r][col] = current_player
-                    row = r
-                    break
-            if row is not None:
-                w, line = self.check_winner_replay(board, row, col)
+            if board.can_drop(col):
+                row = board.drop(col, current_player)
+                w, line = self.check_winner_board(board, row, col)
                 if w:
                     winner = w
                     win_line = line
@@ -634,7 +849,7 @@ class FourInARow:
             current_player = 2 if current_player == 1 else 1
         for r in range(ROWS):
             for c in range(COLS):
-                val = board[r][c]
+                val = board.cell(r, c)
                 b = self.replay_cells[r][c]
                 if (r, c) in win_line:
                     b.config(bg=self.theme["hl"])
@@ -660,24 +875,21 @@ class FourInARow:
             self.replay_index -= 1
             self.show_replay_state()
 
-    def check_winner_replay(self, board, last_row, last_col):
-        color = board[last_row][last_col]
-        directions = [(0,1), (1,0), (1,1), (1,-1)]
-        for dr, dc in directions:
-            line = [(last_row, last_col)]
-            r, c = last_row-dr, last_col-dc
-            while 0<=r<ROWS and 0<=c<COLS and board[r][c]==color:
-                line.insert(0, (r,c))
-                r, c = r-dr, c-dc
-            r, c = last_row+dr, last_col+dc
-            while 0<=r<ROWS and 0<=c<COLS and board[r][c]==color:
-                line.append((r,c))
-                r, c = r+dr, c+dc
-            if len(line) >= CONNECT_N:
-                return color, line
-        return None, []
+def main():
+    parser = argparse.ArgumentParser(description="Four in a Row (Connect Four).")
+    parser.add_argument('--bench', action='store_true', help="measure bitboard speed instead of starting the game")
+    parser.add_argument('--depth', type=int, default=7, help="perft depth for --bench")
+    parser.add_argument('--think', type=float, default=IMPOSSIBLE_TIME, help="Impossible bot seconds for --bench")
+    args = parser.parse_args()
+
+    if args.bench:
+        benchmark(args.depth, think=args.think)
+        return
 
-if __name__ == "__main__":
     root = tk.Tk()
     app = FourInARow(root)
-    root.mainloop()
\ No newline at end of file
+    root.mainloop()
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,359 @@
+"""
+Perfect-play solver for Connect Four on the 7x6 board.
+
+The solver is a negamax over the four_in_a_row bit layout, as described by
+Pascal Pons for his Connect Four solver:
+
+    null-window search  the root value is found by repeated (v, v + 1)
+                        searches that narrow [min, max] like a binary search
+    transposition table a fixed number of slots (key % size, always replace)
+                        holding an upper or lower bound of each position
+    anticipation        moves that let the opponent win at once, or that
+                        fill the cell below an opponent's winning cell, are
+                        never searched; two open threats are a loss at once
+    move ordering       moves creating the most winning cells come first,
+                        centre first among equals; the winning cells found
+                        here are handed down as the child's threats
+    child probes        before any child is searched, the table is probed
+                        for all of them; a child whose stored upper bound is
+                        low enough gives the cutoff without a search
+
+Scores are for the side to move. They are positive for a win, the earlier
+the higher (22 minus the winner's disc count when the fourth lands), zero
+for a draw and negative for a loss. Positions are column sequences, 1-based
+as in the usual test sets ("4455" = both players drop twice in the middle).
+
+In CPython the search visits about 120,000 positions a second. Random
+positions with 16 or 18 discs solve in about 0.13 s on average (up to about
+1 s); 14-disc ones average 0.85 s and can take several seconds, and the
+opening is out of reach without a book. four_in_a_row therefore calls the
+solver from SOLVER_MIN_MOVES discs on, under a time limit.
+
+Usage:
+    python four_in_a_row_solver.py 44455554221
+    python four_in_a_row_solver.py --file positions.txt [--weak] [--time-limit 10] [--verbose]
+    python four_in_a_row_solver.py --check
+"""
+
+import argparse
+import time
+
+from four_in_a_row import ROWS, COLS, HEIGHT, CENTER_ORDER, BitBoard, has_four
+
+CELLS = ROWS * COLS
+MIN_SCORE = -(CELLS // 2) + 3
+MAX_SCORE = (CELLS + 1) // 2 - 3
+TABLE_SIZE = 1000003        # transposition table slots (prime)
+BOTTOM_MASK = sum(1 << (c * HEIGHT) for c in range(COLS))
+BOARD_MASK = BOTTOM_MASK * ((1 << ROWS) - 1)
+COLUMN_MASKS = [((1 << ROWS) - 1) << (c * HEIGHT) for c in range(COLS)]
+_LOWER_BOUND = MAX_SCORE - MIN_SCORE + 1    # stored values above this are lower bounds
+_LINE_SHIFTS = tuple((s, 2 * s, 3 * s) for s in (HEIGHT, HEIGHT - 1, HEIGHT + 1))  # horizontal, diagonals
+CHECK_TIME = 2.0            # s the empty board is searched for in --check
+# Positions with exact scores (checked by exhaustive search) for --check. The
+# empty board (a first-player win, score 1) is too deep to finish here, but a
+# fresh table must never answer it: it has to time out or come back as 1.
+CHECK_POSITIONS = [
+    ('', 1),
+    ('224317537341112562153354', 0),
+    ('4165667316227432617456122', 9),
+    ('32444522242355261765376155', 8),
+    ('54752742623275262377637556', -7),
+    ('72561154412713521342644536', -2),
+    ('6515215366111324352512727636', 2),
+    ('7557333566565263722257271711', -2),
+]
+
+
+class SolverTimeout(Exception):
+    pass
+
+
+def winning_cells(position, mask):
+    """Empty cells that would complete four in a row for the owner of position."""
+    cells = (position << 1) & (position << 2) & (position << 3)
+    for one, two, three in _LINE_SHIFTS:
+        up, down = position << one, position >> one
+        cells |= up & (position << two) & ((position << three) | down)
+        cells |= down & (position >> two) & (up | (position >> three))
+    return cells & (BOARD_MASK ^ mask)
+
+
+def parse_moves(text):
+    """'4455' -> BitBoard, checking that every drop is legal and no one has won yet."""
+    board = BitBoard()
+    for char in text.strip():
+        col = ord(char) - ord('1')
+        if not 0 <= col < COLS or not board.can_drop(col):
+            raise ValueError(f"Invalid move {char!r} in {text!r}")
+        if board.is_winning_move(col, 1 + len(board.moves) % 2):
+            raise ValueError(f"Game already won in {text!r}")
+        board.drop(col, 1 + len(board.moves) % 2)
+    return board
+
+
+def _position(board):
+    """(discs of the side to move, all discs, moves played) for a BitBoard or move string."""
+    if isinstance(board, str):
+        board = parse_moves(board)
+    if has_four(board.bits[1]) or has_four(board.bits[2]):
+        raise ValueError("Position is already won")
+    player = 1 + len(board.moves) % 2
+    return board.bits[player], board.bits[1] | board.bits[2], len(board.moves)
+
+
+def result_text(score, moves):
+    """'win', 'loss' or 'draw' for the side to move, with the number of plies to the end."""
+    if score == 0:
+        return "draw"
+    winner_discs = CELLS // 2 + 1 - abs(score)
+    if score > 0:
+        plies = 2 * (winner_discs - moves // 2) - 1
+    else:
+        plies = 2 * (winner_discs - (moves + 1) // 2)
+    return f"{'win' if score > 0 else 'loss'} in {plies} {'ply' if plies == 1 else 'plies'}"
+
+
+class Solver:
+    """Exact Connect Four solver; the table is kept between positions."""
+
+    def __init__(self, table_size=TABLE_SIZE):
+        self.table_size = table_size
+        self.keys = [0] * table_size
+        self.values = [0] * table_size
+        self.nodes = 0
+        self.deadline = None
+
+    def reset(self):
+        self.keys = [0] * self.table_size
+        self.values = [0] * self.table_size
+
+    def solve(self, board, weak=False, time_limit=None):
+        """Score of the position for the side to move (weak: only its sign)."""
+        current, mask, moves = _position(board)
+        self.nodes = 0
+        self.deadline = time.perf_counter() + time_limit if time_limit else None
+        return self._solve(current, mask, moves, weak)
+
+    def best_move(self, board, time_limit=None):
+        """(column, score) of a best move for the side to move; column is 0-based, None if the board is full."""
+        current, mask, moves = _position(board)
+        self.nodes = 0
+        self.deadline = time.perf_counter() + time_limit if time_limit else None
+        possible = (mask + BOTTOM_MASK) & BOARD_MASK
+        columns = [col for col in CENTER_ORDER if possible & COLUMN_MASKS[col]]
+        if not columns:
+            return None, 0
+
+        wins = winning_cells(current, mask) & possible
+        for col in columns:
+            if wins & COLUMN_MASKS[col]:
+                return col, (CELLS + 1 - moves) // 2
+
+        score = self._solve(current, mask, moves)
+        for col in columns:
+            move = possible & COLUMN_MASKS[col]
+            child, child_mask = current ^ mask, mask | move
+            if winning_cells(child, child_mask) & (child_mask + BOTTOM_MASK) & BOARD_MASK:
+                if -((CELLS - moves) // 2) == score:
+                    return col, score   # every move loses at once
+                continue
+            # The move is best if the opponent cannot score more than -score after it
+            if self._negamax(child, child_mask, moves + 1, -score, -score + 1) <= -score:
+                return col, score
+        return columns[0], score
+
+    def _solve(self, current, mask, moves, weak=False):
+        if winning_cells(current, mask) & (mask + BOTTOM_MASK) & BOARD_MASK:
+            return 1 if weak else (CELLS + 1 - moves) // 2
+        low, high = -((CELLS - moves) // 2), (CELLS + 1 - moves) // 2
+        if weak:
+            low, high = -1, 1
+        while low < high:
+            middle = low + (high - low) // 2
+            if middle <= 0 and int(low / 2) < middle:
+                middle = int(low / 2)
+            elif middle >= 0 and high // 2 > middle:
+                middle = high // 2
+            result = self._negamax(current, mask, moves, middle, middle + 1)
+            if result <= middle:
+                high = result
+            else:
+                low = result
+        return (low > 0) - (low < 0) if weak else low
+
+    def _negamax(self, current, mask, moves, alpha, beta, threats=None):
+        """Score within (alpha, beta) of a position where the side to move cannot win at once.
+
+        threats, the opponent's winning cells, is passed down when the caller
+        already computed it for move ordering.
+        """
+        self.nodes += 1
+        if self.deadline and self.nodes & 4095 == 0 and time.perf_counter() > self.deadline:
+            raise SolverTimeout
+
+        possible = (mask + BOTTOM_MASK) & BOARD_MASK
+        if threats is None:
+            threats = winning_cells(current ^ mask, mask)
+        forced = possible & threats
+        if forced:
+            if forced & (forced - 1):
+                return -((CELLS - moves) // 2)     # two threats to block: lost
+            possible = forced
+        candidates = possible & ~(threats >> 1)     # never fill the cell below an opponent's win
+        if not candidates:
+            return -((CELLS - moves) // 2)
+        if moves >= CELLS - 2:
+            return 0
+
+        low = -((CELLS - 2 - moves) // 2)
+        if alpha < low:
+            alpha = low
+            if alpha >= beta:
+                return alpha
+        high = (CELLS - 1 - moves) // 2
+
+        key = current + mask + BOTTOM_MASK     # unique per position and never 0, the empty slot value
+        index = key % self.table_size
+        if self.keys[index] == key:
+            value = self.values[index]
+            if value > _LOWER_BOUND:
+                low = value + 2 * MIN_SCORE - MAX_SCORE - 2
+                if alpha < low:
+                    alpha = low
+                    if alpha >= beta:
+                        return alpha
+            else:
+                high = value + MIN_SCORE - 1
+        if beta > high:
+            beta = high
+            if alpha >= beta:
+                return beta
+
+        if candidates & (candidates - 1):
+            ordered = []
+            for col in CENTER_ORDER:
+                move = candidates & COLUMN_MASKS[col]
+                if move:
+                    cells = winning_cells(current | move, mask)
+                    ordered.append((-bin(cells).count('1'), len(ordered), move, cells & ~move))
+            ordered.sort()
+        else:
+            ordered = ((0, 0, candidates, None),)
+
+        opponent = current ^ mask
+        # Enhanced transposition cutoff: a child whose stored upper bound is low
+        # enough proves the cutoff without being searched
+        keys, values, size = self.keys, self.values, self.table_size
+        for _, _, move, _ in ordered:
+            child = opponent + (mask | move) + BOTTOM_MASK
+            slot = child % size
+            if keys[slot] == child:
+                value = values[slot]
+                if value <= _LOWER_BOUND:
+                    score = -(value + MIN_SCORE - 1)
+                    if score >= beta:
+                        keys[index] = key
+                        values[index] = score + MAX_SCORE - 2 * MIN_SCORE + 2
+                        return score
+                    if score > alpha:
+                        alpha = score
+        for _, _, move, cells in ordered:
+            score = -self._negamax(opponent, mask | move, moves + 1, -beta, -alpha, cells)
+            if score >= beta:
+                self.keys[index] = key
+                self.values[index] = score + MAX_SCORE - 2 * MIN_SCORE + 2
+                return score
+            if score > alpha:
+                alpha = score
+        self.keys[index] = key
+        self.values[index] = alpha - MIN_SCORE + 1
+        return alpha
+
+
+def self_check(time_limit=CHECK_TIME):
+    """Solve CHECK_POSITIONS with a fresh solver; returns a list of failures (empty if all agree)."""
+    failures = []
+    for moves, expected in CHECK_POSITIONS:
+        solver = Solver()
+        try:
+            score = solver.solve(moves, time_limit=time_limit)
+        except SolverTimeout:
+            if moves:
+                failures.append(f"{moves or 'empty board'}: timed out")
+            continue
+        if score != expected:
+            failures.append(f"{moves or 'empty board'}: score {score:+d}, expected {expected:+d} "
+                            f"after {solver.nodes:,} nodes")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Solve Connect Four positions exactly.")
+    parser.add_argument('moves', nargs='?', help="position as 1-based columns, e.g. 4455")
+    parser.add_argument('--file', help="positions file: one '<moves> [expected score]' per line")
+    parser.add_argument('--weak', action='store_true', help="only find win / draw / loss")
+    parser.add_argument('--time-limit', type=float, help="seconds per position")
+    parser.add_argument('--verbose', action='store_true', help="print every position of --file")
+    parser.add_argument('--check', action='store_true', help="solve positions with known scores and exit")
+    args = parser.parse_args()
+    if args.check:
+        failures = self_check()
+        for failure in failures:
+            print(f"[SOLVER] FAIL {failure}")
+        if failures:
+            raise SystemExit(1)
+        print(f"[SOLVER] Self-check passed ({len(CHECK_POSITIONS)} positions)")
+        return
+    if not args.moves and not args.file:
+        parser.error("give a position, --file or --check")
+
+    solver = Solver()
+    if args.moves:
+        board = parse_moves(args.moves)
+        start = time.perf_counter()
+        try:
+            col, score = solver.best_move(board, args.time_limit)
+        except SolverTimeout:
+            raise SystemExit(f"[SOLVER] Timed out after {args.time_limit}s ({solver.nodes:,} nodes)")
+        elapsed = time.perf_counter() - start
+        if col is None:
+            print("[SOLVER] Board is full: draw")
+            return
+        print(f"[SOLVER] score {score:+d} ({result_text(score, len(board.moves))}), best column {col + 1}, "
+              f"{solver.nodes:,} nodes in {elapsed:.3f}s")
+        return
+
+    times = []
+    nodes = mismatches = timeouts = 0
+    with open(args.file, encoding='utf-8') as f:
+        lines = [line.split() for line in f if line.strip() and not line.startswith('#')]
+    for number, fields in enumerate(lines, 1):
+        expected = int(fields[1]) if len(fields) > 1 else None
+        start = time.perf_counter()
+        try:
+            score = solver.solve(fields[0], args.weak, args.time_limit)
+        except SolverTimeout:
+            timeouts += 1
+            print(f"[SOLVER] {number}: {fields[0]} timed out after {args.time_limit}s")
+            continue
+        elapsed = time.perf_counter() - start
+        times.append(elapsed)
+        nodes += solver.nodes
+        if expected is not None and args.weak:
+            expected = (expected > 0) - (expected < 0)
+        wrong = expected is not None and score != expected
+        mismatches += wrong
+        if args.verbose or wrong:
+            print(f"[SOLVER] {number}: {fields[0]} score {score:+d}"
+                  + (f" expected {expected:+d}" if wrong else "") + f", {solver.nodes:,} nodes, {elapsed:.3f}s")
+
+    if times:
+        total = sum(times)
+        print(f"[SOLVER] {len(times)} positions solved, {mismatches} mismatches, {timeouts} timeouts; "
+              f"mean {total / len(times) * 1000:.1f} ms, max {max(times) * 1000:.1f} ms, "
+              f"mean {nodes / len(times):,.0f} nodes, {nodes / total / 1000:.0f} knodes/s")
+
+
+if __name__ == "__main__":
+    main()